@@ -0,0 +1,135 @@
+"""
+对比改动之前 handle_new_log 的两遍解析和 log_events.classify_log 在模组服刷屏日志上的耗时
+
+    python benchmarks/bench_log_events.py [行数]
+
+旧的聊天解析是 minecraft_docker_manager_lib 的 MCInstance.parse_player_messages_from_log，
+需要安装这个库才能和改动之前的实现对比；没有安装时用逐行匹配的正则代替，
+结果会明确标出来，不能当成和旧实现的对比结果。
+"""
+
+import importlib.util
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+LOG_EVENTS_PATH = (
+    Path(__file__).parent.parent
+    / "mc_qqbot_next"
+    / "plugins"
+    / "mc_qqbot_next"
+    / "log_events.py"
+)
+
+spec = importlib.util.spec_from_file_location("log_events", LOG_EVENTS_PATH)
+assert spec is not None and spec.loader is not None
+log_events = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(log_events)
+
+try:
+    from minecraft_docker_manager_lib.instance import MCInstance
+
+    parse_player_messages_from_log = MCInstance.parse_player_messages_from_log
+    CHAT_PARSER = "minecraft_docker_manager_lib"
+except (ImportError, AttributeError):
+    _chat_pattern = re.compile(r"^\[[^\]]+\] \[[^\]]+\](?: \[[^\]]+\])?: <(.*?)> (.*)$")
+
+    def parse_player_messages_from_log(log: str):
+        return [
+            match.groups()
+            for line in log.splitlines()
+            if (match := _chat_pattern.match(line))
+        ]
+
+    CHAT_PARSER = "stand-in regex (minecraft_docker_manager_lib not installed)"
+
+
+@dataclass
+class PlayerInfo:
+    uuid: str
+    name: str
+
+
+def parse_player_uuid_and_name_from_log(log_content: str):
+    # 改动之前的 mc.parse_player_uuid_and_name_from_log，原样保留
+    pattern = re.compile(
+        r"^\[[^\]]+\]\s+\[User Authenticator.*?\]: UUID of player (\w+) is ([a-f0-9\-]{36})$"
+    )
+
+    player_info_list = list[PlayerInfo]()
+    for line in log_content.splitlines():
+        match = pattern.match(line)
+        if match:
+            name, uuid = match.groups()
+            player_info_list.append(PlayerInfo(uuid=uuid.replace("-", ""), name=name))
+
+    return player_info_list
+
+
+def legacy_parse(log_content: str):
+    # 改动之前 handle_new_log 对每段新日志做的两遍解析
+    return parse_player_messages_from_log(
+        log_content
+    ), parse_player_uuid_and_name_from_log(log_content)
+
+
+def generate_modded_log(line_count: int, info_ratio: float) -> str:
+    """
+    info_ratio 为模组的 INFO 行、聊天和玩家登录所占的比例，其余是 WARN 刷屏
+    """
+    random.seed(0)
+    lines = []
+    for i in range(line_count):
+        r = random.random() / info_ratio
+        if r >= 1:
+            lines.append(
+                f"[12:00:00] [Server thread/WARN] [net.minecraftforge.common.ForgeHooks/]: "
+                f"Mod 'examplemod' tried to access block entity at {i}, 64, {i * 3} which is not loaded"
+            )
+        elif r < 0.7:
+            lines.append(
+                f"[12:00:00] [Worker-Main-{i % 8}/INFO] [com.example.somemod.ChunkIO/]: "
+                f"Loaded chunk data for region r.{i}.{i}.mca in {i % 50}ms"
+            )
+        elif r < 0.9:
+            lines.append(
+                f"[12:00:00] [Server thread/INFO] [minecraft/MinecraftServer]: <Player{i % 20}> hello {i}"
+            )
+        else:
+            lines.append(
+                f"[12:00:00] [User Authenticator #{i % 5}/INFO] [minecraft/ServerLoginPacketListenerImpl]: "
+                f"UUID of player Player{i % 20} is 069a79f4-44e9-4726-a5be-fca90e38aaf5"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def best_of(func, content: str, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"chat parser: {CHAT_PARSER}")
+    for name, info_ratio in [("WARN spam", 0.01), ("mixed", 0.1)]:
+        content = generate_modded_log(line_count, info_ratio)
+        legacy_seconds = best_of(legacy_parse, content)
+        classify_seconds = best_of(log_events.classify_log, content)
+        print(
+            f"{name}: {line_count} lines, {len(content) / 1024 / 1024:.1f} MiB, "
+            f"{info_ratio:.0%} INFO"
+        )
+        print(f"  legacy two-pass: {legacy_seconds * 1000:8.1f} ms")
+        print(f"  classify_log:    {classify_seconds * 1000:8.1f} ms")
+        print(f"  speedup:         {legacy_seconds / classify_seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
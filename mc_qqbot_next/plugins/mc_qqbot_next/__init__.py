@@ -1,4 +1,7 @@
-from nonebot import require
+import asyncio
+
+from nonebot import get_driver, require
+from nonebot.adapters.onebot.v11 import Bot
 from nonebot.plugin import PluginMetadata
 
 require("nonebot_plugin_apscheduler")
@@ -6,7 +9,28 @@ require("nonebot_plugin_orm")
 from nonebot_plugin_apscheduler import scheduler  # noqa: E402
 
 from . import commands  # noqa: F401, E402
-from .server_to_group import check_mc_logs  # noqa: E402
+from .config import config  # noqa: E402
+from .docker import (  # noqa: E402
+    docker_engine,
+    rcon_pools,
+    server_health,
+    server_registry,
+)
+from .log import logger  # noqa: E402
+from .log_event_bus import log_event_bus  # noqa: E402
+from .log_pointer import log_pointer_store  # noqa: E402
+from .log_watcher import log_watch_available  # noqa: E402
+from .player_info import player_info_writer  # noqa: E402
+from .send_scheduler import send_scheduler  # noqa: E402
+from .server_registry import watch_docker_cli_events  # noqa: E402
+from .server_status import status_poller  # noqa: E402
+from .server_to_group import (  # noqa: E402
+    chat_batcher,
+    check_mc_logs,
+    evict_stale_log_pointers,
+    log_watcher,
+    refresh_log_pointers,
+)
 
 __plugin_meta__ = PluginMetadata(
     name="mc-qqbot-next",
@@ -14,4 +38,95 @@ __plugin_meta__ = PluginMetadata(
     usage="",
 )
 
-scheduler.add_job(check_mc_logs, "interval", seconds=1)
+driver = get_driver()
+Bot.on_calling_api(send_scheduler.before_calling_api)
+Bot.on_called_api(send_scheduler.after_called_api)
+driver.on_startup(evict_stale_log_pointers)
+driver.on_startup(player_info_writer.warm_up)
+
+
+@driver.on_shutdown
+async def flush_log_state():
+    # 先处理完已经读到的日志事件，指针才不会越过还没处理的日志，
+    # 事件处理中产生的聊天消息和玩家信息也要在这之后才能写出去
+    await log_event_bus.close()
+    await log_pointer_store.flush()
+    await player_info_writer.flush()
+    if chat_batcher is not None:
+        await chat_batcher.flush()
+
+
+if docker_engine is not None:
+    driver.on_shutdown(docker_engine.close)
+if rcon_pools is not None:
+    driver.on_shutdown(rcon_pools.close)
+driver.on_shutdown(server_health.close)
+
+
+scheduler.add_job(
+    refresh_log_pointers,
+    "interval",
+    seconds=config.mc_log_replay_max_seconds / 4,
+    id="refresh_log_pointers",
+)
+
+
+def start_polling_mc_logs():
+    scheduler.add_job(check_mc_logs, "interval", seconds=1, id="check_mc_logs")
+
+
+if config.mc_log_watch_enabled and log_watch_available():
+    log_watcher_task: asyncio.Task | None = None
+
+    async def run_log_watcher():
+        try:
+            await log_watcher.run()
+        except Exception:
+            logger.exception("Failed to watch mc logs, falling back to polling")
+            start_polling_mc_logs()
+
+    @driver.on_startup
+    async def start_log_watcher():
+        global log_watcher_task
+        log_watcher_task = asyncio.create_task(run_log_watcher())
+
+    @driver.on_shutdown
+    async def stop_log_watcher():
+        if log_watcher_task is not None:
+            log_watcher_task.cancel()
+
+else:
+    start_polling_mc_logs()
+
+if config.mc_docker_events_enabled:
+    docker_events_task: asyncio.Task | None = None
+
+    @driver.on_startup
+    async def start_watching_docker_events():
+        global docker_events_task
+        docker_events_task = asyncio.create_task(
+            server_registry.watch_events(
+                docker_engine.events
+                if docker_engine is not None
+                else watch_docker_cli_events
+            )
+        )
+
+    @driver.on_shutdown
+    async def stop_watching_docker_events():
+        if docker_events_task is not None:
+            docker_events_task.cancel()
+
+
+if status_poller is not None:
+    status_poller_task: asyncio.Task | None = None
+
+    @driver.on_startup
+    async def start_polling_server_status():
+        global status_poller_task
+        status_poller_task = asyncio.create_task(status_poller.run())
+
+    @driver.on_shutdown
+    async def stop_polling_server_status():
+        if status_poller_task is not None:
+            status_poller_task.cancel()
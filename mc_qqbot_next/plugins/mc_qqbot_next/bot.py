@@ -1,6 +1,11 @@
+from collections.abc import AsyncIterable, AsyncIterator
+
 from nonebot import get_bots
 from nonebot.adapters.onebot.v11.bot import Bot
-from nonebot.adapters.onebot.v11.message import MessageSegment
+from nonebot.adapters.onebot.v11.message import Message, MessageSegment
+
+# 合并转发中每个节点的最大字符数
+FORWARD_NODE_MAX_LENGTH = 3000
 
 
 def get_onebot_bot() -> Bot | None:
@@ -18,3 +23,37 @@ def construct_single_forward_message_segment(message_content: str):
     return MessageSegment.node_custom(
         user_id=int(bot.self_id), nickname="", content=message_content
     )
+
+
+def construct_forward_message(pages: list[str]):
+    """
+    每一页作为合并转发中的一个节点
+    """
+    bot = get_onebot_bot()
+    if not bot:
+        return None
+    return Message(
+        MessageSegment.node_custom(user_id=int(bot.self_id), nickname="", content=page)
+        for page in pages
+    )
+
+
+async def paginate(
+    chunks: AsyncIterable[str], page_size: int = FORWARD_NODE_MAX_LENGTH
+) -> AsyncIterator[str]:
+    """
+    把分段到达的文本重新切成不超过 page_size 的页，尽量在换行或者逗号处断开
+    """
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) > page_size:
+            cut = max(
+                buffer.rfind("\n", 0, page_size), buffer.rfind(", ", 0, page_size) + 1
+            )
+            if cut <= 0:
+                cut = page_size
+            yield buffer[:cut].rstrip()
+            buffer = buffer[cut:].lstrip()
+    if buffer:
+        yield buffer
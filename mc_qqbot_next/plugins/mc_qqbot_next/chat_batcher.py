@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Literal
+
+from .log import logger
+
+# 一条合并后的群消息最多包含的行数，达到后立即发送
+CHAT_BATCH_MAX_LINES = 20
+
+ChatBatchScopeT = Literal["server", "global"]
+
+
+@dataclass(frozen=True)
+class ChatLine:
+    server_name: str
+    player_name: str
+    message: str
+
+    def format(self) -> str:
+        return f"[{self.server_name}] <{self.player_name}>: {self.message}"
+
+
+class ChatBatcher:
+    """
+    把一个时间窗口内的聊天消息合并成一条群消息
+
+    窗口从一批中的第一条消息开始计时，所以每条消息最多等待一个窗口。
+    scope 为 server 时每个服务器各自合并，为 global 时所有服务器按顺序共用一批，
+    来自另一个服务器的消息会让当前这批立即发送，回复合并后的消息时才能发往正确的服务器。
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        scope: ChatBatchScopeT,
+        send: Callable[[list[ChatLine]], Awaitable[None]],
+    ):
+        self._window_seconds = window_seconds
+        self._scope = scope
+        self._send = send
+        self._pending = dict[str, list[ChatLine]]()
+        self._flush_tasks = dict[str, asyncio.Task]()
+        # 发送一批的时候其他消息要等着，否则可能被放进别的服务器的一批里，或者打乱顺序
+        self._lock = asyncio.Lock()
+
+    async def add(self, line: ChatLine):
+        key = line.server_name if self._scope == "server" else ""
+        async with self._lock:
+            pending = self._pending.get(key)
+            if pending and pending[-1].server_name != line.server_name:
+                self._cancel_flush_later(key)
+                await self._flush(key)
+            pending = self._pending.setdefault(key, [])
+            pending.append(line)
+            if len(pending) >= CHAT_BATCH_MAX_LINES:
+                self._cancel_flush_later(key)
+                await self._flush(key)
+            elif key not in self._flush_tasks:
+                self._flush_tasks[key] = asyncio.create_task(self._flush_later(key))
+
+    async def flush(self):
+        """
+        立即发送所有还在等待的消息
+        """
+        async with self._lock:
+            for key in list(self._flush_tasks):
+                self._cancel_flush_later(key)
+            for key in list(self._pending):
+                await self._flush(key)
+
+    def _cancel_flush_later(self, key: str):
+        if flush_task := self._flush_tasks.pop(key, None):
+            flush_task.cancel()
+
+    async def _flush_later(self, key: str):
+        await asyncio.sleep(self._window_seconds)
+        async with self._lock:
+            self._flush_tasks.pop(key, None)
+            await self._flush(key)
+
+    async def _flush(self, key: str):
+        lines = self._pending.pop(key, None)
+        if not lines:
+            return
+        try:
+            await self._send(lines)
+        except Exception:
+            logger.exception(f"Error when sending {len(lines)} batched chat lines")
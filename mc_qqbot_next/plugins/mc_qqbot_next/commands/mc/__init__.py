@@ -5,6 +5,7 @@ from . import (
     reply_say,
     restart,
     say,
+    stats,
     unban,
     whitelist,
 )
@@ -16,6 +17,7 @@ __all__ = [
     "reply_say",
     "restart",
     "say",
+    "stats",
     "unban",
     "whitelist",
 ]
@@ -1,6 +1,7 @@
 from nonebot import on_command
 from nonebot.params import Depends
 
+from ...deadline import with_deadline
 from ...dependencies import CommandTarget, extract_arg_and_target
 from ...docker import send_rcon_command
 from ...log import logger
@@ -11,6 +12,7 @@ banlist = on_command(
 
 
 @banlist.handle()
+@with_deadline()
 async def handle_banlist(
     command_target: CommandTarget = Depends(extract_arg_and_target),
 ):
@@ -1,12 +1,15 @@
 from nonebot import on_command
 
+from ...deadline import with_deadline
 from ...docker import list_players_for_all_servers
 from ...log import logger
+from ...server_status import status_poller
 
 ping = on_command("ping", aliases={"list", "l"})
 
 
 @ping.handle()
+@with_deadline()
 async def handle_ping():
     """
     列出当前运行中的服务器和在线玩家
@@ -18,8 +21,23 @@ async def handle_ping():
     没人: [atm9s], [ftb]
     无响应: [badserver1], [badserver2]
     ---
+    开启后台状态查询时直接使用最近的结果，太久没更新的服务器会标记上次更新的时间，
+    例如 [vanilla](40秒前): player1
     """
-    servers_player_listing = await list_players_for_all_servers()
+    # 服务器名称 -> 结果的秒数，只包含过时的结果
+    stale_ages = dict[str, float]()
+    if status_poller is not None:
+        statuses = await status_poller.get_statuses()
+        servers_player_listing = {
+            server_name: status.players for server_name, status in statuses.items()
+        }
+        stale_ages = {
+            server_name: status.age
+            for server_name, status in statuses.items()
+            if status.age > status_poller.stale_seconds
+        }
+    else:
+        servers_player_listing = await list_players_for_all_servers()
     logger.debug(f"Servers player listing: {servers_player_listing}")
 
     servers_with_players = []
@@ -27,14 +45,17 @@ async def handle_ping():
     servers_bad = []
 
     for server_name, players in servers_player_listing.items():
+        label = f"[{server_name}]"
+        if server_name in stale_ages:
+            label += f"({int(stale_ages[server_name])}秒前)"
         if players is None:
-            servers_bad.append(f"[{server_name}]")
+            servers_bad.append(label)
             continue
         if players:
             players_str = ", ".join(players)
-            servers_with_players.append(f"[{server_name}]: {players_str}")
+            servers_with_players.append(f"{label}: {players_str}")
         else:
-            servers_without_players.append(f"[{server_name}]")
+            servers_without_players.append(label)
 
     message_parts = []
     if servers_with_players:
@@ -3,6 +3,7 @@ from nonebot.adapters.onebot.v11 import MessageEvent
 from nonebot.params import Depends
 from nonebot.rule import Rule
 
+from ...deadline import with_deadline
 from ...dependencies import get_player_name, get_target_server_from_reply
 from ...rules import has_reply, is_from_configured_group
 from .say import actual_send_message
@@ -14,6 +15,7 @@ reply_say = on_message(
 
 
 @reply_say.handle()
+@with_deadline()
 async def handle_reply_say(
     event: MessageEvent,
     target_server: str = Depends(get_target_server_from_reply),
@@ -1,15 +1,13 @@
-import asyncio
-import time
-
 from nonebot import on_command
-from nonebot.params import Depends
+from nonebot.adapters.onebot.v11 import Message
+from nonebot.params import CommandArg
 from nonebot.permission import SUPERUSER, Permission
 
-from ...config import config
-from ...dependencies import CommandTarget, extract_arg_and_target
-from ...docker import healthy, restart_server
+from ...dependencies import format_ambiguous_server_name
+from ...docker import AmbiguousServerNameError, locate_server_name_with_prefix
 from ...log import logger
 from ...permission import group_admin_or_owner
+from ...restart_jobs import restart_job_manager
 from ...rules import is_from_configured_group
 
 restart = on_command(
@@ -20,26 +18,42 @@ restart = on_command(
 
 
 @restart.handle()
-async def handle_restart(
-    command_target: CommandTarget = Depends(extract_arg_and_target),
-):
-    if not command_target.is_explicit:
+async def handle_restart(arg: Message = CommandArg()):
+    """
+    在后台重启一个或多个服务器，进度会发到群里
+
+    用法：
+    /restart /server1 /server2
+    /restart status  查看重启任务的状态
+    """
+    text = arg.extract_plain_text().strip()
+    if text == "status":
+        jobs = restart_job_manager.get_jobs()
+        await restart.finish(
+            "\n".join(job.describe() for job in jobs) if jobs else "没有重启任务"
+        )
+
+    prefixes = text.split()
+    if not prefixes or not all(prefix.startswith("/") for prefix in prefixes):
         await restart.finish("重启服务器需要明确指定目标服务器")
-    
-    target_server = command_target.target_server
-    logger.info(f"Trying to restart {target_server}")
-    await restart_server(target_server)
-    await restart.send(f"[{target_server}] 正在重启")
-    before_time = time.perf_counter()
-    # we only wait for 10 minutes for the server to be healthy
-    while time.perf_counter() - before_time < config.mc_restart_wait_seconds:
-        if await healthy(target_server):
-            await restart.finish(f"[{target_server}] 重启完成")
-            return
-        await asyncio.sleep(1)
-    logger.info(
-        f"Restarting {target_server} timeout after {config.mc_restart_wait_seconds} seconds"
-    )
-    await restart.finish(
-        f"[{target_server}] 坏了，好像过了{config.mc_restart_wait_seconds//60}分钟了还没重启好"
-    )
+    target_servers = list[str]()
+    for prefix in prefixes:
+        try:
+            target_server = await locate_server_name_with_prefix(prefix[1:])
+        except AmbiguousServerNameError as e:
+            await restart.finish(format_ambiguous_server_name(e))
+        if target_server is None:
+            await restart.finish("重启服务器需要明确指定目标服务器")
+        target_servers.append(target_server)
+
+    lines = list[str]()
+    for target_server in dict.fromkeys(target_servers):
+        logger.info(f"Trying to restart {target_server}")
+        job, created = restart_job_manager.submit(target_server)
+        if created:
+            lines.append(
+                f"[{target_server}] {'正在重启' if job.status == 'restarting' else '排队中'}"
+            )
+        else:
+            lines.append(f"{job.describe()}，不会重复重启")
+    await restart.finish("\n".join(lines))
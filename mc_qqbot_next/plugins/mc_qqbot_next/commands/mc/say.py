@@ -4,6 +4,7 @@ from nonebot.matcher import Matcher
 from nonebot.params import Depends
 
 from ...db.crud.message import create_message_target
+from ...deadline import with_deadline
 from ...dependencies import CommandTarget, extract_arg_and_target, get_player_name
 from ...docker import send_message
 from ...log import logger
@@ -17,6 +18,7 @@ say = on_command(
 
 
 @say.handle()
+@with_deadline()
 async def handle_say(
     event: MessageEvent,
     command_target: CommandTarget = Depends(extract_arg_and_target),
@@ -0,0 +1,42 @@
+from nonebot import on_command
+from nonebot.permission import SUPERUSER, Permission
+
+from ...log_event_bus import log_event_bus
+from ...permission import group_admin_or_owner
+from ...rules import is_from_configured_group
+from ...send_scheduler import send_scheduler
+
+stats = on_command(
+    "stats",
+    rule=is_from_configured_group,
+    permission=SUPERUSER | Permission(group_admin_or_owner),
+)
+
+
+@stats.handle()
+async def handle_stats():
+    """
+    列出每个服务器日志事件队列和每个群消息发送的状态
+
+    返回格式：
+    ---
+    [vanilla] 排队 0 已处理 120 丢弃 0 延迟 12ms 最大 340ms
+    [群 123456] 已发送 30 重试 1 失败 0 等待中 0 最长等待 2.5s
+    ---
+    """
+    lines = [
+        f"[{server_name}] 排队 {queue_stats.depth} "
+        f"已处理 {queue_stats.delivered} 丢弃 {queue_stats.dropped} "
+        f"延迟 {queue_stats.last_latency * 1000:.0f}ms "
+        f"最大 {queue_stats.max_latency * 1000:.0f}ms"
+        for server_name, queue_stats in sorted(log_event_bus.stats.items())
+    ]
+    lines.extend(
+        f"[{f'群 {group_id}' if group_id else '私聊'}] 已发送 {send_stats.sent} "
+        f"重试 {send_stats.retried} 失败 {send_stats.failed} "
+        f"等待中 {send_stats.waiting} 最长等待 {send_stats.max_wait:.1f}s"
+        for group_id, send_stats in sorted(send_scheduler.stats.items())
+    )
+    await stats.finish(
+        "\n".join(lines) if lines else "还没有处理过日志事件或发送过消息"
+    )
@@ -2,6 +2,7 @@ from nonebot import on_command
 from nonebot.params import Depends
 from nonebot.permission import SUPERUSER, Permission
 
+from ...deadline import with_deadline
 from ...dependencies import CommandTarget, extract_arg_and_target
 from ...docker import send_rcon_command
 from ...log import logger
@@ -16,6 +17,7 @@ unban = on_command(
 
 
 @unban.handle()
+@with_deadline()
 async def handle_unban(
     command_target: CommandTarget = Depends(extract_arg_and_target),
 ):
@@ -2,9 +2,10 @@ from nonebot import CommandGroup
 from nonebot.params import Depends
 from nonebot.permission import SUPERUSER, Permission
 
-from ...bot import construct_single_forward_message_segment
+from ...bot import construct_forward_message, paginate
+from ...deadline import with_deadline
 from ...dependencies import CommandTarget, extract_arg_and_target
-from ...docker import send_rcon_command
+from ...docker import send_rcon_command, stream_rcon_command
 from ...log import logger
 from ...permission import group_admin_or_owner
 from ...rules import is_from_configured_group
@@ -28,6 +29,7 @@ whitelist_list = whitelist.command(
 
 
 @whitelist_add.handle()
+@with_deadline()
 async def handle_whitelist_add(
     command_target: CommandTarget = Depends(extract_arg_and_target),
 ):
@@ -38,6 +40,7 @@ async def handle_whitelist_add(
 
 
 @whitelist_remove.handle()
+@with_deadline()
 async def handle_whitelist_remove(
     command_target: CommandTarget = Depends(extract_arg_and_target),
 ):
@@ -50,11 +53,17 @@ async def handle_whitelist_remove(
 
 
 @whitelist_list.handle()
+@with_deadline()
 async def handle_whitelist_list(
     command_target: CommandTarget = Depends(extract_arg_and_target),
 ):
     target_server = command_target.target_server
     logger.info(f"Trying to list whitelist on {target_server}")
-    result = await send_rcon_command(target_server, "whitelist list")
-    message = construct_single_forward_message_segment(result)
+    # 大服务器的白名单可能很长，分成多个转发节点
+    pages = [
+        page
+        async for page in paginate(stream_rcon_command(target_server, "whitelist list"))
+    ] or [""]
+    pages[0] = f"[{target_server}] {pages[0]}"
+    message = construct_forward_message(pages)
     await whitelist_list.finish(message)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from nonebot import get_driver
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -10,7 +12,73 @@ class Config(BaseModel):
     mc_default_server: str | None = None
     mc_group_id: int = Field(None, validate_default=False)
     mc_restart_wait_seconds: int = 60 * 10
+    # 重启时主要等待日志和容器事件，健康状态轮询只是兜底，间隔从最小值开始翻倍
+    mc_restart_poll_initial_seconds: float = 1
+    mc_restart_poll_max_seconds: float = 30
+    # 同时重启的服务器数上限，多出来的排队
+    mc_restart_max_parallel: int = 2
     mc_list_players_timeout_seconds: int = 5
+    # 获取在线玩家的方式，slp 通过游戏端口查询，服务器只给出部分玩家时仍然使用 RCON
+    mc_list_players_method: Literal["rcon", "slp"] = "rcon"
+    mc_slp_host: str = "127.0.0.1"
+    # 在后台定期查询服务器状态，/ping 直接使用最近的结果；没人在线时查询间隔逐渐变长，
+    # 结果超过 mc_status_stale_seconds 时会标记出来并在后台刷新
+    mc_status_poll_enabled: bool = True
+    mc_status_poll_interval_seconds: float = 10
+    mc_status_poll_max_interval_seconds: float = 60
+    mc_status_stale_seconds: float = 30
+    # 运行中服务器列表的完整刷新间隔，平时通过 Docker 容器事件增量更新
+    mc_server_registry_ttl_seconds: int = 60
+    mc_docker_events_enabled: bool = True
+    # Docker Engine API 的 unix socket 路径，留空则所有操作都通过 docker 命令行
+    mc_docker_socket_path: str = "/var/run/docker.sock"
+    mc_docker_api_timeout_seconds: float = 10
+    # 直接连接服务器 RCON 端口时使用的地址和密码，密码留空则通过 docker 命令行发送 RCON 命令
+    mc_rcon_host: str = "127.0.0.1"
+    mc_rcon_password: str = ""
+    # 每个服务器最多保持的 RCON 连接数，以及连接和等待响应的超时时间
+    mc_rcon_pool_size: int = 2
+    mc_rcon_timeout_seconds: float = 10
+    # 每个服务器同时执行的 RCON 命令数，超过的排队，群里的命令排在状态轮询等后台查询前面
+    mc_rcon_max_concurrency: int = 2
+    # 每个命令处理的总时限，重启命令本身的时限；其他操作各自使用上面的超时时间，命令剩下的时间更少时以剩下的为准
+    mc_command_deadline_seconds: float = 30
+    mc_restart_timeout_seconds: float = 120
+    # 连续失败这么多次的服务器直接当作无响应，之后每隔一段时间在后台探测是否恢复
+    mc_circuit_failure_threshold: int = 3
+    mc_circuit_probe_interval_seconds: float = 30
+    # 超时时间根据最近响应时间的 p99 乘以这个倍数自动缩短，但不低于最小值
+    mc_adaptive_timeout_multiplier: float = 3
+    mc_adaptive_timeout_min_seconds: float = 0.5
+    # 使用 inotify 监听日志文件，不可用时退回到每秒轮询
+    mc_log_watch_enabled: bool = True
+    mc_log_watch_rescan_seconds: int = 10
+    # 日志指针写入数据库的合并间隔，重启后最多补读的字节数和停机时长
+    mc_log_pointer_flush_seconds: float = 5
+    mc_log_replay_max_bytes: int = 1024 * 1024
+    mc_log_replay_max_seconds: int = 60 * 60
+    # 玩家登录时 UUID 和名称合并写入数据库的间隔，以及缓存的玩家数
+    mc_player_info_flush_seconds: float = 1
+    mc_player_info_cache_size: int = 10000
+    # 每次从 latest.log 读取的字节数，决定了日志暴增时每个服务器占用的内存上限
+    mc_log_read_chunk_bytes: int = 256 * 1024
+    # 每个服务器待投递的日志事件队列长度，以及队列满了之后的处理方式
+    mc_log_event_queue_size: int = 10000
+    mc_log_event_drop_policy: Literal["drop_oldest", "drop_newest", "block"] = (
+        "drop_oldest"
+    )
+    # 退出时最多等待这么多秒把已经入队的日志事件处理完
+    mc_log_event_drain_seconds: float = 10
+    # 合并这么多毫秒内的聊天消息再发到群里，0 为不合并；按服务器分别合并或者全部按顺序合并（换服务器时先发出当前这批）
+    mc_chat_batch_window_ms: int = 0
+    mc_chat_batch_scope: Literal["server", "global"] = "server"
+    # 每个群每分钟最多发送的消息数和允许的突发数
+    mc_send_rate_per_minute: float = 20
+    mc_send_burst: int = 5
+    # 发送失败时的重试次数和首次重试的等待秒数，只重试超时和以下错误码
+    mc_send_max_retries: int = 3
+    mc_send_retry_base_seconds: float = 2
+    mc_send_retry_retcodes: list[int] = [100, 1200]
 
 
 global_config = get_driver().config
@@ -1,9 +1,31 @@
+from collections.abc import Callable
+
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 
 from ...mc import find_name_by_uuid, find_uuid_by_name
 from ..model import MCPlayerInfo, QQUUIDMapping
 from . import get_session_scope
 
+# Called with (uuid, name) after a player is created or renamed,
+# and with (uuid, None) after a player is removed.
+PlayerInfoListenerT = Callable[[str, str | None], None]
+
+_player_info_listeners = list[PlayerInfoListenerT]()
+
+
+def add_player_info_listener(listener: PlayerInfoListenerT) -> None:
+    """
+    Get notified when players are written by anything other than
+    upsert_mc_player_infos, so that caches of the table stay consistent.
+    """
+    _player_info_listeners.append(listener)
+
+
+def _notify_player_info(uuid: str, name: str | None) -> None:
+    for listener in _player_info_listeners:
+        listener(uuid, name)
+
 
 async def get_player_name_by_qq_id(qq_id: str) -> str | None:
     async with get_session_scope() as session:
@@ -40,6 +62,7 @@ async def create_qq_uuid_mapping_by_player_name(qq_id: str, name: str) -> None:
         aiohttp.ClientError: If an error occurs while fetching data from Mojang API.
         asyncio.TimeoutError: If the request to Mojang API times out.
     """
+    created = False
     async with get_session_scope() as session:
         query = select(MCPlayerInfo).where(MCPlayerInfo.name == name)
         mc_player_info = await session.scalar(query)
@@ -49,8 +72,11 @@ async def create_qq_uuid_mapping_by_player_name(qq_id: str, name: str) -> None:
             player_uuid = await find_uuid_by_name(name)
             mc_player_info = MCPlayerInfo(uuid=player_uuid, name=name)
             session.add(mc_player_info)
+            created = True
         mapping = QQUUIDMapping(qq_id=qq_id, uuid=player_uuid)
         session.add(mapping)
+    if created:
+        _notify_player_info(player_uuid, name)
 
 
 async def create_qq_uuid_mapping(qq_id: str, uuid: str) -> None:
@@ -62,6 +88,7 @@ async def create_qq_uuid_mapping(qq_id: str, uuid: str) -> None:
         aiohttp.ClientError: If an error occurs while fetching data from Mojang API.
         asyncio.TimeoutError: If the request to Mojang API times out.
     """
+    player_name = None
     async with get_session_scope() as session:
         mc_player_info = await session.get(MCPlayerInfo, uuid)
         if not mc_player_info:
@@ -70,6 +97,8 @@ async def create_qq_uuid_mapping(qq_id: str, uuid: str) -> None:
             session.add(mc_player_info)
         mapping = QQUUIDMapping(qq_id=qq_id, uuid=uuid)
         session.add(mapping)
+    if player_name is not None:
+        _notify_player_info(uuid, player_name)
 
 
 async def delete_qq_uuid_mapping(qq_id: str) -> None:
@@ -91,6 +120,46 @@ async def create_or_update_mc_player_info(uuid: str, name: str) -> None:
         else:
             mc_player_info = MCPlayerInfo(uuid=uuid, name=name)
             session.add(mc_player_info)
+    _notify_player_info(uuid, name)
+
+
+async def get_mc_player_infos(limit: int) -> dict[str, str]:
+    """
+    Get at most `limit` players as a mapping from UUID to player name.
+    """
+    async with get_session_scope() as session:
+        query = select(MCPlayerInfo.uuid, MCPlayerInfo.name).limit(limit)
+        return {uuid: name for uuid, name in await session.execute(query)}
+
+
+async def upsert_mc_player_infos(players: dict[str, str]) -> int:
+    """
+    Create or update players with one INSERT ... ON CONFLICT DO UPDATE statement.
+
+    Rows whose name hasn't changed are not touched.
+    Listeners are not notified, the caller updates its own cache.
+
+    Args:
+        players: Mapping from UUID to player name.
+
+    Returns:
+        int: Number of rows inserted or updated.
+    """
+    if not players:
+        return 0
+    async with get_session_scope() as session:
+        dialect_name = session.get_bind(MCPlayerInfo).dialect.name
+        insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+        statement = insert(MCPlayerInfo).values(
+            [{"uuid": uuid, "name": name} for uuid, name in players.items()]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[MCPlayerInfo.uuid],
+            set_={"name": statement.excluded.name},
+            where=MCPlayerInfo.name != statement.excluded.name,
+        )
+        result = await session.execute(statement)
+        return result.rowcount
 
 
 async def delete_mc_player_info(uuid: str) -> None:
@@ -103,3 +172,4 @@ async def delete_mc_player_info(uuid: str) -> None:
     async with get_session_scope() as session:
         if result := await session.get(MCPlayerInfo, uuid):
             await session.delete(result)
+    _notify_player_info(uuid, None)
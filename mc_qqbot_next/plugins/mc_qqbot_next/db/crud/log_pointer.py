@@ -0,0 +1,35 @@
+from sqlalchemy import delete, select
+
+from ..model import LogPointer
+from . import get_session_scope
+
+
+async def get_all_log_pointers() -> list[LogPointer]:
+    """
+    Get all saved log pointers
+
+    becareful, the objects returned are expunged from session
+    """
+    async with get_session_scope() as session:
+        log_pointers = list(await session.scalars(select(LogPointer)))
+        session.expunge_all()
+        return log_pointers
+
+
+async def save_log_pointers(log_pointers: list[LogPointer]) -> None:
+    """
+    Create or update log pointers in one transaction
+    """
+    async with get_session_scope() as session:
+        for log_pointer in log_pointers:
+            await session.merge(log_pointer)
+
+
+async def delete_log_pointers(server_names: list[str]) -> None:
+    """
+    Delete log pointers of the given servers
+    """
+    async with get_session_scope() as session:
+        await session.execute(
+            delete(LogPointer).where(LogPointer.server_name.in_(server_names))
+        )
@@ -1,7 +1,7 @@
 import time
 
 from nonebot_plugin_orm import Model
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
@@ -29,3 +29,13 @@ class MessageTarget(Model):
     target_server: Mapped[str | None] = mapped_column(default=None)
     target_player: Mapped[str | None] = mapped_column(default=None)
     created_at: Mapped[int] = mapped_column(insert_default=lambda: int(time.time()))
+
+
+class LogPointer(Model):
+    __tablename__ = "log_pointer"
+    server_name: Mapped[str] = mapped_column(primary_key=True, autoincrement=False)
+    pointer: Mapped[int] = mapped_column(BigInteger)
+    file_inode: Mapped[int | None] = mapped_column(BigInteger, default=None)
+    file_head_size: Mapped[int | None] = mapped_column(default=None)
+    file_head_digest: Mapped[str | None] = mapped_column(default=None)
+    updated_at: Mapped[int] = mapped_column(insert_default=lambda: int(time.time()))
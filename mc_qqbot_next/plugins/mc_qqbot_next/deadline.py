@@ -0,0 +1,101 @@
+"""
+命令处理的时限
+
+每个命令处理函数用 with_deadline 设置一个总时限，通过 ContextVar 传到 docker.py 里的各个操作。
+每个操作有自己默认的时限，命令剩下的时间更少时以剩下的为准，超时的时候取消底层的 RCON 请求或者子进程，
+所以服务器半死不活的时候，处理函数也会按时结束，不会越积越多。
+"""
+
+import asyncio
+import contextvars
+import functools
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from contextlib import contextmanager
+from typing import Any, ParamSpec, TypeVar
+
+from .config import config
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+# 当前命令的截止时间，time.monotonic()，None 表示没有时限
+_deadline = contextvars.ContextVar[float | None]("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    在这个上下文中的操作最多再用 seconds 秒，外层已经有更早的截止时间时以外层为准
+    """
+    new_deadline = time.monotonic() + seconds
+    current_deadline = _deadline.get()
+    if current_deadline is not None:
+        new_deadline = min(new_deadline, current_deadline)
+    token = _deadline.set(new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(budget: float) -> float:
+    """
+    一个默认时限为 budget 的操作实际可以用的秒数，已经过了截止时间时为 0
+    """
+    current_deadline = _deadline.get()
+    if current_deadline is None:
+        return budget
+    return max(0, min(budget, current_deadline - time.monotonic()))
+
+
+async def run_with_deadline(awaitable: Awaitable[T], budget: float) -> T:
+    """
+    在剩下的时间内等待 awaitable，超时时取消它
+
+    Raises:
+        asyncio.TimeoutError: 超时，或者开始之前就已经过了截止时间
+    """
+    timeout = remaining(budget)
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise asyncio.TimeoutError("Deadline exceeded")
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+def with_deadline(seconds: float | None = None):
+    """
+    给命令处理函数设置总时限，默认为 config.mc_command_deadline_seconds
+
+    Example:
+        @ban.handle()
+        @with_deadline()
+        async def handle_ban(...):
+            ...
+    """
+
+    def decorator(
+        handler: Callable[P, Coroutine[Any, Any, T]],
+    ) -> Callable[P, Coroutine[Any, Any, T]]:
+        @functools.wraps(handler)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            with deadline(
+                seconds if seconds is not None else config.mc_command_deadline_seconds
+            ):
+                return await handler(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def create_background_task(coro: Coroutine[Any, Any, T]) -> asyncio.Task[T]:
+    """
+    创建不受当前命令时限影响的后台任务
+
+    后台任务会复制创建时的 ContextVar，从命令里触发的刷新、探测和重启不应该继承命令的时限
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return asyncio.create_task(coro, context=context)
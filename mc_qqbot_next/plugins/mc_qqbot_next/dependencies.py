@@ -10,6 +10,7 @@ from .config import config
 from .db.crud.binding import get_player_name_by_qq_id
 from .db.crud.message import get_message_target_by_message_id
 from .docker import (
+    AmbiguousServerNameError,
     get_running_server_name_with_lowest_port,
     locate_server_name_with_prefix,
 )
@@ -31,12 +32,22 @@ class CommandTarget:
     is_explicit: bool
 
 
+def format_ambiguous_server_name(e: AmbiguousServerNameError) -> str:
+    """
+    前缀匹配到多个服务器时回复的消息
+    """
+    return f"/{e.prefix} 匹配到了多个服务器：{', '.join(e.server_names)}，请写得更具体一些"
+
+
 async def extract_content_and_target_from_str(command: str) -> tuple[str, str | None]:
     """
     见 extract_content_and_target
     
     Returns:
         tuple[str, str | None, bool]: (command_content, target_server)
+
+    Raises:
+        AmbiguousServerNameError: 指定的服务器前缀匹配到了多个服务器
     """
     match = re.search(r"\s*/(\S+)$", command)
     if match:
@@ -70,7 +81,12 @@ async def extract_arg_and_target(
         CommandTarget(arg='/hello', target_server='test', is_explicit=True)
     """
     text = msg.extract_plain_text()
-    command_content, target_server = await extract_content_and_target_from_str(text)
+    try:
+        command_content, target_server = await extract_content_and_target_from_str(
+            text
+        )
+    except AmbiguousServerNameError as e:
+        await matcher.finish(format_ambiguous_server_name(e))
     is_explicit = target_server is not None
     
     if target_server is None:
@@ -1,12 +1,96 @@
 import asyncio
-from typing import Literal
+import json
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any, Literal
 
 from minecraft_docker_manager_lib.manager import DockerMCManager
 
 from .config import config
+from .deadline import remaining, run_with_deadline
+from .docker_api import DockerEngineClient
 from .log import logger
+from .mc import parse_list_players_response
+from .rcon import RCONPoolManager
+from .rcon_scheduler import RCONPriority, RCONScheduler, rcon_priority
+from .server_health import CircuitOpenError, ServerHealthTracker
+from .server_registry import ServerRegistry
+from .slp import SLPError, ping_server
 
 docker_mc_manager = DockerMCManager(config.mc_servers_root_path)
+# 配置了 Docker socket 时，容器状态相关的操作直接调用 Docker Engine API
+docker_engine = (
+    DockerEngineClient(
+        config.mc_docker_socket_path,
+        timeout_seconds=config.mc_docker_api_timeout_seconds,
+    )
+    if config.mc_docker_socket_path
+    else None
+)
+# 配置了 RCON 密码时直接连接服务器的 RCON 端口并保持连接，否则每条命令都通过 docker 命令行发送
+rcon_pools = (
+    RCONPoolManager(
+        config.mc_rcon_host,
+        config.mc_rcon_password,
+        pool_size=config.mc_rcon_pool_size,
+        timeout_seconds=config.mc_rcon_timeout_seconds,
+    )
+    if config.mc_rcon_password
+    else None
+)
+rcon_scheduler = RCONScheduler(config.mc_rcon_max_concurrency)
+# 只读的命令，同一个服务器上同时在排队或者执行的相同命令只发送一次
+READ_ONLY_RCON_COMMANDS = frozenset(
+    {
+        "list",
+        "list uuids",
+        "banlist",
+        "banlist players",
+        "banlist ips",
+        "whitelist list",
+    }
+)
+
+
+# 服务器名称 -> ((compose 文件的修改时间, 大小), 解析出来的服务器信息)
+_server_info_cache = dict[str, tuple[tuple[int, int], Any]]()
+
+
+async def get_server_info(server_name: str):
+    """
+    获取 Minecraft 服务器的信息（游戏端口、RCON 端口、版本等）
+
+    解析结果按 compose 文件的修改时间和大小缓存，文件没变时只需要一次 stat
+    """
+    instance = docker_mc_manager.get_instance(server_name)
+    compose_file_path = await instance.get_compose_file_path()
+    try:
+        compose_file_stat = compose_file_path.stat()
+    except OSError:
+        _server_info_cache.pop(server_name, None)
+        return await instance.get_server_info()
+    key = (compose_file_stat.st_mtime_ns, compose_file_stat.st_size)
+    cached = _server_info_cache.get(server_name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    server_info = await instance.get_server_info()
+    _server_info_cache[server_name] = (key, server_info)
+    return server_info
+
+
+async def get_game_port(server_name: str) -> int:
+    """
+    获取 Minecraft 服务器的游戏端口
+    """
+    return (await get_server_info(server_name)).game_port
+
+
+server_registry = ServerRegistry(
+    discover_running_server_names=lambda: docker_mc_manager.get_running_server_names(),
+    get_game_port=get_game_port,
+    get_excluded_server_names=lambda: config.mc_excluded_servers,
+    ttl_seconds=config.mc_server_registry_ttl_seconds,
+)
 
 
 async def get_running_server_names():
@@ -14,13 +98,14 @@ async def get_running_server_names():
     获取所有运行中的 Minecraft 服务器名称
     会过滤掉 config.excluded_servers 中的服务器
     """
-    running_servers = await docker_mc_manager.get_running_server_names()
-    return list(
-        filter(
-            lambda server_name: server_name not in config.mc_excluded_servers,
-            running_servers,
-        )
-    )
+    return await server_registry.get_running_server_names()
+
+
+async def get_all_server_names():
+    """
+    获取所有 Minecraft 服务器名称，包括没有运行的
+    """
+    return await docker_mc_manager.get_all_server_names()
 
 
 async def get_port_sorted_running_server_names():
@@ -28,15 +113,7 @@ async def get_port_sorted_running_server_names():
     获取所有运行中的 Minecraft 服务器名称，并按照端口号排序
     会过滤掉 config.excluded_servers 中的服务器
     """
-    running_servers = await get_running_server_names()
-    servers_info = await asyncio.gather(
-        *[
-            docker_mc_manager.get_instance(server_name).get_server_info()
-            for server_name in running_servers
-        ]
-    )
-    servers_info = sorted(servers_info, key=lambda server_info: server_info.game_port)
-    return [server_info.name for server_info in servers_info]
+    return await server_registry.get_running_server_names()
 
 
 async def get_running_server_name_with_lowest_port():
@@ -50,24 +127,108 @@ async def get_running_server_name_with_lowest_port():
     return None
 
 
+async def _execute_rcon_commands(server_name: str, commands: list[str]) -> list[str]:
+    if rcon_pools is None:
+        instance = docker_mc_manager.get_instance(server_name)
+        return [await instance.send_command_rcon(command) for command in commands]
+    rcon_port = (await get_server_info(server_name)).rcon_port
+    return await rcon_pools.get_pool(server_name, rcon_port).send_commands(commands)
+
+
+async def _send_rcon_commands(
+    server_name: str, commands: list[str], track_health: bool = False
+) -> list[str]:
+    """
+    Args:
+        track_health: 是否记录到 server_health，熔断中的服务器直接抛出 CircuitOpenError
+    """
+    coalesce_key = (
+        "rcon:" + "\n".join(commands)
+        if all(command in READ_ONLY_RCON_COMMANDS for command in commands)
+        else None
+    )
+    if track_health:
+        # 超时从拿到空位开始计算，排队的时间不算服务器的问题
+        return await server_health.call(
+            server_name,
+            lambda: _execute_rcon_commands(server_name, commands),
+            config.mc_rcon_timeout_seconds,
+            schedule=lambda operation: rcon_scheduler.submit(
+                server_name, operation, coalesce_key
+            ),
+        )
+    # 排队的时间也算在超时里
+    return await run_with_deadline(
+        rcon_scheduler.submit(
+            server_name,
+            lambda: _execute_rcon_commands(server_name, commands),
+            coalesce_key,
+        ),
+        config.mc_rcon_timeout_seconds,
+    )
+
+
 async def send_rcon_command(server_name: str, command: str):
     """
     向 Minecraft 服务器发送 RCON 命令
     """
     logger.info(f"Sending RCON command to {server_name}: {command}")
-    result = await docker_mc_manager.get_instance(server_name).send_command_rcon(
-        command
-    )
+    (result,) = await _send_rcon_commands(server_name, [command])
     logger.info(f"RCON command result: {result}")
     return f"[{server_name}] {result}"
 
 
+async def send_rcon_commands(server_name: str, commands: list[str]):
+    """
+    向 Minecraft 服务器按顺序发送多条 RCON 命令
+    使用 RCON 连接池时，这些命令会一次性写到同一个连接上
+    """
+    logger.info(f"Sending RCON commands to {server_name}: {commands}")
+    results = await _send_rcon_commands(server_name, commands)
+    logger.info(f"RCON command results: {results}")
+    return [f"[{server_name}] {result}" for result in results]
+
+
+async def stream_rcon_command(server_name: str, command: str) -> AsyncIterator[str]:
+    """
+    向 Minecraft 服务器发送 RCON 命令，分段返回输出
+    输出很长时服务器会拆成多个数据包，使用 RCON 连接池时每个数据包到达后就返回
+    """
+    logger.info(f"Sending RCON command to {server_name}: {command}")
+    if rcon_pools is None:
+        (result,) = await _send_rcon_commands(server_name, [command])
+        yield result
+        return
+    rcon_port = (await get_server_info(server_name)).rcon_port
+    # 输出全部收完之前一直占着这个服务器的一个并发名额
+    async with rcon_scheduler.slot(server_name):
+        chunks = rcon_pools.get_pool(server_name, rcon_port).stream_command(command)
+        try:
+            # 每一段都要在剩下的时间内到达
+            while (
+                chunk := await run_with_deadline(
+                    anext(chunks, None), config.mc_rcon_timeout_seconds
+                )
+            ) is not None:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+
 async def restart_server(server_name: str):
     """
     重启 Minecraft 服务器
     """
     logger.info(f"Restarting {server_name}")
-    return await docker_mc_manager.get_instance(server_name).restart()
+    # 容器不存在时交给 compose 处理
+    if docker_engine is not None and await run_with_deadline(
+        docker_engine.restart(server_name), config.mc_restart_timeout_seconds
+    ):
+        return
+    return await run_with_deadline(
+        docker_mc_manager.get_instance(server_name).restart(),
+        config.mc_restart_timeout_seconds,
+    )
 
 
 async def healthy(server_name: str):
@@ -75,7 +236,28 @@ async def healthy(server_name: str):
     检查 Minecraft 服务器是否健康
     """
     logger.trace(f"Checking health of {server_name}")
-    return await docker_mc_manager.get_instance(server_name).healthy()
+    if docker_engine is not None:
+        return await run_with_deadline(
+            docker_engine.healthy(server_name), config.mc_docker_api_timeout_seconds
+        )
+    return await run_with_deadline(
+        docker_mc_manager.get_instance(server_name).healthy(),
+        config.mc_docker_api_timeout_seconds,
+    )
+
+
+async def paused(server_name: str):
+    """
+    检查 Minecraft 服务器是否被暂停
+    """
+    if docker_engine is not None:
+        return await run_with_deadline(
+            docker_engine.paused(server_name), config.mc_docker_api_timeout_seconds
+        )
+    return await run_with_deadline(
+        docker_mc_manager.get_instance(server_name).paused(),
+        config.mc_docker_api_timeout_seconds,
+    )
 
 
 async def get_instance(server_name: str):
@@ -86,6 +268,25 @@ async def get_instance(server_name: str):
     return docker_mc_manager.get_instance(server_name)
 
 
+async def get_log_path(server_name: str) -> Path:
+    """
+    获取 Minecraft 服务器 latest.log 的路径
+    """
+    project_path = docker_mc_manager.get_instance(server_name).get_project_path()
+    return project_path / "data" / "logs" / "latest.log"
+
+
+class AmbiguousServerNameError(Exception):
+    """
+    前缀匹配到了多个服务器
+    """
+
+    def __init__(self, prefix: str, server_names: list[str]):
+        super().__init__(f"Prefix {prefix} matches {server_names}")
+        self.prefix = prefix
+        self.server_names = server_names
+
+
 async def locate_server_name_with_prefix(prefix: str):
     """
     通过前缀查找匹配的服务器名称
@@ -96,28 +297,83 @@ async def locate_server_name_with_prefix(prefix: str):
     Returns:
         str | None:
             - 如果找到完全匹配的服务器名称，返回该名称
-            - 如果找到前缀匹配的服务器名称，返回第一个匹配的名称
+            - 如果只有一个服务器名称以该前缀开头，返回该名称
             - 如果没有找到匹配的服务器名称，返回 None
 
+    Raises:
+        AmbiguousServerNameError: 有多个服务器名称以该前缀开头
+
     Example:
         假设服务器列表为 ['test1', 'test2', 'prod']
         - locate_server_name('test1') 返回 'test1'
-        - locate_server_name('test') 返回 'test1'
+        - locate_server_name('p') 返回 'prod'
+        - locate_server_name('test') 抛出 AmbiguousServerNameError
         - locate_server_name('dev') 返回 None
     """
     logger.debug(f"Locating server name with prefix: {prefix}")
-    all_server_names = await get_port_sorted_running_server_names()
-    if prefix in all_server_names:
-        logger.debug(f"Found exact match: {prefix}")
-        return prefix
-    for server_name in all_server_names:
-        if server_name.startswith(prefix):
-            logger.debug(f"Found prefix match: {server_name}")
-            return server_name
+    server_names = await server_registry.locate_server_names(prefix)
+    if len(server_names) > 1:
+        logger.debug(f"Found multiple matches: {server_names}")
+        raise AmbiguousServerNameError(prefix, server_names)
+    if server_names:
+        logger.debug(f"Found match: {server_names[0]}")
+        return server_names[0]
     logger.debug("No match found")
     return None
 
 
+async def list_players_with_slp(server_name: str, timeout: float):
+    """
+    通过 Server List Ping 获取在线玩家列表
+
+    Returns:
+        list[str] | None: 服务器只给出了部分玩家或者查询失败时为 None，需要改用 RCON
+    """
+    game_port = await get_game_port(server_name)
+    try:
+        status = await ping_server(config.mc_slp_host, game_port, timeout)
+    except (OSError, asyncio.TimeoutError, SLPError) as e:
+        logger.warning(f"Failed to ping {server_name}, falling back to RCON: {e!r}")
+        return None
+    if not status.players_complete:
+        logger.debug(
+            f"{server_name} returned {len(status.players)} of {status.online} "
+            "players, falling back to RCON"
+        )
+        return None
+    return status.players
+
+
+async def _list_players(server_name: str, timeout: float) -> list[str]:
+    if config.mc_list_players_method == "slp":
+        players = await list_players_with_slp(server_name, timeout)
+        if players is not None:
+            return players
+    # 调用方已经占了 RCON 调度的空位，这里直接用连接池发送，不再排一次队
+    (response,) = await _execute_rcon_commands(server_name, ["list"])
+    return parse_list_players_response(response)
+
+
+async def _probe_server(server_name: str):
+    # 已经停止的服务器不需要再探测，当作已经恢复
+    if server_name not in await get_running_server_names():
+        return
+    with rcon_priority(RCONPriority.BACKGROUND):
+        await rcon_scheduler.submit(
+            server_name,
+            lambda: _list_players(server_name, config.mc_list_players_timeout_seconds),
+        )
+
+
+server_health = ServerHealthTracker(
+    probe=_probe_server,
+    failure_threshold=config.mc_circuit_failure_threshold,
+    probe_interval_seconds=config.mc_circuit_probe_interval_seconds,
+    timeout_multiplier=config.mc_adaptive_timeout_multiplier,
+    min_timeout_seconds=config.mc_adaptive_timeout_min_seconds,
+)
+
+
 async def list_players(
     server_name: str, timeout: int = config.mc_list_players_timeout_seconds
 ):
@@ -126,21 +382,37 @@ async def list_players(
 
     Args:
         server_name (str): 服务器名称
-        timeout (int): 超时时间
+        timeout (int): 最长的超时时间，服务器平时响应很快或者命令剩下的时间不多时会更短
 
     Returns:
-        list[str] | None: 在线玩家列表或获取失败时为 None
+        list[str] | None: 在线玩家列表或获取失败时为 None，熔断中的服务器直接返回 None
     """
-    instance = docker_mc_manager.get_instance(server_name)
-    if await instance.paused():
-        logger.warning(f"Server {server_name} is paused")
-        return list[str]()
-    task = instance.list_players()
+    if remaining(timeout) <= 0:
+        logger.warning(f"No time left to list players for {server_name}")
+        return None
     try:
-        return await asyncio.wait_for(task, timeout)
+        if await paused(server_name):
+            logger.warning(f"Server {server_name} is paused")
+            return list[str]()
+        # 超时从拿到空位开始计算，服务器用满了超时还没响应才记为一次失败；
+        # 同时查询同一个服务器的调用共用一次查询
+        return await server_health.call(
+            server_name,
+            lambda: _list_players(
+                server_name, server_health.timeout(server_name, timeout)
+            ),
+            timeout,
+            schedule=lambda operation: rcon_scheduler.submit(
+                server_name, operation, coalesce_key="list_players"
+            ),
+        )
+    except CircuitOpenError:
+        logger.debug(f"Skipping {server_name} because its circuit is open")
+        return None
     except asyncio.TimeoutError:
         logger.warning(
-            f"Timeout when listing players for {server_name}. timeout={timeout}"
+            f"Timeout when listing players for {server_name}. "
+            f"timeout={server_health.timeout(server_name, timeout)}"
         )
         return None
     except RuntimeError as e:
@@ -203,17 +475,75 @@ ColorsT = Literal[
 ]
 
 
+# RCON 请求数据包内容的最大字节数，超过的命令会被服务器拒绝
+RCON_MAX_COMMAND_BYTES = 1446
+
+
+def _tell_raw_command(text: str, target: str, color: ColorsT) -> str:
+    component = json.dumps({"text": text, "color": color}, ensure_ascii=False)
+    return f"tellraw {target} {component}"
+
+
+def _split_long_line(line: str, target: str, color: ColorsT) -> list[str]:
+    parts = list[str]()
+    while line:
+        # 二分查找这一行最多能放进一条命令的前缀
+        low, high = 1, len(line)
+        while low < high:
+            middle = (low + high + 1) // 2
+            command = _tell_raw_command(line[:middle], target, color)
+            if len(command.encode()) <= RCON_MAX_COMMAND_BYTES:
+                low = middle
+            else:
+                high = middle - 1
+        parts.append(line[:low])
+        line = line[low:]
+    return parts
+
+
+def build_tell_raw_commands(
+    message: str, target: str = "@a", color: ColorsT = "yellow"
+) -> list[str]:
+    """
+    把消息渲染成 tellraw 命令，多行消息放在同一个文本组件里用换行分隔
+
+    文本组件用 JSON 编码，不需要手动转义引号和反斜杠。
+    一般只有一条命令，超过服务器的命令长度限制时，按行拆成多条，单独一行太长的话按字符拆开
+    """
+    lines = list[str]()
+    for line in message.splitlines():
+        if (
+            len(_tell_raw_command(line, target, color).encode())
+            > RCON_MAX_COMMAND_BYTES
+        ):
+            lines.extend(_split_long_line(line, target, color))
+        else:
+            lines.append(line)
+
+    commands = list[str]()
+    text = None
+    for line in lines:
+        if text is not None:
+            command = _tell_raw_command(f"{text}\n{line}", target, color)
+            if len(command.encode()) <= RCON_MAX_COMMAND_BYTES:
+                text = f"{text}\n{line}"
+                continue
+            commands.append(_tell_raw_command(text, target, color))
+        text = line
+    if text is not None:
+        commands.append(_tell_raw_command(text, target, color))
+    return commands
+
+
 async def tell_raw(
     message: str,
     server_name: str,
     target: str = "@a",
     color: ColorsT = "yellow",
 ):
-    message = message.replace("\\", "\\\\").replace('"', '\\"')
-    for line in message.splitlines():
-        await send_rcon_command(
-            server_name, f'tellraw {target} {{"text": "{line}", "color": "{color}"}}'
-        )
+    await send_rcon_commands(
+        server_name, build_tell_raw_commands(message, target, color)
+    )
 
 
 async def send_message(
@@ -243,8 +573,13 @@ async def send_message(
         target_player = "@a"
 
     logger.info(f"Sending {message} to {target_player} in {target_servers}")
+    if remaining(config.mc_rcon_timeout_seconds) <= 0:
+        logger.warning(f"No time left to send {message}")
+        return target_servers
+    # 熔断中的服务器直接算作发送失败，其余的服务器最多等待自适应超时
+    commands = build_tell_raw_commands(message, target_player, color)
     tasks = [
-        tell_raw(message, server_name, target_player, color)
+        _send_rcon_commands(server_name, commands, track_health=True)
         for server_name in target_servers
     ]
     result = await asyncio.gather(*tasks, return_exceptions=True)
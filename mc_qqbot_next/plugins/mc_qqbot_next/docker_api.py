@@ -0,0 +1,205 @@
+"""
+通过 unix socket 直接调用 Docker Engine API
+
+查询容器状态、健康检查、暂停状态、重启和事件流都不再需要启动 docker 命令行子进程，
+所有请求复用同一个连接池。compose 相关的操作仍然交给 minecraft_docker_manager_lib。
+"""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import aiohttp
+
+from .log import logger
+from .server_registry import (
+    COMPOSE_PROJECT_LABEL,
+    ContainerEvent,
+    parse_container_event,
+)
+
+# 通过 unix socket 访问时主机名没有意义，只是用来拼接 URL
+DOCKER_API_BASE_URL = "http://docker"
+
+
+class DockerAPIError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+
+
+class DockerEngineClient:
+    """
+    Docker Engine API 客户端
+
+    服务器名称就是容器的 compose 项目名称，查到的容器 ID 会缓存起来，
+    容器被重新创建导致 ID 失效时会重新查询一次。
+
+    Args:
+        socket_path: Docker 守护进程的 unix socket 路径
+        timeout_seconds: 普通请求的超时时间，重启和事件流不受限制
+        pool_size: 连接池的最大连接数
+    """
+
+    def __init__(self, socket_path: str, timeout_seconds: float, pool_size: int = 10):
+        self._socket_path = socket_path
+        self._timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        self._pool_size = pool_size
+        self._session: aiohttp.ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._container_ids = dict[str, str]()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 会话和连接池绑定在创建时的事件循环上
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                base_url=DOCKER_API_BASE_URL,
+                connector=aiohttp.UnixConnector(
+                    path=self._socket_path, limit=self._pool_size
+                ),
+                timeout=self._timeout,
+            )
+            self._loop = loop
+        return self._session
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, str] | None = None,
+        timeout: aiohttp.ClientTimeout | None = None,
+    ) -> Any:
+        async with self._get_session().request(
+            method, path, params=params, timeout=timeout or self._timeout
+        ) as response:
+            if response.status >= 400:
+                try:
+                    message = (await response.json()).get("message", "")
+                except (aiohttp.ContentTypeError, json.JSONDecodeError):
+                    message = await response.text()
+                raise DockerAPIError(response.status, message)
+            if response.status == 204:
+                return None
+            return await response.json()
+
+    async def get_container_id(self, server_name: str) -> str | None:
+        """
+        获取服务器的容器 ID，容器不存在时返回 None
+        """
+        container_id = self._container_ids.get(server_name)
+        if container_id is not None:
+            return container_id
+        containers = await self._request(
+            "GET",
+            "/containers/json",
+            params={
+                "all": "true",
+                "filters": json.dumps(
+                    {"label": [f"{COMPOSE_PROJECT_LABEL}={server_name}"]}
+                ),
+            },
+        )
+        if not containers:
+            return None
+        container_id = self._container_ids[server_name] = containers[0]["Id"]
+        return container_id
+
+    async def inspect(self, server_name: str) -> dict[str, Any] | None:
+        """
+        获取服务器容器的详细信息，容器不存在时返回 None
+        """
+        for _ in range(2):
+            container_id = await self.get_container_id(server_name)
+            if container_id is None:
+                return None
+            try:
+                return await self._request("GET", f"/containers/{container_id}/json")
+            except DockerAPIError as e:
+                if e.status != 404:
+                    raise
+                logger.debug(f"Container {container_id} of {server_name} is gone")
+                self._container_ids.pop(server_name, None)
+        return None
+
+    async def _get_state(self, server_name: str) -> dict[str, Any]:
+        container = await self.inspect(server_name)
+        if container is None:
+            return {}
+        return container.get("State", {})
+
+    async def running(self, server_name: str) -> bool:
+        return bool((await self._get_state(server_name)).get("Running"))
+
+    async def paused(self, server_name: str) -> bool:
+        return bool((await self._get_state(server_name)).get("Paused"))
+
+    async def healthy(self, server_name: str) -> bool:
+        """
+        容器有健康检查时以健康检查为准，否则只要在运行且没有暂停就算健康
+        """
+        state = await self._get_state(server_name)
+        health = state.get("Health")
+        if health is not None:
+            return health.get("Status") == "healthy"
+        return bool(state.get("Running")) and not state.get("Paused")
+
+    async def restart(self, server_name: str) -> bool:
+        """
+        重启服务器的容器
+
+        Returns:
+            bool: 容器不存在时返回 False
+        """
+        for _ in range(2):
+            container_id = await self.get_container_id(server_name)
+            if container_id is None:
+                return False
+            try:
+                # 停止 Minecraft 服务器可能需要很久，不设置超时
+                await self._request(
+                    "POST",
+                    f"/containers/{container_id}/restart",
+                    timeout=aiohttp.ClientTimeout(total=None),
+                )
+                return True
+            except DockerAPIError as e:
+                if e.status != 404:
+                    raise
+                self._container_ids.pop(server_name, None)
+        return False
+
+    async def events(self) -> AsyncIterator[ContainerEvent]:
+        """
+        持续获取 compose 容器的启动、停止和健康状态事件
+        """
+        filters = {
+            "type": ["container"],
+            "event": ["start", "stop", "die", "health_status"],
+            "label": [COMPOSE_PROJECT_LABEL],
+        }
+        async with self._get_session().get(
+            "/events",
+            params={"filters": json.dumps(filters)},
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=None),
+        ) as response:
+            if response.status >= 400:
+                raise DockerAPIError(response.status, await response.text())
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                try:
+                    event = parse_container_event(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Invalid docker event: {line!r}")
+                    continue
+                # 容器可能被重新创建了，下次查询时重新获取 ID
+                if event.action == "start" and event.server_name is not None:
+                    self._container_ids.pop(event.server_name, None)
+                yield event
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
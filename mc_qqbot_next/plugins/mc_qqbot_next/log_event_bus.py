@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, Literal, TypeVar
+
+from .config import config
+from .log import logger
+from .log_events import LogEvent
+
+EventT = TypeVar("EventT", bound=LogEvent)
+LogEventHandler = Callable[[str, list[EventT]], Awaitable[None]]
+# 队列满了之后：丢掉最早的事件、丢掉新来的事件，或者让读日志的一方等待
+DropPolicyT = Literal["drop_oldest", "drop_newest", "block"]
+
+
+@dataclass
+class LogEventQueueStats:
+    """
+    单个服务器事件队列的统计
+
+    Attributes:
+        depth (int): 当前排队的事件数
+        published (int): 进入队列的事件总数
+        delivered (int): 处理完的事件总数
+        dropped (int): 因为队列满了被丢掉的事件总数
+        last_latency (float): 最近一批事件从入队到处理完的秒数
+        max_latency (float): 入队到处理完的最大秒数
+    """
+
+    depth: int = 0
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    last_latency: float = 0
+    max_latency: float = 0
+
+
+class LogEventBus:
+    """
+    按事件类型分发日志事件
+
+    读日志的一方只负责把事件放进每个服务器各自的有界队列，
+    由每个服务器的投递 worker 调用处理函数，所以 QQ 接口再慢也不会拖慢读日志。
+    同一服务器的事件按顺序处理，worker 每次把队列中已有的事件一起取出，
+    连续的同一类型事件一次性交给处理函数，不同类型的事件之间仍然保持日志中的先后顺序。
+    处理函数按订阅顺序依次执行，某个处理函数出错不会影响其他处理函数。
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 0,
+        drop_policy: DropPolicyT = "block",
+        drain_seconds: float = 10,
+    ):
+        self._handlers = defaultdict[type, list[LogEventHandler[Any]]](list)
+        self._queue_size = queue_size
+        self._drop_policy = drop_policy
+        self._drain_seconds = drain_seconds
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queues = dict[str, asyncio.Queue[tuple[float, LogEvent]]]()
+        self._workers = dict[str, asyncio.Task]()
+        self.stats = defaultdict[str, LogEventQueueStats](LogEventQueueStats)
+
+    def subscribe(self, event_type: type[EventT]):
+        """
+        订阅某种事件，被装饰的函数接收 (服务器名称, 事件列表)
+        """
+
+        def decorator(handler: LogEventHandler[EventT]) -> LogEventHandler[EventT]:
+            self._handlers[event_type].append(handler)
+            return handler
+
+        return decorator
+
+    async def publish(self, server_name: str, events: list[LogEvent]):
+        """
+        把事件放进服务器的队列，按 drop_policy 处理队列已满的情况
+        """
+        queue = self._get_queue(server_name)
+        stats = self.stats[server_name]
+        enqueued_at = time.perf_counter()
+        dropped = 0
+        for event in events:
+            if queue.full():
+                if self._drop_policy == "drop_newest":
+                    dropped += 1
+                    continue
+                if self._drop_policy == "drop_oldest":
+                    queue.get_nowait()
+                    queue.task_done()
+                    dropped += 1
+            await queue.put((enqueued_at, event))
+            stats.published += 1
+        stats.dropped += dropped
+        stats.depth = queue.qsize()
+        if dropped:
+            logger.warning(
+                f"Log event queue of {server_name} is full, dropped {dropped} events"
+            )
+
+    async def join(self):
+        """
+        等待所有已经入队的事件处理完
+        """
+        await asyncio.gather(*[queue.join() for queue in self._queues.values()])
+
+    async def close(self):
+        """
+        最多等待 drain_seconds 秒处理完已经入队的事件，然后停止所有 worker
+        """
+        if self._loop is asyncio.get_running_loop() and self._queues:
+            try:
+                await asyncio.wait_for(self.join(), self._drain_seconds)
+            except asyncio.TimeoutError:
+                queued = sum(queue.qsize() for queue in self._queues.values())
+                logger.warning(
+                    f"Timed out draining log events, dropping {queued} queued events"
+                )
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+        self._queues.clear()
+
+    def _get_queue(self, server_name: str):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 队列和 worker 绑定在事件循环上，事件循环换了（比如测试中）就重新创建
+            self._loop = loop
+            self._queues.clear()
+            self._workers.clear()
+        queue = self._queues.get(server_name)
+        if queue is None:
+            queue = asyncio.Queue[tuple[float, LogEvent]](self._queue_size)
+            self._queues[server_name] = queue
+            self._workers[server_name] = asyncio.create_task(
+                self._deliver(server_name, queue)
+            )
+        return queue
+
+    async def _deliver(
+        self, server_name: str, queue: asyncio.Queue[tuple[float, LogEvent]]
+    ):
+        stats = self.stats[server_name]
+        while True:
+            items = [await queue.get()]
+            while not queue.empty():
+                items.append(queue.get_nowait())
+            try:
+                await self._dispatch(server_name, [event for _, event in items])
+            finally:
+                latency = time.perf_counter() - items[0][0]
+                stats.last_latency = latency
+                stats.max_latency = max(stats.max_latency, latency)
+                stats.delivered += len(items)
+                stats.depth = queue.qsize()
+                for _ in items:
+                    queue.task_done()
+
+    async def _dispatch(self, server_name: str, events: list[LogEvent]):
+        for event_type, typed_events_iter in itertools.groupby(events, key=type):
+            typed_events = list(typed_events_iter)
+            for handler in self._handlers.get(event_type, []):
+                try:
+                    await handler(server_name, typed_events)
+                except Exception:
+                    logger.exception(
+                        f"Error when handling {event_type.__name__} from {server_name}"
+                    )
+
+
+log_event_bus = LogEventBus(
+    queue_size=config.mc_log_event_queue_size,
+    drop_policy=config.mc_log_event_drop_policy,
+    drain_seconds=config.mc_log_event_drain_seconds,
+)
@@ -0,0 +1,226 @@
+"""
+把 Minecraft 日志分类成事件
+
+不再逐行拆分和匹配：先用带字面量前缀的组合正则在整段文本上定位可能的事件，
+正则引擎会用字面量前缀快速跳过无关的内容，只有命中的行才会在 Python 中进一步解析。
+每一行都会校验线程名，并且要求命中位置是该行第一个 "]: "，
+防止玩家在聊天中伪造日志格式。
+
+这个模块只依赖标准库，方便单独拿出来做基准测试。
+"""
+
+import re
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ChatEvent:
+    player: str
+    message: str
+
+
+@dataclass(frozen=True)
+class PlayerUUIDEvent:
+    """
+    玩家登录时的 UUID of player xxx is xxx，uuid 不带横线
+    """
+
+    name: str
+    uuid: str
+
+
+@dataclass(frozen=True)
+class PlayerJoinEvent:
+    player: str
+
+
+@dataclass(frozen=True)
+class PlayerLeaveEvent:
+    player: str
+
+
+@dataclass(frozen=True)
+class PlayerDeathEvent:
+    player: str
+    message: str
+
+
+@dataclass(frozen=True)
+class ServerDoneEvent:
+    """
+    服务器启动完成，startup_seconds 为日志中报告的启动耗时
+    """
+
+    startup_seconds: float | None
+
+
+@dataclass(frozen=True)
+class ServerCrashEvent:
+    message: str
+
+
+LogEvent = (
+    ChatEvent
+    | PlayerUUIDEvent
+    | PlayerJoinEvent
+    | PlayerLeaveEvent
+    | PlayerDeathEvent
+    | ServerDoneEvent
+    | ServerCrashEvent
+)
+
+# 原版的死亡消息，玩家名之后的部分
+DEATH_MESSAGE_PHRASES = (
+    "was slain by",
+    "was shot by",
+    "was pummeled by",
+    "was fireballed by",
+    "was killed",
+    "was blown up by",
+    "was squashed",
+    "was squished",
+    "was pricked to death",
+    "was poked to death",
+    "was impaled",
+    "was skewered",
+    "was stung to death",
+    "was struck by lightning",
+    "was burnt to a crisp",
+    "was frozen to death",
+    "was obliterated",
+    "was doomed to fall",
+    "was roasted",
+    "was stomped",
+    "was too soft for this world",
+    "drowned",
+    "died",
+    "blew up",
+    "burned to death",
+    "hit the ground too hard",
+    "fell ",
+    "went up in flames",
+    "went off with a bang",
+    "walked into",
+    "tried to swim in lava",
+    "suffocated in a wall",
+    "starved to death",
+    "withered away",
+    "experienced kinetic energy",
+    "discovered the floor was lava",
+    "didn't want to live",
+    "froze to death",
+    "left the confines of this world",
+)
+
+CRASH_MESSAGE_PREFIXES = (
+    "Encountered an unexpected exception",
+    "This crash report has been saved to",
+    "Considering it to be crashed",
+    "Failed to start the minecraft server",
+)
+
+# 整段日志只扫描一遍。用 "/INFO]"、"/ERROR]"、"/FATAL]" 里的字面量 "/" 和 "]: "
+# 让正则引擎直接跳过大部分内容，刷屏最多的 WARN 行在级别处就会失败；
+# 死亡消息前的前瞻用首字母快速排除绝大多数普通日志。
+# 级别只在这里粗略匹配，是否和事件类型对得上交给后面按线程名检查。
+_EVENT_PATTERN = re.compile(
+    r"/(?:INFO|ERROR|FATAL)\](?: \[[^\]\n]*\])?: (?P<body>"
+    r"(?P<chat>(?:\[Not Secure\] )?<)"
+    r"|(?P<uuid>UUID of player )"
+    r"|(?P<done>Done \()"
+    r"|(?P<crash>" + "|".join(map(re.escape, CRASH_MESSAGE_PREFIXES)) + r")"
+    r"|(?P<player>\w{1,16}) (?=[bdefhjlstw])(?:"
+    r"(?P<join>joined the game$)"
+    r"|(?P<leave>left the game$)"
+    r"|(?P<death>" + "|".join(map(re.escape, DEATH_MESSAGE_PHRASES)) + r")"
+    r"))",
+    re.MULTILINE,
+)
+_UUID_PATTERN = re.compile(r"UUID of player (\w+) is ([a-f0-9\-]{36})$")
+_DONE_PATTERN = re.compile(r"Done \((\d+(?:\.\d+)?)s\)!")
+
+
+def _get_thread_if_first_message(content: str, line_start: int, message_start: int):
+    """
+    解析 [时间] [线程/级别] [logger]: 消息 格式的行头
+
+    Returns:
+        str | None: 当 message_start 是该行第一个 "]: " 之后的位置时返回线程名，否则为 None
+    """
+    if not content.startswith("[", line_start):
+        return None
+    time_end = content.find("] [", line_start, message_start)
+    if time_end == -1:
+        return None
+    thread_end = content.find("]", time_end + 3, message_start)
+    if thread_end == -1:
+        return None
+    if content.find("]: ", thread_end, message_start) != message_start - 3:
+        return None
+    return content[time_end + 3 : thread_end]
+
+
+def classify_log(content: str) -> list[LogEvent]:
+    """
+    把一段日志分类成事件，按在日志中出现的顺序返回
+
+    Examples:
+        [00:00:00] [Server thread/INFO]: <Notch> hello
+        -> ChatEvent(player="Notch", message="hello")
+        [00:00:00] [User Authenticator #1/INFO]: UUID of player Notch is 069a79f4-44e9-4726-a5be-fca90e38aaf5
+        -> PlayerUUIDEvent(name="Notch", uuid="069a79f444e94726a5befca90e38aaf5")
+        [00:00:00] [Server thread/INFO]: Done (12.345s)! For help, type "help"
+        -> ServerDoneEvent(startup_seconds=12.345)
+    """
+    events = list[LogEvent]()
+    for match in _EVENT_PATTERN.finditer(content):
+        message_start = match.start("body")
+        line_start = content.rfind("\n", 0, message_start) + 1
+        thread = _get_thread_if_first_message(content, line_start, message_start)
+        if thread is None:
+            continue
+        line_end = content.find("\n", message_start)
+        if line_end == -1:
+            line_end = len(content)
+        message = content[message_start:line_end].rstrip("\r")
+
+        if match.group("crash"):
+            if thread.endswith(("/ERROR", "/FATAL")):
+                events.append(ServerCrashEvent(message=message))
+        elif not thread.endswith("/INFO"):
+            continue
+        elif match.group("chat"):
+            if thread != "Server thread/INFO" and not thread.startswith(
+                "Async Chat Thread"
+            ):
+                continue
+            message = message.removeprefix("[Not Secure] ")
+            player_end = message.find("> ")
+            player = message[1:player_end]
+            if player_end == -1 or not player or " " in player:
+                continue
+            events.append(ChatEvent(player=player, message=message[player_end + 2 :]))
+        elif match.group("uuid"):
+            if not thread.startswith("User Authenticator"):
+                continue
+            uuid_match = _UUID_PATTERN.match(message)
+            if uuid_match is None:
+                continue
+            name, uuid = uuid_match.groups()
+            events.append(PlayerUUIDEvent(name=name, uuid=uuid.replace("-", "")))
+        elif thread != "Server thread/INFO":
+            continue
+        elif match.group("done"):
+            done_match = _DONE_PATTERN.match(message)
+            if done_match is None:
+                continue
+            events.append(ServerDoneEvent(startup_seconds=float(done_match.group(1))))
+        elif match.group("join"):
+            events.append(PlayerJoinEvent(player=match.group("player")))
+        elif match.group("leave"):
+            events.append(PlayerLeaveEvent(player=match.group("player")))
+        elif match.group("death"):
+            events.append(
+                PlayerDeathEvent(player=match.group("player"), message=message)
+            )
+    return events
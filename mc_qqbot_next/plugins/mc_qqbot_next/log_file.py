@@ -0,0 +1,230 @@
+import asyncio
+import codecs
+import gzip
+import hashlib
+import os
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO
+
+# 文件开头用来识别文件的字节数
+HEAD_FINGERPRINT_SIZE = 1024
+# 流式解压时每次读取的字节数
+ROTATED_LOG_CHUNK_SIZE = 64 * 1024
+# 读取 latest.log 时每次读取的默认字节数
+LOG_CHUNK_SIZE = 256 * 1024
+# 查找轮转后的日志时最多检查的文件数
+ROTATED_LOG_CANDIDATES = 5
+
+
+@dataclass(frozen=True)
+class LogFileIdentity:
+    """
+    日志文件的身份，用来判断指针是否还属于当前的 latest.log
+
+    Attributes:
+        inode (int): 文件的 inode
+        head_size (int): 计算指纹时文件开头的字节数
+        head_digest (str): 文件开头 head_size 字节的 sha1
+    """
+
+    inode: int
+    head_size: int
+    head_digest: str
+
+    def matches(self, log_path: Path) -> bool:
+        """
+        判断 log_path 当前是否还是同一个文件
+        """
+        try:
+            with log_path.open("rb") as f:
+                if os.fstat(f.fileno()).st_ino != self.inode:
+                    return False
+                return self.head_matches(f)
+        except OSError:
+            return False
+
+    def head_matches(self, f: BinaryIO) -> bool:
+        """
+        判断从 f 开头读到的内容是否和指纹一致，f 可以是解压后的文件
+        """
+        head = f.read(self.head_size)
+        return (
+            len(head) == self.head_size
+            and hashlib.sha1(head).hexdigest() == self.head_digest
+        )
+
+
+class LogFileChange(Enum):
+    UNCHANGED = "unchanged"
+    # latest.log 被重命名（并压缩）成了 logs/YYYY-MM-DD-N.log.gz，换成了新文件
+    ROTATED = "rotated"
+    # 还是同一个文件，但是内容被截断或者重写了
+    TRUNCATED = "truncated"
+
+
+def get_log_file_identity(log_path: Path) -> LogFileIdentity | None:
+    """
+    读取日志文件的身份，文件不存在时返回 None
+    """
+    try:
+        with log_path.open("rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            head = f.read(HEAD_FINGERPRINT_SIZE)
+    except OSError:
+        return None
+    return LogFileIdentity(
+        inode=inode,
+        head_size=len(head),
+        head_digest=hashlib.sha1(head).hexdigest(),
+    )
+
+
+def detect_log_file_change(
+    identity: LogFileIdentity | None, pointer: int, log_path: Path
+) -> LogFileChange:
+    """
+    对比保存的文件身份和指针，判断 latest.log 自上次读取之后是否被轮转或截断
+
+    文件暂时不存在时（轮转进行到一半）视为没有变化，下次再检查。
+    """
+    try:
+        stat = log_path.stat()
+    except FileNotFoundError:
+        return LogFileChange.UNCHANGED
+    if identity is not None and stat.st_ino != identity.inode:
+        return LogFileChange.ROTATED
+    if stat.st_size < pointer:
+        return LogFileChange.TRUNCATED
+    if identity is not None and not identity.matches(log_path):
+        return LogFileChange.TRUNCATED
+    return LogFileChange.UNCHANGED
+
+
+def open_log_file(path: Path) -> BinaryIO:
+    """
+    以二进制方式打开日志文件，.gz 结尾的文件会被流式解压
+    """
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rb")  # type: ignore
+    return path.open("rb")
+
+
+def find_rotated_log_file(log_path: Path, identity: LogFileIdentity) -> Path | None:
+    """
+    在 logs 目录中找到 identity 对应的、已经被轮转的日志文件
+
+    Minecraft 会先把 latest.log 重命名为 YYYY-MM-DD-N.log 再压缩成 .log.gz，
+    所以先按 inode 找还没压缩的文件，再按文件开头的指纹找压缩包。
+    只检查最近修改的几个文件。
+    """
+    try:
+        candidates = [
+            path
+            for path in log_path.parent.iterdir()
+            if path.name != log_path.name
+            and (path.name.endswith(".log") or path.name.endswith(".log.gz"))
+        ]
+        candidates.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+    except OSError:
+        return None
+
+    for candidate in candidates[:ROTATED_LOG_CANDIDATES]:
+        try:
+            if candidate.stat().st_ino == identity.inode:
+                return candidate
+            with open_log_file(candidate) as f:
+                if identity.head_matches(f):
+                    return candidate
+        except (OSError, EOFError, gzip.BadGzipFile):
+            continue
+    return None
+
+
+async def read_rotated_log(
+    path: Path, offset: int, chunk_size: int = ROTATED_LOG_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """
+    从 offset 开始流式读取轮转后的日志，每次返回若干完整的行
+
+    压缩包不会整个读进内存，解压在线程中按块进行。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    f = await asyncio.to_thread(open_log_file, path)
+    try:
+        # GzipFile 的 seek 会边解压边丢弃，不会占用额外内存
+        await asyncio.to_thread(f.seek, offset)
+        partial_line = ""
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            content = partial_line + decoder.decode(chunk, final=not chunk)
+            if not chunk:
+                if content:
+                    yield content
+                return
+            last_newline = content.rfind("\n")
+            if last_newline == -1:
+                partial_line = content
+                continue
+            partial_line = content[last_newline + 1 :]
+            yield content[: last_newline + 1]
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _find_line_boundary(chunk: bytes, is_full_chunk: bool) -> int:
+    """
+    返回 chunk 中最后一个完整行之后的位置，没有完整的行时返回 0
+
+    一整块都没有换行（一行超过了块大小）时直接在块尾切开，
+    切开的位置会退到 UTF-8 字符的边界上。
+    """
+    boundary = chunk.rfind(b"\n") + 1
+    if boundary or not is_full_chunk:
+        return boundary
+    boundary = len(chunk)
+    # 0b10xxxxxx 是多字节字符的后续字节
+    while boundary > 1 and chunk[boundary - 1] & 0xC0 == 0x80:
+        boundary -= 1
+    if chunk[boundary - 1] & 0xC0 == 0xC0:
+        boundary -= 1
+    return boundary or len(chunk)
+
+
+async def read_log_lines(
+    path: Path,
+    offset: int,
+    end: int | None = None,
+    chunk_size: int = LOG_CHUNK_SIZE,
+) -> AsyncIterator[tuple[str, int]]:
+    """
+    用 os.pread 从 offset 开始按块读取日志，每次返回若干完整的行和读完这些行之后的指针
+
+    最后一行还没写完时不会返回，指针停在这一行开头，下次从这里重新读取。
+    只有调用方处理完上一块之后才会读取下一块，所以无论一次新增了多少日志，
+    内存中最多只有一块内容。
+
+    Args:
+        path (Path): 日志文件路径
+        offset (int): 开始读取的字节位置
+        end (int | None): 读取到的字节位置，默认为打开文件时的文件大小，
+            防止日志写得比处理得快时一直读不完
+        chunk_size (int): 每次读取的字节数
+    """
+    fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+    try:
+        if end is None:
+            end = os.fstat(fd).st_size
+        pointer = offset
+        while pointer < end:
+            read_size = min(chunk_size, end - pointer)
+            chunk = await asyncio.to_thread(os.pread, fd, read_size, pointer)
+            boundary = _find_line_boundary(chunk, len(chunk) == chunk_size)
+            if not boundary:
+                return
+            pointer += boundary
+            yield chunk[:boundary].decode("utf-8", errors="replace"), pointer
+    finally:
+        os.close(fd)
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+from .config import config
+from .db.crud.log_pointer import (
+    delete_log_pointers,
+    get_all_log_pointers,
+    save_log_pointers,
+)
+from .db.model import LogPointer
+from .log import logger
+from .log_file import LogFileIdentity
+
+
+@dataclass
+class LogPosition:
+    """
+    某个服务器日志读取到的位置
+
+    Attributes:
+        pointer (int): 下一次读取的字节偏移
+        identity (LogFileIdentity | None): 指针所属的日志文件
+        updated_at (float): 最后一次确认这个位置的时间
+    """
+
+    pointer: int
+    identity: LogFileIdentity | None = None
+    updated_at: float = field(default_factory=time.time)
+
+
+class LogPointerStore:
+    """
+    日志指针的内存缓存，变化时合并写入数据库
+
+    写入在 flush_seconds 之后合并成一个事务。服务器长时间没有新日志时，
+    refresh 会刷新 updated_at，每隔 mc_log_replay_max_seconds 的一半写入一次，
+    这样重启时可以根据 updated_at 判断停机了多久。
+    """
+
+    def __init__(self, flush_seconds: float):
+        self._flush_seconds = flush_seconds
+        self._positions = dict[str, LogPosition]()
+        self._persisted_at = dict[str, float]()
+        self._dirty_servers = set[str]()
+        self._saved_positions: dict[str, LogPosition] | None = None
+        self._load_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    def get(self, server_name: str) -> LogPosition | None:
+        return self._positions.get(server_name)
+
+    def set(self, server_name: str, position: LogPosition):
+        old_position = self._positions.get(server_name)
+        self._positions[server_name] = position
+        if (
+            old_position is None
+            or old_position.pointer != position.pointer
+            or old_position.identity != position.identity
+            or position.updated_at - self._persisted_at.get(server_name, 0)
+            > config.mc_log_replay_max_seconds / 2
+        ):
+            self._dirty_servers.add(server_name)
+            self._schedule_flush()
+
+    def refresh(self, server_names: list[str]):
+        """
+        确认正在运行的服务器的指针仍然有效，没有新日志时也让 updated_at 跟上当前时间
+        """
+        now = time.time()
+        for server_name in server_names:
+            position = self._positions.get(server_name)
+            if position is not None:
+                self.set(server_name, replace(position, updated_at=now))
+
+    async def get_saved(self, server_name: str) -> LogPosition | None:
+        """
+        获取上次运行时保存的位置，只在服务器第一次被检查时使用
+        """
+        saved_positions = await self._load_saved()
+        return saved_positions.pop(server_name, None)
+
+    async def evict(self, existing_server_names: list[str]):
+        """
+        删除已经不存在的服务器的指针
+        """
+        saved_positions = await self._load_saved()
+        stale_server_names = (set(saved_positions) | set(self._positions)) - set(
+            existing_server_names
+        )
+        if not stale_server_names:
+            return
+        logger.info(f"Evicting log pointers of {stale_server_names}")
+        for server_name in stale_server_names:
+            saved_positions.pop(server_name, None)
+            self._positions.pop(server_name, None)
+            self._persisted_at.pop(server_name, None)
+            self._dirty_servers.discard(server_name)
+        await delete_log_pointers(list(stale_server_names))
+
+    async def _load_saved(self) -> dict[str, LogPosition]:
+        async with self._load_lock:
+            if self._saved_positions is None:
+                self._saved_positions = {
+                    log_pointer.server_name: LogPosition(
+                        pointer=log_pointer.pointer,
+                        identity=(
+                            LogFileIdentity(
+                                inode=log_pointer.file_inode,
+                                head_size=log_pointer.file_head_size,
+                                head_digest=log_pointer.file_head_digest,
+                            )
+                            if log_pointer.file_inode is not None
+                            and log_pointer.file_head_size is not None
+                            and log_pointer.file_head_digest is not None
+                            else None
+                        ),
+                        updated_at=log_pointer.updated_at,
+                    )
+                    for log_pointer in await get_all_log_pointers()
+                }
+                logger.debug(f"Loaded {len(self._saved_positions)} saved log pointers")
+            return self._saved_positions
+
+    async def flush(self):
+        """
+        把所有变化过的指针写入数据库
+        """
+        if not self._dirty_servers:
+            return
+        dirty_servers, self._dirty_servers = self._dirty_servers, set[str]()
+        log_pointers = list[LogPointer]()
+        for server_name in dirty_servers:
+            position = self._positions.get(server_name)
+            if position is None:
+                continue
+            identity = position.identity
+            log_pointers.append(
+                LogPointer(
+                    server_name=server_name,
+                    pointer=position.pointer,
+                    file_inode=identity.inode if identity else None,
+                    file_head_size=identity.head_size if identity else None,
+                    file_head_digest=identity.head_digest if identity else None,
+                    updated_at=int(position.updated_at),
+                )
+            )
+        try:
+            await save_log_pointers(log_pointers)
+        except Exception:
+            self._dirty_servers |= dirty_servers
+            raise
+        for log_pointer in log_pointers:
+            self._persisted_at[log_pointer.server_name] = log_pointer.updated_at
+        logger.trace(f"Flushed {len(log_pointers)} log pointers")
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self._flush_seconds)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to save log pointers")
+
+
+log_pointer_store = LogPointerStore(config.mc_log_pointer_flush_seconds)
+
+
+def choose_start_pointer(
+    saved_position: LogPosition | None,
+    log_path: Path,
+    end_pointer: int,
+) -> int:
+    """
+    根据上次保存的位置决定从哪里开始读取
+
+    只有日志文件没变，而且停机时间没超过 mc_log_replay_max_seconds 时才补读，
+    补读的量不超过 mc_log_replay_max_bytes，超出的部分只保留最新的内容，
+    并且从下一个完整的行开始，避免把半行日志当成聊天或者进服消息。
+    其余情况都从文件末尾开始读取。
+    """
+    if saved_position is None or saved_position.identity is None:
+        return end_pointer
+    if time.time() - saved_position.updated_at > config.mc_log_replay_max_seconds:
+        logger.info(f"Saved log pointer of {log_path} is too old, skip replaying")
+        return end_pointer
+    if not saved_position.identity.matches(log_path):
+        logger.info(f"{log_path} has changed since last run, skip replaying")
+        return end_pointer
+    if not 0 <= saved_position.pointer <= end_pointer:
+        return end_pointer
+    start_pointer = end_pointer - config.mc_log_replay_max_bytes
+    if saved_position.pointer >= start_pointer:
+        return saved_position.pointer
+    return _next_line_start(log_path, start_pointer, end_pointer)
+
+
+def _next_line_start(log_path: Path, pointer: int, end_pointer: int) -> int:
+    """
+    pointer 之后（包括 pointer）第一个行首的位置，后面没有完整的行时返回 end_pointer
+    """
+    if pointer <= 0:
+        return 0
+    try:
+        with log_path.open("rb") as f:
+            # 从前一个字节开始找，pointer 本身就在行首时不会跳过这一行
+            f.seek(pointer - 1)
+            content = f.read(end_pointer - pointer + 1)
+    except OSError:
+        return end_pointer
+    newline_index = content.find(b"\n")
+    if newline_index == -1:
+        return end_pointer
+    return pointer + newline_index
@@ -0,0 +1,160 @@
+import asyncio
+import os
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from .log import logger
+
+try:
+    from watchfiles import awatch
+except ImportError:  # pragma: no cover
+    awatch = None
+
+
+def log_watch_available() -> bool:
+    """
+    当前环境是否可以使用 inotify 监听日志文件
+    """
+    return awatch is not None
+
+
+class LogWatcher:
+    """
+    监听各服务器 logs 目录的修改事件，只在 latest.log 变化时回调
+
+    监听的是日志所在的目录而不是文件本身，这样 latest.log 被轮转替换之后依然能收到事件。
+    每隔 rescan_seconds 会重新获取一次服务器列表，服务器列表变化，
+    或者日志目录出现、消失（比如服务器第一次启动时才创建 logs 目录）时重建监听，
+    同时对所有服务器做一次兜底检查，防止漏掉事件。
+
+    Args:
+        get_log_paths: 返回 {服务器名称: latest.log 路径} 的协程函数
+        on_log_changed: 日志变化时以服务器名称调用的协程函数
+        rescan_seconds: 重新获取服务器列表的间隔
+        debounce_ms: 合并同一批文件事件的最长等待时间
+    """
+
+    def __init__(
+        self,
+        get_log_paths: Callable[[], Awaitable[dict[str, Path]]],
+        on_log_changed: Callable[[str], Awaitable[None]],
+        rescan_seconds: float,
+        debounce_ms: int = 50,
+    ):
+        self._get_log_paths = get_log_paths
+        self._on_log_changed = on_log_changed
+        self._rescan_seconds = rescan_seconds
+        self._debounce_ms = debounce_ms
+        self._running_tasks = dict[str, asyncio.Task]()
+        self._pending_servers = set[str]()
+
+    async def run(self):
+        """
+        持续监听，直到被取消
+
+        Raises:
+            RuntimeError: watchfiles 不可用
+            OSError: inotify 初始化失败，例如超过了 max_user_watches
+        """
+        if awatch is None:
+            raise RuntimeError("watchfiles is not installed")
+
+        while True:
+            log_paths = await self._get_log_paths()
+            watched_dirs = self._get_watched_dirs(log_paths)
+            # 新出现的服务器需要先初始化指针，顺便兜底检查一遍已有的服务器
+            for server_name in log_paths:
+                self.trigger(server_name)
+
+            stop_event = asyncio.Event()
+            rescan_task = asyncio.create_task(
+                self._wait_for_server_change(
+                    set(log_paths), set(watched_dirs), stop_event
+                )
+            )
+            try:
+                if not watched_dirs:
+                    await stop_event.wait()
+                    continue
+                logger.debug(f"Watching mc logs in {list(watched_dirs)}")
+                async for changes in awatch(
+                    *watched_dirs,
+                    stop_event=stop_event,
+                    debounce=self._debounce_ms,
+                    step=10,
+                    recursive=False,
+                    watch_filter=None,
+                ):
+                    for _, changed_path in changes:
+                        changed_path = Path(changed_path)
+                        if changed_path.name != "latest.log":
+                            continue
+                        server_name = watched_dirs.get(
+                            os.path.realpath(changed_path.parent)
+                        )
+                        if server_name is not None:
+                            self.trigger(server_name)
+            finally:
+                rescan_task.cancel()
+
+    def trigger(self, server_name: str):
+        """
+        调度一次对该服务器日志的检查
+
+        同一服务器同时只会有一个检查在运行，运行期间到来的事件会合并成运行结束后的一次检查
+        """
+        if server_name in self._running_tasks:
+            self._pending_servers.add(server_name)
+            return
+        self._running_tasks[server_name] = asyncio.create_task(
+            self._run_callback(server_name)
+        )
+
+    async def _run_callback(self, server_name: str):
+        try:
+            while True:
+                self._pending_servers.discard(server_name)
+                try:
+                    await self._on_log_changed(server_name)
+                except Exception:
+                    logger.exception(f"Error when handling log of {server_name}")
+                if server_name not in self._pending_servers:
+                    break
+        finally:
+            del self._running_tasks[server_name]
+
+    @staticmethod
+    def _get_watched_dirs(log_paths: dict[str, Path]) -> dict[str, str]:
+        """
+        Returns:
+            dict[str, str]: {已经存在的日志目录: 服务器名称}
+        """
+        return {
+            os.path.realpath(log_path.parent): server_name
+            for server_name, log_path in log_paths.items()
+            if log_path.parent.is_dir()
+        }
+
+    async def _wait_for_server_change(
+        self,
+        server_names: set[str],
+        watched_dirs: set[str],
+        stop_event: asyncio.Event,
+    ):
+        while True:
+            await asyncio.sleep(self._rescan_seconds)
+            try:
+                log_paths = await self._get_log_paths()
+            except Exception:
+                logger.exception("Error when rescanning mc servers")
+                continue
+            if set(log_paths) != server_names:
+                logger.debug("Running servers changed, rebuilding log watcher")
+                stop_event.set()
+                return
+            if set(self._get_watched_dirs(log_paths)) != watched_dirs:
+                logger.debug("Log directories changed, rebuilding log watcher")
+                stop_event.set()
+                return
+            for server_name in server_names:
+                self.trigger(server_name)
@@ -1,4 +1,3 @@
-import re
 from dataclasses import dataclass
 from typing import Literal
 
@@ -7,6 +6,7 @@ from aiohttp import ClientTimeout
 from pydantic import BaseModel
 
 from .log import logger
+from .log_events import PlayerUUIDEvent, classify_log
 
 
 class TextureProperty(BaseModel):
@@ -89,19 +89,29 @@ def parse_player_uuid_and_name_from_log(log_content: str):
     Returns:
         list[PlayerInfo]: List of player UUID and name.
     """
-    # ^\[[^\]]+\]                 # Match the first bracket with any characters except ']'
-    # \s+                         # One or more whitespace characters
-    # \[User Authenticator.*?\]:  # Match 'User Authenticator' in the second bracket
-    # UUID of player (\w+) is ([a-f0-9\-]{36})$  # Capture username and UUID
-    pattern = re.compile(
-        r"^\[[^\]]+\]\s+\[User Authenticator.*?\]: UUID of player (\w+) is ([a-f0-9\-]{36})$"
-    )
-
-    player_info_list = list[PlayerInfo]()
-    for line in log_content.splitlines():
-        match = pattern.match(line)
-        if match:
-            name, uuid = match.groups()
-            player_info_list.append(PlayerInfo(uuid=uuid.replace("-", ""), name=name))
-
-    return player_info_list
+    return [
+        PlayerInfo(uuid=event.uuid, name=event.name)
+        for event in classify_log(log_content)
+        if isinstance(event, PlayerUUIDEvent)
+    ]
+
+
+def parse_list_players_response(response: str) -> list[str]:
+    """
+    Parse the response of the list command.
+
+    Examples:
+        There are 2 of a max of 20 players online: Notch, Dream
+        There are 0 of a max of 20 players online:
+        There are 1/20 players online:
+        Notch
+
+    Returns:
+        list[str]: Names of the online players.
+    """
+    _, _, players = response.partition(":")
+    return [
+        player.strip()
+        for player in players.replace("\n", ",").split(",")
+        if player.strip()
+    ]
@@ -0,0 +1,136 @@
+import asyncio
+from collections import OrderedDict
+
+from .config import config
+from .db.crud.binding import (
+    add_player_info_listener,
+    get_mc_player_infos,
+    upsert_mc_player_infos,
+)
+from .log import logger
+
+# 写入失败后重试的间隔从 flush_seconds 开始每次翻倍，最多这么多秒
+PLAYER_INFO_MAX_RETRY_SECONDS = 60
+
+
+class PlayerInfoWriter:
+    """
+    合并写入玩家 UUID 和名称
+
+    数据库中已有的 UUID 和名称会缓存在一个按 UUID 的 LRU 中，
+    玩家重连时名称没变就不会碰数据库，只有新玩家和改了名的玩家需要写入。
+    需要写入的玩家在 flush_seconds 内攒在一起，用一条语句写入数据库，
+    服务器重启后大量玩家同时重连时不会产生一堆互相抢写锁的事务。
+    其他地方写入或删除玩家时通过 on_player_info_changed 更新缓存。
+    """
+
+    def __init__(self, flush_seconds: float, cache_size: int):
+        self._flush_seconds = flush_seconds
+        self._cache_size = cache_size
+        self._saved_names = OrderedDict[str, str]()
+        self._pending = dict[str, str]()
+        self._flush_task: asyncio.Task | None = None
+        self._failed_flushes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, uuid: str, name: str):
+        saved_name = self._saved_names.get(uuid)
+        if saved_name is not None:
+            self._saved_names.move_to_end(uuid)
+        if saved_name == name and uuid not in self._pending:
+            self.cache_hits += 1
+            return
+        self.cache_misses += 1
+        self._pending[uuid] = name
+        self._schedule_flush()
+
+    def forget(self, uuid: str):
+        """
+        数据库中的玩家被删除之后，需要从缓存中去掉
+        """
+        self._saved_names.pop(uuid, None)
+
+    def on_player_info_changed(self, uuid: str, name: str | None):
+        """
+        数据库中的玩家被创建、改名（name 为新名称）或者删除（name 为 None）之后调用
+        """
+        if name is None:
+            self.forget(uuid)
+        else:
+            self._remember(uuid, name)
+
+    async def warm_up(self):
+        """
+        启动时从数据库加载缓存
+        """
+        try:
+            saved_names = await get_mc_player_infos(self._cache_size)
+        except Exception:
+            logger.exception("Failed to load player infos")
+            return
+        for uuid, name in saved_names.items():
+            self._remember(uuid, name)
+        logger.debug(f"Loaded {len(saved_names)} player infos into cache")
+
+    async def flush(self):
+        """
+        把所有还没写入的玩家写入数据库
+        """
+        if not self._pending:
+            return
+        players, self._pending = self._pending, dict[str, str]()
+        try:
+            written_count = await upsert_mc_player_infos(players)
+        except Exception:
+            # 写入失败时放回去稍后重试，期间新来的名称更新，优先保留
+            self._pending = players | self._pending
+            self._failed_flushes += 1
+            self._schedule_flush(
+                min(
+                    self._flush_seconds * 2**self._failed_flushes,
+                    PLAYER_INFO_MAX_RETRY_SECONDS,
+                )
+            )
+            raise
+        self._failed_flushes = 0
+        for uuid, name in players.items():
+            self._remember(uuid, name)
+        logger.debug(
+            f"Saved {written_count} of {len(players)} player infos, "
+            f"cache hits: {self.cache_hits}, misses: {self.cache_misses}"
+        )
+
+    def _remember(self, uuid: str, name: str):
+        self._saved_names[uuid] = name
+        self._saved_names.move_to_end(uuid)
+        while len(self._saved_names) > self._cache_size:
+            self._saved_names.popitem(last=False)
+
+    def _schedule_flush(self, delay_seconds: float | None = None):
+        # 从等待中的写入任务里重试时，这个任务自己还没结束
+        if (
+            self._flush_task is not None
+            and not self._flush_task.done()
+            and self._flush_task is not asyncio.current_task()
+        ):
+            return
+        self._flush_task = asyncio.create_task(
+            self._flush_later(
+                self._flush_seconds if delay_seconds is None else delay_seconds
+            )
+        )
+
+    async def _flush_later(self, delay_seconds: float):
+        await asyncio.sleep(delay_seconds)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to save player infos")
+
+
+player_info_writer = PlayerInfoWriter(
+    flush_seconds=config.mc_player_info_flush_seconds,
+    cache_size=config.mc_player_info_cache_size,
+)
+add_player_info_listener(player_info_writer.on_player_info_changed)
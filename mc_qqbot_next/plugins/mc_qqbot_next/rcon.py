@@ -0,0 +1,387 @@
+"""
+Minecraft RCON 客户端
+
+每个服务器维护一个小连接池，连接认证之后一直保持，服务器重启导致连接断开时自动重连。
+每个连接上可以同时有多个请求在等待响应，响应通过请求 ID 对应回去，
+所以多条命令可以一次性写出去，不需要一问一答。
+超过一个数据包的长输出会被重新拼起来，也可以边收边读。
+"""
+
+import asyncio
+import codecs
+import itertools
+import struct
+from collections.abc import AsyncIterator
+
+from .log import logger
+
+RCON_PACKET_TYPE_RESPONSE = 0
+RCON_PACKET_TYPE_COMMAND = 2
+RCON_PACKET_TYPE_AUTH = 3
+# 请求 ID 是有符号 32 位整数，认证失败时服务器返回 -1
+RCON_MAX_REQUEST_ID = 2**31 - 1
+
+
+class RCONError(RuntimeError):
+    pass
+
+
+class RCONAuthError(RCONError):
+    pass
+
+
+def encode_packet(request_id: int, packet_type: int, body: str) -> bytes:
+    payload = struct.pack("<ii", request_id, packet_type) + body.encode() + b"\0\0"
+    return struct.pack("<i", len(payload)) + payload
+
+
+async def read_packet(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    """
+    读取一个 RCON 数据包
+
+    Returns:
+        tuple[int, int, bytes]: (请求 ID, 类型, 内容)
+    """
+    (length,) = struct.unpack("<i", await reader.readexactly(4))
+    payload = await reader.readexactly(length)
+    request_id, packet_type = struct.unpack("<ii", payload[:8])
+    return request_id, packet_type, payload[8:-2]
+
+
+class RCONResponse:
+    """
+    一个命令的响应
+
+    Minecraft 会把超过 4096 字节的输出拆成多个数据包，而且没有标记哪个是最后一个，
+    所以每个命令后面都跟着发一个无效类型的哨兵包。服务器按顺序处理请求，
+    收到哨兵包的响应时，这个命令的所有数据包都已经到了。
+    """
+
+    def __init__(self, request_id: int, sentinel_id: int):
+        self.request_id = request_id
+        self.sentinel_id = sentinel_id
+        self.done = False
+        self._chunks = asyncio.Queue[str | None]()
+        # 多字节字符可能被拆到两个数据包里
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._exception: BaseException | None = None
+
+    def feed(self, data: bytes):
+        chunk = self._decoder.decode(data)
+        if chunk:
+            self._chunks.put_nowait(chunk)
+
+    def finish(self, exception: BaseException | None = None):
+        if self.done:
+            return
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self._chunks.put_nowait(tail)
+        self._exception = exception
+        self._chunks.put_nowait(None)
+        self.done = True
+
+    async def next_chunk(self) -> str | None:
+        """
+        Returns:
+            str | None: 下一段输出，全部读完时返回 None
+        """
+        chunk = await self._chunks.get()
+        if chunk is None:
+            self._chunks.put_nowait(None)
+            if self._exception is not None:
+                raise self._exception
+        return chunk
+
+    async def read(self) -> str:
+        chunks = list[str]()
+        while (chunk := await self.next_chunk()) is not None:
+            chunks.append(chunk)
+        return "".join(chunks)
+
+
+class RCONConnection:
+    """
+    一个已认证的 RCON 连接，可以同时发送多个命令
+    """
+
+    def __init__(self, host: str, port: int, password: str):
+        self._host = host
+        self._port = port
+        self._password = password
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._request_ids = itertools.count(1)
+        # 请求 ID -> 响应，哨兵 ID -> 响应
+        self._responses = dict[int, RCONResponse]()
+        self._sentinels = dict[int, RCONResponse]()
+        self._read_task: asyncio.Task | None = None
+
+    @property
+    def closed(self) -> bool:
+        return self._read_task is None or self._read_task.done()
+
+    @property
+    def pending(self) -> int:
+        return len(self._responses)
+
+    def _next_request_id(self) -> int:
+        request_id = next(self._request_ids)
+        if request_id >= RCON_MAX_REQUEST_ID:
+            self._request_ids = itertools.count(1)
+            request_id = next(self._request_ids)
+        return request_id
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port
+        )
+        request_id = self._next_request_id()
+        self._writer.write(
+            encode_packet(request_id, RCON_PACKET_TYPE_AUTH, self._password)
+        )
+        await self._writer.drain()
+        while True:
+            response_id, packet_type, _ = await read_packet(self._reader)
+            # 有的服务器会在认证结果之前先发一个空的响应包
+            if packet_type == RCON_PACKET_TYPE_COMMAND:
+                break
+        if response_id != request_id:
+            await self.close()
+            raise RCONAuthError(f"Failed to authenticate to {self._host}:{self._port}")
+        self._read_task = asyncio.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        assert self._reader is not None
+        try:
+            while True:
+                request_id, _, body = await read_packet(self._reader)
+                response = self._sentinels.get(request_id)
+                if response is not None:
+                    self.discard([response])
+                    response.finish()
+                    continue
+                response = self._responses.get(request_id)
+                if response is not None:
+                    response.feed(body)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            logger.debug(f"RCON connection to {self._host}:{self._port} closed: {e}")
+        finally:
+            for response in self._responses.values():
+                response.finish(ConnectionResetError("RCON connection closed"))
+            self._responses.clear()
+            self._sentinels.clear()
+
+    def write_commands(self, commands: list[str]) -> list[RCONResponse]:
+        """
+        一次性写出所有命令，不等待响应
+
+        Returns:
+            list[RCONResponse]: 按顺序对应每个命令的响应
+        """
+        if self._writer is None or self.closed:
+            raise ConnectionResetError("RCON connection closed")
+        responses = list[RCONResponse]()
+        for command in commands:
+            response = RCONResponse(self._next_request_id(), self._next_request_id())
+            self._responses[response.request_id] = response
+            self._sentinels[response.sentinel_id] = response
+            responses.append(response)
+            self._writer.write(
+                encode_packet(response.request_id, RCON_PACKET_TYPE_COMMAND, command)
+                + encode_packet(response.sentinel_id, RCON_PACKET_TYPE_RESPONSE, "")
+            )
+        return responses
+
+    def discard(self, responses: list[RCONResponse]):
+        """
+        不再接收这些响应，用于读完、超时或者被取消之后
+        """
+        for response in responses:
+            self._responses.pop(response.request_id, None)
+            self._sentinels.pop(response.sentinel_id, None)
+
+    async def drain(self):
+        assert self._writer is not None
+        await self._writer.drain()
+
+    async def read_responses(self, responses: list[RCONResponse]) -> list[str]:
+        try:
+            await self.drain()
+            return [await response.read() for response in responses]
+        finally:
+            self.discard(responses)
+
+    async def send_commands(self, commands: list[str]) -> list[str]:
+        return await self.read_responses(self.write_commands(commands))
+
+    async def close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+
+
+class RCONPool:
+    """
+    单个服务器的 RCON 连接池
+
+    优先复用等待中请求最少的连接，所有连接都在忙且没到上限时才新建连接。
+    复用的旧连接已经失效（例如服务器重启过）时，换一个新连接重试一次。
+
+    Args:
+        host: RCON 地址
+        port: RCON 端口
+        password: RCON 密码
+        size: 最多保持的连接数
+        timeout_seconds: 连接和等待响应的超时时间
+    """
+
+    def __init__(
+        self, host: str, port: int, password: str, size: int, timeout_seconds: float
+    ):
+        self.host = host
+        self.port = port
+        self._password = password
+        self._size = size
+        self._timeout_seconds = timeout_seconds
+        self._connections = list[RCONConnection]()
+        self._connect_lock = asyncio.Lock()
+
+    async def _new_connection(self) -> RCONConnection:
+        connection = RCONConnection(self.host, self.port, self._password)
+        await asyncio.wait_for(connection.connect(), self._timeout_seconds)
+        self._connections.append(connection)
+        return connection
+
+    async def _acquire(self) -> tuple[RCONConnection, bool]:
+        """
+        Returns:
+            tuple[RCONConnection, bool]: (连接, 是否复用了已有的连接)
+        """
+        self._connections = [c for c in self._connections if not c.closed]
+        if any(c.pending == 0 for c in self._connections):
+            return min(self._connections, key=lambda c: c.pending), True
+        async with self._connect_lock:
+            self._connections = [c for c in self._connections if not c.closed]
+            if len(self._connections) < self._size:
+                return await self._new_connection(), False
+            return min(self._connections, key=lambda c: c.pending), True
+
+    async def _reconnect(self, connection: RCONConnection) -> RCONConnection:
+        await connection.close()
+        logger.debug(f"Reconnecting to RCON at {self.host}:{self.port}")
+        async with self._connect_lock:
+            return await self._new_connection()
+
+    async def _send_commands(
+        self, connection: RCONConnection, commands: list[str]
+    ) -> list[str]:
+        # 先同步写出，其他并发的请求才能看到这个连接正忙
+        responses = connection.write_commands(commands)
+        return await asyncio.wait_for(
+            connection.read_responses(responses), self._timeout_seconds
+        )
+
+    async def send_commands(self, commands: list[str]) -> list[str]:
+        connection, reused = await self._acquire()
+        try:
+            return await self._send_commands(connection, commands)
+        except (ConnectionError, OSError):
+            if not reused:
+                await connection.close()
+                raise
+        connection = await self._reconnect(connection)
+        return await self._send_commands(connection, commands)
+
+    async def _stream_command(
+        self, connection: RCONConnection, command: str
+    ) -> AsyncIterator[str]:
+        (response,) = connection.write_commands([command])
+        try:
+            await asyncio.wait_for(connection.drain(), self._timeout_seconds)
+            while True:
+                chunk = await asyncio.wait_for(
+                    response.next_chunk(), self._timeout_seconds
+                )
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            connection.discard([response])
+
+    async def stream_command(self, command: str) -> AsyncIterator[str]:
+        """
+        边接收边返回命令的输出，输出很长时不需要等全部数据包到齐再拼成一个字符串
+        """
+        connection, reused = await self._acquire()
+        chunks = self._stream_command(connection, command)
+        try:
+            first_chunk = await anext(chunks, None)
+        except (ConnectionError, OSError):
+            if not reused:
+                await connection.close()
+                raise
+            connection = await self._reconnect(connection)
+            chunks = self._stream_command(connection, command)
+            first_chunk = await anext(chunks, None)
+        try:
+            if first_chunk is None:
+                return
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def send_command(self, command: str) -> str:
+        return (await self.send_commands([command]))[0]
+
+    async def close(self):
+        for connection in self._connections:
+            await connection.close()
+        self._connections.clear()
+
+
+class RCONPoolManager:
+    """
+    按服务器名称管理 RCON 连接池，服务器的 RCON 端口变了之后换一个新的连接池
+    """
+
+    def __init__(
+        self, host: str, password: str, pool_size: int, timeout_seconds: float
+    ):
+        self._host = host
+        self._password = password
+        self._pool_size = pool_size
+        self._timeout_seconds = timeout_seconds
+        self._pools = dict[str, RCONPool]()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def get_pool(self, server_name: str, port: int) -> RCONPool:
+        # 连接绑定在创建时的事件循环上
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._pools.clear()
+            self._loop = loop
+        pool = self._pools.get(server_name)
+        if pool is None or pool.port != port:
+            if pool is not None:
+                asyncio.create_task(pool.close())
+            pool = self._pools[server_name] = RCONPool(
+                self._host,
+                port,
+                self._password,
+                size=self._pool_size,
+                timeout_seconds=self._timeout_seconds,
+            )
+        return pool
+
+    async def close(self):
+        for pool in self._pools.values():
+            await pool.close()
+        self._pools.clear()
@@ -0,0 +1,212 @@
+"""
+按服务器调度 RCON 命令
+
+每个服务器同时执行的命令数有上限，超过的按优先级排队，
+群里的命令（/say、/ban、绑定回复等）排在后台查询（在线玩家、状态轮询、熔断探测）前面，
+服务器卡顿的时候交互命令也不用等后台查询。
+同时在排队或者执行中的相同只读命令（比如 list）只执行一次，结果共享给所有调用方。
+"""
+
+import asyncio
+import heapq
+import itertools
+from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class RCONPriority(IntEnum):
+    """
+    数值越小越先执行
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_rcon_priority = ContextVar("rcon_priority", default=RCONPriority.INTERACTIVE)
+
+
+@contextmanager
+def rcon_priority(priority: RCONPriority):
+    """
+    在这个上下文中发送的 RCON 命令使用指定的优先级
+    """
+    token = _rcon_priority.set(priority)
+    try:
+        yield
+    finally:
+        _rcon_priority.reset(token)
+
+
+@dataclass
+class _SharedCommand:
+    task: asyncio.Task
+    ticket: asyncio.Future[None]
+    waiters: int = 0
+
+
+class ServerCommandScheduler:
+    """
+    单个服务器的命令调度
+
+    每个命令先领一张排队票，有空位时按 (优先级, 先后顺序) 放行，执行完归还空位。
+    合并的命令在一个共享的任务里执行，所有调用方都离开之后取消这个任务；
+    优先级更高的调用方加入时，共享命令的排队位置也会提前。
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._max_concurrency = max_concurrency
+        self._running = 0
+        self._waiters = list[tuple[int, int, asyncio.Future[None]]]()
+        self._counter = itertools.count()
+        self._shared = dict[str, _SharedCommand]()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return sum(not ticket.done() for _, _, ticket in self._waiters)
+
+    def _enqueue(self, priority: int) -> asyncio.Future[None]:
+        ticket = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), ticket))
+        self._dispatch()
+        return ticket
+
+    def _dispatch(self):
+        while self._waiters and self._running < self._max_concurrency:
+            _, _, ticket = heapq.heappop(self._waiters)
+            # 排队的一方已经被取消了，或者是提前之后留下的旧位置
+            if ticket.done():
+                continue
+            self._running += 1
+            ticket.set_result(None)
+
+    def _release(self):
+        self._running -= 1
+        self._dispatch()
+
+    async def _acquire(self, ticket: asyncio.Future[None]):
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            # 刚放行就被取消了，把空位还回去
+            if ticket.done() and not ticket.cancelled():
+                self._release()
+            raise
+
+    async def _run(
+        self, ticket: asyncio.Future[None], operation: Callable[[], Awaitable[T]]
+    ) -> T:
+        await self._acquire(ticket)
+        try:
+            return await operation()
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        """
+        占用一个空位直到离开上下文，用于边接收边返回的长输出
+        """
+        await self._acquire(self._enqueue(priority))
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def submit(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        priority: int,
+        coalesce_key: str | None = None,
+    ) -> T:
+        """
+        排队执行 operation
+
+        Args:
+            operation: 要执行的操作
+            priority: 优先级，数值越小越先执行
+            coalesce_key: 只读命令的标识，相同标识的命令同时只执行一次
+        """
+        if coalesce_key is None:
+            return await self._run(self._enqueue(priority), operation)
+
+        shared = self._shared.get(coalesce_key)
+        if shared is None:
+            ticket = self._enqueue(priority)
+            shared = _SharedCommand(
+                task=asyncio.create_task(self._run(ticket, operation)), ticket=ticket
+            )
+            self._shared[coalesce_key] = shared
+            shared.task.add_done_callback(
+                lambda _: self._forget_shared(coalesce_key, shared)
+            )
+        elif not shared.ticket.done():
+            heapq.heappush(
+                self._waiters, (priority, next(self._counter), shared.ticket)
+            )
+            self._dispatch()
+
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if shared.waiters == 0 and not shared.task.done():
+                shared.task.cancel()
+
+    def _forget_shared(self, coalesce_key: str, shared: _SharedCommand):
+        if self._shared.get(coalesce_key) is shared:
+            del self._shared[coalesce_key]
+        # 结果已经交给了所有调用方，这里只是避免没人取的异常被报告
+        if not shared.task.cancelled():
+            shared.task.exception()
+
+
+class RCONScheduler:
+    """
+    按服务器名称管理命令调度，优先级取自 rcon_priority 设置的上下文
+
+    Args:
+        max_concurrency: 每个服务器同时执行的命令数上限
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._max_concurrency = max_concurrency
+        self._schedulers = dict[str, ServerCommandScheduler]()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def get(self, server_name: str) -> ServerCommandScheduler:
+        # 排队票绑定在创建时的事件循环上
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._schedulers.clear()
+            self._loop = loop
+        scheduler = self._schedulers.get(server_name)
+        if scheduler is None:
+            scheduler = self._schedulers[server_name] = ServerCommandScheduler(
+                self._max_concurrency
+            )
+        return scheduler
+
+    async def submit(
+        self,
+        server_name: str,
+        operation: Callable[[], Awaitable[T]],
+        coalesce_key: str | None = None,
+    ) -> T:
+        return await self.get(server_name).submit(
+            operation, _rcon_priority.get(), coalesce_key
+        )
+
+    def slot(self, server_name: str) -> AbstractAsyncContextManager[None]:
+        return self.get(server_name).slot(_rcon_priority.get())
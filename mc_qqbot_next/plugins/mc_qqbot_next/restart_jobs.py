@@ -0,0 +1,217 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Literal
+
+from .bot import get_onebot_bot
+from .config import config
+from .deadline import create_background_task
+from .docker import restart_server
+from .log import logger
+from .restart_waiter import RestartResult, RestartWaiter, restart_waiter
+from .send_scheduler import SendPriority, send_priority
+
+# 排队中、正在执行重启命令、等待启动完成、启动完成、启动时崩溃、超时、重启命令出错
+RestartJobStatusT = Literal[
+    "queued", "restarting", "waiting", "done", "crashed", "timeout", "failed"
+]
+
+RESTART_JOB_STATUS_TEXT: dict[RestartJobStatusT, str] = {
+    "queued": "排队中",
+    "restarting": "正在重启",
+    "waiting": "等待启动完成",
+    "done": "重启完成",
+    "crashed": "启动时崩溃了",
+    "timeout": "重启超时",
+    "failed": "重启失败",
+}
+
+
+@dataclass
+class RestartJob:
+    """
+    一个服务器的重启任务
+
+    Attributes:
+        server_name (str): 服务器名称
+        status (RestartJobStatusT): 当前状态
+        submitted_at (float): 提交的时间，time.monotonic()
+        started_at (float | None): 开始重启的时间
+        finished_at (float | None): 结束的时间
+        result (RestartResult | None): 等待启动的结果
+        error (str | None): 重启命令出错时的错误信息
+    """
+
+    server_name: str
+    status: RestartJobStatusT = "queued"
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: RestartResult | None = None
+    error: str | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    def describe(self) -> str:
+        """
+        给 /restart status 用的一行描述
+        """
+        now = time.monotonic()
+        text = f"[{self.server_name}] {RESTART_JOB_STATUS_TEXT[self.status]}"
+        if self.finished_at is not None:
+            if self.result is not None and self.result.ready:
+                text += f"，用时{self.result.elapsed_seconds:.0f}秒"
+            return text + f"（{now - self.finished_at:.0f}秒前）"
+        if self.started_at is not None:
+            return text + f"，已经过了{now - self.started_at:.0f}秒"
+        return text + f"，已经等了{now - self.submitted_at:.0f}秒"
+
+
+def format_restart_result(job: RestartJob) -> str:
+    server_name = job.server_name
+    result = job.result
+    if job.status == "failed":
+        return f"[{server_name}] 重启失败：{job.error}"
+    assert result is not None
+    if result.crash_message is not None:
+        return f"[{server_name}] 启动时崩溃了：{result.crash_message}"
+    if result.ready:
+        message = f"[{server_name}] 重启完成，用时{result.elapsed_seconds:.0f}秒"
+        if result.startup_seconds is not None:
+            message += f"（服务器启动耗时{result.startup_seconds:.1f}秒）"
+        return message
+    wait_seconds = result.elapsed_seconds
+    return f"[{server_name}] 坏了，好像过了{int(wait_seconds) // 60}分钟了还没重启好"
+
+
+class RestartJobManager:
+    """
+    在后台执行重启，并把进度发到群里
+
+    同一个服务器同时只有一个重启任务，重复提交时返回已有的任务。
+    多个服务器可以一起重启，但同时重启的数量不超过 max_parallel，
+    避免好几个整合包同时启动把机器压垮。
+
+    Args:
+        restart: 发出重启命令的协程函数
+        restart_waiter: 等待启动完成
+        max_parallel: 最多同时重启的服务器数
+        get_wait_seconds: 返回最长等待时间的函数
+        report: 发送进度消息的协程函数
+    """
+
+    def __init__(
+        self,
+        restart: Callable[[str], Awaitable[object]],
+        restart_waiter: RestartWaiter,
+        max_parallel: int,
+        get_wait_seconds: Callable[[], float],
+        report: Callable[[str], Awaitable[object]],
+    ):
+        self._restart = restart
+        self._restart_waiter = restart_waiter
+        self._max_parallel = max_parallel
+        self._get_wait_seconds = get_wait_seconds
+        self.report = report
+        self._jobs = dict[str, RestartJob]()
+        # 每个服务器最近一次结束的任务
+        self._finished_jobs = dict[str, RestartJob]()
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 任务和信号量绑定在事件循环上，事件循环换了（比如测试中）就重新创建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._max_parallel)
+            self._loop = loop
+            self._jobs.clear()
+        return self._semaphore
+
+    def submit(self, server_name: str) -> tuple[RestartJob, bool]:
+        """
+        提交一个服务器的重启
+
+        Returns:
+            tuple[RestartJob, bool]: (重启任务, 是否是新提交的)
+        """
+        semaphore = self._get_semaphore()
+        job = self._jobs.get(server_name)
+        if job is not None:
+            return job, False
+        started = sum(job.status != "queued" for job in self._jobs.values())
+        job = self._jobs[server_name] = RestartJob(server_name)
+        if started < self._max_parallel:
+            # 有空位时马上就会开始，提前标记，回复的消息才准确
+            job.status = "restarting"
+        job.task = create_background_task(self._run(job, semaphore))
+        return job, True
+
+    def get_job(self, server_name: str) -> RestartJob | None:
+        """
+        获取服务器进行中的重启任务，没有的话返回最近一次结束的任务
+        """
+        return self._jobs.get(server_name) or self._finished_jobs.get(server_name)
+
+    def get_jobs(self) -> list[RestartJob]:
+        """
+        获取所有进行中的任务和每个服务器最近一次结束的任务，按提交时间排序
+        """
+        jobs = list(self._jobs.values()) + [
+            job
+            for server_name, job in self._finished_jobs.items()
+            if server_name not in self._jobs
+        ]
+        return sorted(jobs, key=lambda job: job.submitted_at)
+
+    async def _run(self, job: RestartJob, semaphore: asyncio.Semaphore):
+        try:
+            async with semaphore:
+                job.status = "restarting"
+                job.started_at = time.monotonic()
+                logger.info(f"Restarting {job.server_name}")
+                with self._restart_waiter.watch(job.server_name) as restart_watch:
+                    await self._restart(job.server_name)
+                    job.status = "waiting"
+                    job.result = await restart_watch.wait(self._get_wait_seconds())
+            if job.result.crash_message is not None:
+                job.status = "crashed"
+            elif job.result.ready:
+                job.status = "done"
+            else:
+                job.status = "timeout"
+        except Exception as e:
+            logger.exception(f"Failed to restart {job.server_name}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+            if self._jobs.get(job.server_name) is job:
+                del self._jobs[job.server_name]
+            self._finished_jobs[job.server_name] = job
+        logger.info(f"Restart job of {job.server_name} finished: {job.status}")
+        try:
+            await self.report(format_restart_result(job))
+        except Exception:
+            logger.exception(f"Failed to report restart of {job.server_name}")
+
+
+async def report_restart_progress(message: str):
+    """
+    把重启进度发到配置的群里，排在命令的回复后面
+    """
+    bot = get_onebot_bot()
+    if bot is None:
+        logger.warning(f"No bot to report restart progress: {message}")
+        return
+    with send_priority(SendPriority.NOTIFICATION):
+        await bot.send_group_msg(group_id=config.mc_group_id, message=message)
+
+
+restart_job_manager = RestartJobManager(
+    restart=restart_server,
+    restart_waiter=restart_waiter,
+    max_parallel=config.mc_restart_max_parallel,
+    get_wait_seconds=lambda: config.mc_restart_wait_seconds,
+    report=report_restart_progress,
+)
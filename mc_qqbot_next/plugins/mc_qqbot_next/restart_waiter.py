@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from .config import config
+from .docker import healthy, server_registry
+from .log import logger
+from .log_event_bus import log_event_bus
+from .log_events import ServerCrashEvent, ServerDoneEvent
+from .server_registry import ContainerEvent
+
+# Docker 容器健康状态变成 healthy 时的事件名称
+HEALTHY_ACTION = "health_status: healthy"
+
+
+@dataclass(frozen=True)
+class RestartResult:
+    """
+    等待服务器重启的结果
+
+    Attributes:
+        ready (bool): 是否在超时之前启动完成
+        elapsed_seconds (float): 从开始等待到结果出来的秒数
+        startup_seconds (float | None): 日志中报告的启动耗时
+        crash_message (str | None): 启动时崩溃的信息
+    """
+
+    ready: bool
+    elapsed_seconds: float
+    startup_seconds: float | None = None
+    crash_message: str | None = None
+
+
+class RestartWaiter:
+    """
+    等待服务器重启完成
+
+    由事件驱动：日志中的 Done 行、崩溃信息和 Docker 容器的健康状态事件，
+    事件到达之后马上返回。事件可能漏掉（比如日志监听或者事件监听没有开启），
+    所以同时轮询健康状态兜底，轮询间隔从 initial_poll_seconds 开始翻倍，
+    最长 max_poll_seconds，启动很慢的整合包也不会一直查询。
+
+    Args:
+        check_healthy: 检查服务器是否健康的协程函数
+        initial_poll_seconds: 第一次轮询前的等待时间
+        max_poll_seconds: 最长的轮询间隔
+    """
+
+    def __init__(
+        self,
+        check_healthy: Callable[[str], Awaitable[bool]],
+        initial_poll_seconds: float,
+        max_poll_seconds: float,
+    ):
+        self._check_healthy = check_healthy
+        self._initial_poll_seconds = initial_poll_seconds
+        self._max_poll_seconds = max_poll_seconds
+        # 服务器名称 -> 等待中的结果，值为 (启动耗时, 崩溃信息)
+        self._waiters = defaultdict[
+            str, set[asyncio.Future[tuple[float | None, str | None]]]
+        ](set)
+
+    def _resolve(
+        self,
+        server_name: str,
+        startup_seconds: float | None = None,
+        crash_message: str | None = None,
+    ):
+        for waiter in self._waiters.get(server_name, ()):
+            if not waiter.done():
+                waiter.set_result((startup_seconds, crash_message))
+
+    def notify_done(self, server_name: str, startup_seconds: float | None):
+        self._resolve(server_name, startup_seconds=startup_seconds)
+
+    def notify_crash(self, server_name: str, message: str):
+        self._resolve(server_name, crash_message=message)
+
+    def handle_container_event(self, event: ContainerEvent):
+        if event.server_name is not None and event.action == HEALTHY_ACTION:
+            self._resolve(event.server_name)
+
+    def watch(self, server_name: str) -> "RestartWatch":
+        """
+        在发出重启命令之前开始监听，避免漏掉重启过程中的事件
+        """
+        return RestartWatch(self, server_name)
+
+    async def _wait(
+        self,
+        server_name: str,
+        waiter: asyncio.Future[tuple[float | None, str | None]],
+        start_time: float,
+        timeout: float,
+    ) -> RestartResult:
+        poll_seconds = self._initial_poll_seconds
+        while True:
+            remaining = timeout - (time.perf_counter() - start_time)
+            if remaining <= 0:
+                return RestartResult(
+                    ready=False, elapsed_seconds=time.perf_counter() - start_time
+                )
+            done, _ = await asyncio.wait([waiter], timeout=min(poll_seconds, remaining))
+            if done:
+                startup_seconds, crash_message = waiter.result()
+                return RestartResult(
+                    ready=crash_message is None,
+                    elapsed_seconds=time.perf_counter() - start_time,
+                    startup_seconds=startup_seconds,
+                    crash_message=crash_message,
+                )
+            logger.debug(f"No restart event from {server_name}, checking its health")
+            try:
+                healthy = await self._check_healthy(server_name)
+            except Exception as e:
+                # 重启过程中容器可能暂时不存在，或者 docker 一时没有响应，继续等到超时
+                logger.warning(f"Failed to check health of {server_name}: {e!r}")
+                healthy = False
+            if healthy:
+                return RestartResult(
+                    ready=True, elapsed_seconds=time.perf_counter() - start_time
+                )
+            poll_seconds = min(poll_seconds * 2, self._max_poll_seconds)
+
+
+class RestartWatch:
+    """
+    一次重启的等待，用 with 语句包住重启命令和 wait()
+    """
+
+    def __init__(self, restart_waiter: RestartWaiter, server_name: str):
+        self._restart_waiter = restart_waiter
+        self._server_name = server_name
+        self._waiter: asyncio.Future[tuple[float | None, str | None]] | None = None
+        self._start_time = 0.0
+
+    def __enter__(self):
+        self._waiter = asyncio.get_running_loop().create_future()
+        self._restart_waiter._waiters[self._server_name].add(self._waiter)
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        assert self._waiter is not None
+        waiters = self._restart_waiter._waiters[self._server_name]
+        waiters.discard(self._waiter)
+        if not waiters:
+            del self._restart_waiter._waiters[self._server_name]
+        self._waiter.cancel()
+
+    async def wait(self, timeout: float) -> RestartResult:
+        """
+        等待服务器启动完成、崩溃或者超时，timeout 从进入 with 语句开始算
+        """
+        assert self._waiter is not None
+        return await self._restart_waiter._wait(
+            self._server_name, self._waiter, self._start_time, timeout
+        )
+
+
+restart_waiter = RestartWaiter(
+    check_healthy=healthy,
+    initial_poll_seconds=config.mc_restart_poll_initial_seconds,
+    max_poll_seconds=config.mc_restart_poll_max_seconds,
+)
+server_registry.add_event_listener(restart_waiter.handle_container_event)
+
+
+@log_event_bus.subscribe(ServerDoneEvent)
+async def handle_server_done(server_name: str, events: list[ServerDoneEvent]):
+    restart_waiter.notify_done(server_name, events[-1].startup_seconds)
+
+
+@log_event_bus.subscribe(ServerCrashEvent)
+async def handle_server_crash(server_name: str, events: list[ServerCrashEvent]):
+    restart_waiter.notify_crash(server_name, events[0].message)
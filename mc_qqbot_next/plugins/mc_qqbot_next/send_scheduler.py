@@ -0,0 +1,235 @@
+"""
+统一调度所有发往 QQ 的消息
+
+通过 Bot 的 API 钩子接管所有发送消息的调用，包括 matcher 的 send/finish，
+所以调用方不需要改变发送方式：
+- 调用前按群取令牌，每个群一个令牌桶，令牌不够时按优先级排队
+- 调用失败且错误表示被限流或超时时，带随机抖动地指数退避重试
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any
+
+from nonebot.adapters import Bot
+from nonebot.adapters.onebot.v11.exception import ActionFailed, NetworkError
+from nonebot.exception import MockApiException
+
+from .config import config
+from .log import logger
+
+SEND_APIS = {
+    "send_msg",
+    "send_group_msg",
+    "send_private_msg",
+    "send_group_forward_msg",
+    "send_private_forward_msg",
+}
+
+
+class SendPriority(IntEnum):
+    """
+    数值越小越先发送，依次为命令的回复、重启进度等通知、转发的聊天消息
+    """
+
+    COMMAND_REPLY = 0
+    NOTIFICATION = 1
+    RELAY = 2
+
+
+_send_priority = ContextVar("send_priority", default=SendPriority.COMMAND_REPLY)
+# 重试时再次调用 API 会重新进入钩子，用来避免重试中再嵌套重试
+_is_retrying = ContextVar("is_retrying", default=False)
+
+
+@contextmanager
+def send_priority(priority: SendPriority):
+    """
+    在这个上下文中发送的消息使用指定的优先级
+    """
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+@dataclass
+class SendStats:
+    """
+    单个群的发送统计
+
+    Attributes:
+        sent (int): 发送成功的消息数
+        retried (int): 重试的次数
+        failed (int): 重试之后仍然失败的消息数
+        waiting (int): 正在等待令牌的消息数
+        max_wait (float): 等待令牌的最长秒数
+    """
+
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    waiting: int = 0
+    max_wait: float = 0
+
+
+class TokenBucket:
+    """
+    令牌桶，令牌不够时按 (优先级, 先后顺序) 依次放行
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._waiters = list[tuple[int, int, asyncio.Future[None]]]()
+        self._counter = itertools.count()
+        self._release_task: asyncio.Task | None = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    async def acquire(self, priority: int = 0):
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._release_task is None or self._release_task.done():
+            self._release_task = asyncio.create_task(self._release_waiters())
+        await future
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated_at) * self._rate
+        )
+        self._updated_at = now
+
+    async def _release_waiters(self):
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            # 等待的一方已经被取消了
+            if future.done():
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+
+def get_target_group_id(api: str, data: dict[str, Any]) -> int | None:
+    if api not in SEND_APIS:
+        return None
+    if data.get("message_type") == "private":
+        return None
+    group_id = data.get("group_id")
+    return int(group_id) if group_id is not None else None
+
+
+def is_retryable(exception: Exception | None) -> bool:
+    """
+    被限流或者超时的错误才值得重试，其他错误重试也没用
+    """
+    if isinstance(exception, NetworkError):
+        return True
+    if isinstance(exception, ActionFailed):
+        return exception.info.get("retcode") in config.mc_send_retry_retcodes
+    return False
+
+
+class SendScheduler:
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_retries: int,
+        retry_base_seconds: float,
+    ):
+        self._rate = rate_per_minute / 60
+        self._burst = burst
+        self._max_retries = max_retries
+        self._retry_base_seconds = retry_base_seconds
+        self._buckets = dict[int, TokenBucket]()
+        self.stats = defaultdict[int, SendStats](SendStats)
+
+    def _get_bucket(self, group_id: int):
+        bucket = self._buckets.get(group_id)
+        if bucket is None:
+            bucket = self._buckets[group_id] = TokenBucket(self._rate, self._burst)
+        return bucket
+
+    async def before_calling_api(self, bot: Bot, api: str, data: dict[str, Any]):
+        group_id = get_target_group_id(api, data)
+        if group_id is None:
+            return
+        stats = self.stats[group_id]
+        start_time = time.perf_counter()
+        stats.waiting += 1
+        try:
+            await self._get_bucket(group_id).acquire(_send_priority.get())
+        finally:
+            stats.waiting -= 1
+        wait_time = time.perf_counter() - start_time
+        stats.max_wait = max(stats.max_wait, wait_time)
+        if wait_time > 1:
+            logger.debug(f"Waited {wait_time:.1f}s to send to group {group_id}")
+
+    async def after_called_api(
+        self,
+        bot: Bot,
+        exception: Exception | None,
+        api: str,
+        data: dict[str, Any],
+        result: Any,
+    ):
+        group_id = get_target_group_id(api, data)
+        if api not in SEND_APIS or _is_retrying.get():
+            return
+        stats = self.stats[group_id or 0]
+        if exception is None:
+            stats.sent += 1
+            return
+        for attempt in range(self._max_retries):
+            if not is_retryable(exception):
+                break
+            delay = self._retry_base_seconds * 2**attempt
+            delay = random.uniform(delay / 2, delay * 1.5)
+            logger.warning(
+                f"Failed to call {api}: {exception!r}, retrying in {delay:.1f}s"
+            )
+            stats.retried += 1
+            await asyncio.sleep(delay)
+            token = _is_retrying.set(True)
+            try:
+                result = await bot.call_api(api, **data)
+            except Exception as e:
+                exception = e
+                continue
+            finally:
+                _is_retrying.reset(token)
+            stats.sent += 1
+            raise MockApiException(result)
+        stats.failed += 1
+
+
+send_scheduler = SendScheduler(
+    rate_per_minute=config.mc_send_rate_per_minute,
+    burst=config.mc_send_burst,
+    max_retries=config.mc_send_max_retries,
+    retry_base_seconds=config.mc_send_retry_base_seconds,
+)
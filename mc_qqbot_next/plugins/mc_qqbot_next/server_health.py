@@ -0,0 +1,234 @@
+"""
+每个服务器的响应时间统计和熔断
+
+记录每个服务器最近的响应时间，超时时间根据 p99 自动调整，响应快的服务器不用等满默认的超时。
+连续失败多次的服务器直接当作无响应，不再等待超时，由后台定期探测，恢复之后再正常使用。
+"""
+
+import asyncio
+import bisect
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from .deadline import create_background_task, remaining
+from .log import logger
+
+T = TypeVar("T")
+
+# 响应时间分桶的上界，从 1 毫秒到 64 秒，每个桶是上一个的 √2 倍
+LATENCY_BUCKETS = [0.001 * 2 ** (i / 2) for i in range(33)]
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    服务器连续失败多次，暂时不再发送请求
+    """
+
+    def __init__(self, server_name: str):
+        super().__init__(f"Circuit of {server_name} is open")
+        self.server_name = server_name
+
+
+class LatencyHistogram:
+    """
+    响应时间直方图
+
+    样本数超过 window 时所有计数减半，旧的样本逐渐失去权重，统计的是最近的响应时间
+    """
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        # 最后一个桶放超过 LATENCY_BUCKETS[-1] 的样本
+        self._counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self._counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        if self.count > self._window:
+            self._counts = [count // 2 for count in self._counts]
+            self.count = sum(self._counts)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Returns:
+            float | None: 第 q 分位的样本所在桶的上界，没有样本时为 None
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS[min(bucket, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+
+class ServerHealth:
+    """
+    单个服务器的响应时间和连续失败次数
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None
+
+
+class ServerHealthTracker:
+    """
+    记录所有服务器的健康状态
+
+    Args:
+        probe: 探测服务器是否恢复的函数，抛出异常表示还没恢复
+        failure_threshold: 连续失败这么多次之后熔断
+        probe_interval_seconds: 熔断之后的探测间隔
+        timeout_multiplier: 超时时间是 p99 的多少倍
+        min_timeout_seconds: 自适应超时的最小值
+        min_samples: 样本数达到之后才开始自适应超时
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[str], Awaitable[object]],
+        failure_threshold: int,
+        probe_interval_seconds: float,
+        timeout_multiplier: float,
+        min_timeout_seconds: float,
+        min_samples: int = 20,
+    ):
+        self._probe = probe
+        self._failure_threshold = failure_threshold
+        self._probe_interval_seconds = probe_interval_seconds
+        self._timeout_multiplier = timeout_multiplier
+        self._min_timeout_seconds = min_timeout_seconds
+        self._min_samples = min_samples
+        self._servers = dict[str, ServerHealth]()
+        self._probe_tasks = dict[str, asyncio.Task]()
+
+    def get(self, server_name: str) -> ServerHealth:
+        health = self._servers.get(server_name)
+        if health is None:
+            health = self._servers[server_name] = ServerHealth()
+        return health
+
+    def is_open(self, server_name: str) -> bool:
+        return self.get(server_name).open
+
+    def timeout(self, server_name: str, max_timeout: float) -> float:
+        """
+        根据最近的响应时间计算超时时间，不超过 max_timeout
+        """
+        latency = self.get(server_name).latency
+        if latency.count < self._min_samples:
+            return max_timeout
+        p99 = latency.quantile(0.99)
+        assert p99 is not None
+        return min(
+            max_timeout, max(self._min_timeout_seconds, p99 * self._timeout_multiplier)
+        )
+
+    def record_success(self, server_name: str, seconds: float):
+        health = self.get(server_name)
+        health.latency.record(seconds)
+        health.consecutive_failures = 0
+        if health.open:
+            logger.info(f"{server_name} is responding again, closing its circuit")
+            health.opened_at = None
+
+    def record_failure(self, server_name: str, max_timeout: float):
+        health = self.get(server_name)
+        health.consecutive_failures += 1
+        if health.open or health.consecutive_failures < self._failure_threshold:
+            return
+        logger.warning(
+            f"{server_name} failed {health.consecutive_failures} times in a row, "
+            "opening its circuit"
+        )
+        health.opened_at = time.monotonic()
+        self._start_probe(server_name, max_timeout)
+
+    async def call(
+        self,
+        server_name: str,
+        operation: Callable[[], Awaitable[T]],
+        max_timeout: float,
+        schedule: Callable[[Callable[[], Awaitable[T]]], Awaitable[T]] | None = None,
+    ) -> T:
+        """
+        在自适应超时内执行对服务器的操作，并记录结果
+
+        超时从 operation 真正开始执行时计算，不包括在 schedule 里排队的时间。
+        命令剩下的时间不够一个完整的超时的时候，超时不记为失败，
+        只有服务器确实用满了自适应超时还没响应才算。
+
+        Args:
+            operation: 对服务器的操作
+            max_timeout: 自适应超时的上限
+            schedule: 排队执行的函数，接收要执行的操作，比如交给 RCON 调度
+
+        Raises:
+            CircuitOpenError: 服务器已经熔断，没有执行操作
+            asyncio.TimeoutError: 超时
+        """
+        if self.is_open(server_name):
+            raise CircuitOpenError(server_name)
+
+        async def run() -> T:
+            timeout = self.timeout(server_name, max_timeout)
+            available = remaining(timeout)
+            if available <= 0:
+                raise asyncio.TimeoutError("Deadline exceeded")
+            start_time = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(operation(), available)
+            except asyncio.TimeoutError:
+                if available >= timeout:
+                    self.record_failure(server_name, max_timeout)
+                raise
+            except Exception:
+                self.record_failure(server_name, max_timeout)
+                raise
+            self.record_success(server_name, time.perf_counter() - start_time)
+            return result
+
+        if schedule is None:
+            return await run()
+        return await schedule(run)
+
+    def _start_probe(self, server_name: str, timeout: float):
+        task = self._probe_tasks.get(server_name)
+        if task is not None and not task.done():
+            return
+        self._probe_tasks[server_name] = create_background_task(
+            self._run_probe(server_name, timeout)
+        )
+
+    async def _run_probe(self, server_name: str, timeout: float):
+        while self.is_open(server_name):
+            await asyncio.sleep(self._probe_interval_seconds)
+            start_time = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._probe(server_name), timeout)
+            except Exception as e:
+                logger.debug(f"Probe of {server_name} failed: {e!r}")
+                continue
+            self.record_success(server_name, time.perf_counter() - start_time)
+
+    def reset(self):
+        """
+        清空所有状态并停止探测
+        """
+        for task in self._probe_tasks.values():
+            task.cancel()
+        self._probe_tasks.clear()
+        self._servers.clear()
+
+    async def close(self):
+        self.reset()
@@ -0,0 +1,272 @@
+import asyncio
+import bisect
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass
+
+from .deadline import create_background_task
+from .log import logger
+
+# docker compose 给容器打的项目标签，项目名就是服务器名称
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+# 事件流断开之后重新连接的等待时间
+EVENTS_RECONNECT_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class ContainerEvent:
+    """
+    Docker 容器事件
+
+    Attributes:
+        action (str): start, stop, die, "health_status: healthy" 等
+        server_name (str | None): 容器所属的 compose 项目名称
+    """
+
+    action: str
+    server_name: str | None
+
+
+def parse_container_event(raw_event: dict) -> ContainerEvent:
+    """
+    解析 docker events 的一条 JSON 事件
+    """
+    attributes = raw_event.get("Actor", {}).get("Attributes", {})
+    return ContainerEvent(
+        action=raw_event.get("Action") or raw_event.get("status", ""),
+        server_name=attributes.get(COMPOSE_PROJECT_LABEL),
+    )
+
+
+async def watch_docker_cli_events() -> AsyncIterator[ContainerEvent]:
+    """
+    通过 docker events 命令持续获取容器的启动、停止和健康状态事件
+    """
+    process = await asyncio.create_subprocess_exec(
+        "docker",
+        "events",
+        "--filter",
+        "type=container",
+        "--filter",
+        "event=start",
+        "--filter",
+        "event=stop",
+        "--filter",
+        "event=die",
+        "--filter",
+        "event=health_status",
+        "--format",
+        "{{json .}}",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    assert process.stdout is not None
+    try:
+        async for line in process.stdout:
+            try:
+                yield parse_container_event(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid docker event: {line!r}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+
+class ServerRegistry:
+    """
+    运行中的服务器和它们的端口的进程级缓存
+
+    启动后通过 Docker 容器事件增量更新：容器启动时只查询这一个服务器的信息，
+    停止时直接移除。每隔 ttl_seconds 还会在后台完整刷新一次，防止漏掉事件。
+    缓存过期时先返回旧数据，刷新在后台进行，只有第一次查询需要等待完整发现。
+
+    Args:
+        discover_running_server_names: 返回所有运行中服务器名称的协程函数
+        get_game_port: 返回服务器游戏端口的协程函数
+        get_excluded_server_names: 返回需要排除的服务器名称的函数
+        ttl_seconds: 完整刷新的间隔
+    """
+
+    def __init__(
+        self,
+        discover_running_server_names: Callable[[], Awaitable[list[str]]],
+        get_game_port: Callable[[str], Awaitable[int]],
+        get_excluded_server_names: Callable[[], Iterable[str]],
+        ttl_seconds: float,
+    ):
+        self._discover_running_server_names = discover_running_server_names
+        self._get_game_port = get_game_port
+        self._get_excluded_server_names = get_excluded_server_names
+        self._ttl_seconds = ttl_seconds
+        self._ports: dict[str, int] | None = None
+        self._sorted_server_names = list[str]()
+        # 按名称排序，用于二分查找前缀
+        self._server_name_index = list[str]()
+        self._refreshed_at = 0.0
+        self._generation = 0
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._event_listeners = list[Callable[[ContainerEvent], None]]()
+
+    def add_event_listener(self, listener: Callable[[ContainerEvent], None]):
+        """
+        watch_events 收到的每个容器事件在更新缓存之后也交给 listener
+        """
+        self._event_listeners.append(listener)
+
+    async def get_running_server_names(self) -> list[str]:
+        """
+        获取所有运行中的服务器名称，按照端口号排序
+        """
+        await self._ensure_loaded()
+        return list(self._sorted_server_names)
+
+    async def get_game_port(self, server_name: str) -> int | None:
+        await self._ensure_loaded()
+        assert self._ports is not None
+        return self._ports.get(server_name)
+
+    async def locate_server_names(self, prefix: str) -> list[str]:
+        """
+        查找名称完全匹配或者以 prefix 开头的运行中服务器
+
+        Returns:
+            list[str]: 有完全匹配时只返回它，否则返回所有前缀匹配的服务器，按照端口号排序
+        """
+        await self._ensure_loaded()
+        assert self._ports is not None
+        if prefix in self._ports:
+            return [prefix]
+        index = self._server_name_index
+        start = bisect.bisect_left(index, prefix)
+        end = start
+        while end < len(index) and index[end].startswith(prefix):
+            end += 1
+        ports = self._ports
+        return sorted(index[start:end], key=lambda name: ports[name])
+
+    def invalidate(self):
+        """
+        丢弃缓存，下一次查询会重新完整发现
+        """
+        self._ports = None
+        self._sorted_server_names = []
+        self._server_name_index = []
+        self._generation += 1
+
+    async def refresh(self):
+        """
+        完整发现一次所有运行中的服务器
+        """
+        async with self._refresh_lock:
+            generation = self._generation
+            excluded_server_names = set(self._get_excluded_server_names())
+            server_names = [
+                server_name
+                for server_name in await self._discover_running_server_names()
+                if server_name not in excluded_server_names
+            ]
+            ports = await asyncio.gather(
+                *[self._get_game_port(server_name) for server_name in server_names],
+                return_exceptions=True,
+            )
+            # 刷新期间收到了事件，以事件为准，下次再刷新
+            if generation != self._generation and self._ports is not None:
+                return
+            self._set_ports(
+                {
+                    server_name: self._port_or_last(server_name, port)
+                    for server_name, port in zip(server_names, ports)
+                }
+            )
+            self._refreshed_at = time.monotonic()
+
+    async def handle_event(self, event: ContainerEvent):
+        """
+        根据容器事件增量更新缓存
+        """
+        server_name = event.server_name
+        if (
+            server_name is None
+            or server_name in self._get_excluded_server_names()
+            or self._ports is None
+        ):
+            return
+        match event.action:
+            case "start":
+                try:
+                    port = await self._get_game_port(server_name)
+                except Exception as e:
+                    logger.debug(f"Ignoring started container of {server_name}: {e}")
+                    return
+                logger.info(f"Server {server_name} started")
+                self._set_ports(self._ports | {server_name: port})
+            case "stop" | "die":
+                if server_name not in self._ports:
+                    return
+                logger.info(f"Server {server_name} stopped")
+                self._set_ports(
+                    {
+                        name: port
+                        for name, port in self._ports.items()
+                        if name != server_name
+                    }
+                )
+            case _:
+                return
+        self._generation += 1
+
+    async def watch_events(self, watch: Callable[[], AsyncIterator[ContainerEvent]]):
+        """
+        持续消费容器事件，直到被取消
+
+        事件流断开时会重新连接，并且完整刷新一次，因为断开期间可能漏掉了事件。
+        """
+        while True:
+            try:
+                async for event in watch():
+                    await self.handle_event(event)
+                    for listener in self._event_listeners:
+                        listener(event)
+                logger.warning("Docker event stream ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error when watching docker events")
+            await asyncio.sleep(EVENTS_RECONNECT_SECONDS)
+            self._schedule_refresh()
+
+    async def _ensure_loaded(self):
+        if self._ports is None:
+            await self.refresh()
+        elif time.monotonic() - self._refreshed_at > self._ttl_seconds:
+            self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = create_background_task(self._refresh_in_background())
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Failed to refresh running mc servers")
+
+    def _port_or_last(self, server_name: str, port: int | BaseException) -> int:
+        """
+        获取端口失败时沿用上次的端口，没有的话排到最后
+        """
+        if not isinstance(port, BaseException):
+            return port
+        logger.warning(f"Failed to get game port of {server_name}: {port}")
+        if self._ports is not None and server_name in self._ports:
+            return self._ports[server_name]
+        return 1 << 16
+
+    def _set_ports(self, ports: dict[str, int]):
+        self._ports = ports
+        self._sorted_server_names = sorted(ports, key=lambda name: ports[name])
+        self._server_name_index = sorted(ports)
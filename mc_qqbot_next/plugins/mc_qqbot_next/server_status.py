@@ -0,0 +1,155 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from .config import config
+from .deadline import create_background_task
+from .docker import (
+    get_port_sorted_running_server_names,
+    healthy,
+    list_players,
+    paused,
+)
+from .log import logger
+from .rcon_scheduler import RCONPriority, rcon_priority
+
+
+@dataclass
+class ServerStatusEntry:
+    """
+    单个服务器最近一次查询到的状态
+
+    Attributes:
+        players (list[str] | None): 在线玩家列表，获取失败时为 None
+        paused (bool): 是否被暂停
+        healthy (bool): 容器是否健康
+        updated_at (float): 查询完成的时间，time.monotonic()
+        error (str | None): 查询出错时的错误信息
+    """
+
+    players: list[str] | None
+    paused: bool
+    healthy: bool
+    updated_at: float
+    error: str | None = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+
+
+class ServerStatusPoller:
+    """
+    在后台定期查询所有服务器的状态，/ping 直接读取最近的结果
+
+    有人在线或者最近有人查询时按 interval_seconds 刷新，否则每轮把间隔翻倍，
+    最长 max_interval_seconds。查询时结果超过 stale_seconds 就先返回旧结果，
+    同时在后台刷新；同一时间只有一次刷新，所以不管多少人刷 /list，
+    发给服务器的请求数都不变。只有新出现的服务器需要等待第一次查询。
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        max_interval_seconds: float,
+        stale_seconds: float,
+    ):
+        self._interval_seconds = interval_seconds
+        self._max_interval_seconds = max_interval_seconds
+        self.stale_seconds = stale_seconds
+        self._entries = dict[str, ServerStatusEntry]()
+        self._current_interval = interval_seconds
+        self._requested = False
+        self._refresh_task: asyncio.Task | None = None
+
+    async def _query(self, server_name: str) -> ServerStatusEntry:
+        try:
+            is_paused, is_healthy, players = await asyncio.gather(
+                paused(server_name), healthy(server_name), list_players(server_name)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to query status of {server_name}: {e!r}")
+            return ServerStatusEntry(
+                players=None,
+                paused=False,
+                healthy=False,
+                updated_at=time.monotonic(),
+                error=repr(e),
+            )
+        return ServerStatusEntry(
+            players=players,
+            paused=is_paused,
+            healthy=is_healthy,
+            updated_at=time.monotonic(),
+            error=None if players is not None else "no response",
+        )
+
+    async def _refresh(self, server_names: list[str]):
+        # 状态轮询排在群里的命令后面
+        with rcon_priority(RCONPriority.BACKGROUND):
+            entries = await asyncio.gather(
+                *[self._query(server_name) for server_name in server_names]
+            )
+        self._entries = dict(zip(server_names, entries))
+
+    def refresh(self, server_names: list[str]) -> asyncio.Task:
+        """
+        刷新这些服务器的状态，已经在刷新时返回正在进行的刷新
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = create_background_task(self._refresh(server_names))
+        return self._refresh_task
+
+    async def get_statuses(self) -> dict[str, ServerStatusEntry]:
+        """
+        获取所有运行中服务器的状态，按照端口号排序
+        """
+        self._requested = True
+        server_names = await get_port_sorted_running_server_names()
+        # 新出现的服务器要等查询完成，正在进行的刷新可能还不包括它，所以最多等两次
+        for _ in range(2):
+            if all(server_name in self._entries for server_name in server_names):
+                break
+            await asyncio.shield(self.refresh(server_names))
+        if any(entry.age > self.stale_seconds for entry in self._entries.values()):
+            self.refresh(server_names)
+        return {
+            server_name: self._entries[server_name]
+            for server_name in server_names
+            if server_name in self._entries
+        }
+
+    def _next_interval(self) -> float:
+        someone_online = any(entry.players for entry in self._entries.values())
+        if someone_online or self._requested:
+            self._current_interval = self._interval_seconds
+        else:
+            self._current_interval = min(
+                self._current_interval * 2, self._max_interval_seconds
+            )
+        self._requested = False
+        return self._current_interval
+
+    async def run(self):
+        """
+        持续在后台刷新，直到被取消
+        """
+        while True:
+            try:
+                await self.refresh(await get_port_sorted_running_server_names())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to refresh server statuses")
+            await asyncio.sleep(self._next_interval())
+
+
+status_poller = (
+    ServerStatusPoller(
+        interval_seconds=config.mc_status_poll_interval_seconds,
+        max_interval_seconds=config.mc_status_poll_max_interval_seconds,
+        stale_seconds=config.mc_status_stale_seconds,
+    )
+    if config.mc_status_poll_enabled
+    else None
+)
@@ -1,24 +1,45 @@
 import asyncio
+from collections import defaultdict
+from pathlib import Path
 
-from minecraft_docker_manager_lib.instance import MCInstance, MCPlayerMessage
 from nonebot.adapters.onebot.v11.bot import Bot
 from pydantic import BaseModel
 from sqlalchemy.exc import IntegrityError
 
 from .bot import get_onebot_bot
+from .chat_batcher import ChatBatcher, ChatLine
 from .config import config
 from .db.crud.binding import (
-    create_or_update_mc_player_info,
     create_qq_uuid_mapping_by_player_name,
     delete_qq_uuid_mapping,
     get_qq_by_player_name,
 )
 from .db.crud.message import create_message_target
-from .docker import get_instance, get_running_server_names, send_message
+from .docker import (
+    get_all_server_names,
+    get_log_path,
+    get_running_server_names,
+    send_message,
+)
 from .log import logger
-from .mc import PlayerInfo, parse_player_uuid_and_name_from_log
+from .log_file import (
+    HEAD_FINGERPRINT_SIZE,
+    LogFileChange,
+    detect_log_file_change,
+    find_rotated_log_file,
+    get_log_file_identity,
+    read_log_lines,
+    read_rotated_log,
+)
+from .log_event_bus import log_event_bus
+from .log_events import ChatEvent, PlayerUUIDEvent, classify_log
+from .log_pointer import LogPosition, choose_start_pointer, log_pointer_store
+from .log_watcher import LogWatcher
+from .player_info import player_info_writer
+from .send_scheduler import SendPriority, send_priority
 
-server_log_pointer_dict = dict[str, int]()
+# 保证同一服务器的日志按顺序处理，不同服务器之间互不阻塞
+server_log_lock_dict = defaultdict[str, asyncio.Lock](asyncio.Lock)
 
 
 class SendMsgResponse(BaseModel):
@@ -31,41 +52,160 @@ async def check_mc_logs():
     if bot is None:
         logger.trace("No onebot bot fount, skip checking mc logs")
         return
-    for server_name in await get_running_server_names():
-        instance = await get_instance(server_name)
-        if server_name not in server_log_pointer_dict:
-            server_log_pointer_dict[
-                server_name
-            ] = await instance.get_log_file_end_pointer()
-            continue
-        log_pointer = server_log_pointer_dict[server_name]
-        log = await instance.get_logs_from_file(log_pointer)
-        server_log_pointer_dict[server_name] = log.pointer
+    server_names = await get_running_server_names()
+    results = await asyncio.gather(
+        *[check_server_log(server_name) for server_name in server_names],
+        return_exceptions=True,
+    )
+    for server_name, result in zip(server_names, results):
+        if isinstance(result, Exception):
+            logger.opt(exception=result).error(
+                f"Error when checking mc log of {server_name}"
+            )
+
+
+async def check_server_log(server_name: str):
+    async with server_log_lock_dict[server_name]:
+        log_path = await get_log_path(server_name)
+        position = log_pointer_store.get(server_name)
+        if position is None:
+            try:
+                end_pointer = log_path.stat().st_size
+            except FileNotFoundError:
+                return
+            saved_position = await log_pointer_store.get_saved(server_name)
+            position = LogPosition(
+                pointer=choose_start_pointer(saved_position, log_path, end_pointer),
+                identity=get_log_file_identity(log_path),
+            )
+            log_pointer_store.set(server_name, position)
+            if position.pointer == end_pointer:
+                return
+            logger.info(
+                f"Replaying {end_pointer - position.pointer} bytes of log "
+                f"of {server_name} since last run"
+            )
+
+        match detect_log_file_change(position.identity, position.pointer, log_path):
+            case LogFileChange.ROTATED:
+                await catch_up_rotated_log(server_name, log_path, position)
+                position = LogPosition(
+                    pointer=0, identity=get_log_file_identity(log_path)
+                )
+                log_pointer_store.set(server_name, position)
+            case LogFileChange.TRUNCATED:
+                logger.info(f"Log of {server_name} was truncated, reading from start")
+                position = LogPosition(
+                    pointer=0, identity=get_log_file_identity(log_path)
+                )
+                log_pointer_store.set(server_name, position)
+
+        try:
+            # 每处理完一块再读下一块，指针随之推进，
+            # 日志暴增时内存占用也不会超过一块
+            async for content, pointer in read_log_lines(
+                log_path,
+                position.pointer,
+                chunk_size=config.mc_log_read_chunk_bytes,
+            ):
+                if position.identity is None or (
+                    position.identity.head_size < HEAD_FINGERPRINT_SIZE
+                ):
+                    identity = get_log_file_identity(log_path)
+                else:
+                    identity = position.identity
+                position = LogPosition(pointer=pointer, identity=identity)
+                log_pointer_store.set(server_name, position)
+                await handle_new_log(server_name, content)
+        except FileNotFoundError:
+            # 轮转进行到一半，下次再读
+            return
+
+
+async def catch_up_rotated_log(
+    server_name: str,
+    log_path: Path,
+    position: LogPosition,
+):
+    """
+    latest.log 在两次读取之间被轮转时，把旧文件中还没读到的部分读完
+    """
+    assert position.identity is not None
+    rotated_log_path = await asyncio.to_thread(
+        find_rotated_log_file, log_path, position.identity
+    )
+    if rotated_log_path is None:
+        logger.warning(
+            f"Log of {server_name} was rotated but the old file can't be found, "
+            f"lines after {position.pointer} are lost"
+        )
+        return
+    logger.info(
+        f"Log of {server_name} was rotated, catching up from {rotated_log_path}"
+    )
+    try:
+        async for content in read_rotated_log(rotated_log_path, position.pointer):
+            await handle_new_log(server_name, content)
+    except (OSError, EOFError) as e:
+        logger.warning(f"Failed to read rotated log {rotated_log_path}: {e}")
+
+
+async def evict_stale_log_pointers():
+    try:
+        await log_pointer_store.evict(await get_all_server_names())
+    except Exception:
+        logger.exception("Failed to evict stale log pointers")
+
+
+async def refresh_log_pointers():
+    try:
+        log_pointer_store.refresh(await get_running_server_names())
+    except Exception:
+        logger.exception("Failed to refresh log pointers")
+
+
+async def check_single_mc_log(server_name: str):
+    logger.trace(f"Checking mc log of {server_name}")
+    bot = get_onebot_bot()
+    if bot is None:
+        logger.trace("No onebot bot fount, skip checking mc logs")
+        return
+    await check_server_log(server_name)
 
-        await handle_new_log(bot, server_name, log.content)
+
+async def get_running_server_log_paths() -> dict[str, Path]:
+    return {
+        server_name: await get_log_path(server_name)
+        for server_name in await get_running_server_names()
+    }
+
+
+log_watcher = LogWatcher(
+    get_log_paths=get_running_server_log_paths,
+    on_log_changed=check_single_mc_log,
+    rescan_seconds=config.mc_log_watch_rescan_seconds,
+)
 
 
 async def handle_new_log(
-    bot: Bot,
     server_name: str,
     log_content: str,
 ):
-    player_messages = MCInstance.parse_player_messages_from_log(log_content)
-    if player_messages:
-        logger.debug(f"Player messages: {player_messages}")
-        await handle_player_messages(bot, server_name, player_messages)
-
-    player_info_list = parse_player_uuid_and_name_from_log(log_content)
-    if player_info_list:
-        logger.debug(f"Player info list (player join): {player_info_list}")
-        await handle_player_join(player_info_list)
+    events = classify_log(log_content)
+    if events:
+        logger.debug(f"Log events from {server_name}: {events}")
+        await log_event_bus.publish(server_name, events)
 
 
+@log_event_bus.subscribe(ChatEvent)
 async def handle_player_messages(
-    bot: Bot,
     server_name: str,
-    player_messages: list[MCPlayerMessage],
+    player_messages: list[ChatEvent],
 ):
+    bot = get_onebot_bot()
+    if bot is None:
+        logger.warning(f"No onebot bot found, dropping messages from {server_name}")
+        return
     for player_message in player_messages:
         startswith_candidate = (r"\\", "、、")
         for startswith in startswith_candidate:
@@ -115,11 +255,17 @@ async def handle_send_command(
     player_name: str,
     message: str,
 ):
-    result = await bot.send_group_msg(
-        group_id=config.mc_group_id,
-        message=f"[{server_name}] <{player_name}>: {message}",
-        auto_escape=True,
-    )
+    if chat_batcher is not None:
+        await chat_batcher.add(
+            ChatLine(server_name=server_name, player_name=player_name, message=message)
+        )
+        return
+    with send_priority(SendPriority.RELAY):
+        result = await bot.send_group_msg(
+            group_id=config.mc_group_id,
+            message=f"[{server_name}] <{player_name}>: {message}",
+            auto_escape=True,
+        )
     send_msg_response = SendMsgResponse.model_validate(result)
     await create_message_target(
         message_id=send_msg_response.message_id,
@@ -127,6 +273,40 @@ async def handle_send_command(
     )
 
 
+async def send_chat_lines(lines: list[ChatLine]):
+    """
+    把合并后的聊天消息作为一条群消息发送
+
+    同一批的消息都来自同一个服务器，回复这条消息时发往这个服务器
+    """
+    bot = get_onebot_bot()
+    if bot is None:
+        logger.warning(f"No onebot bot found, dropping {len(lines)} chat lines")
+        return
+    with send_priority(SendPriority.RELAY):
+        result = await bot.send_group_msg(
+            group_id=config.mc_group_id,
+            message="\n".join(line.format() for line in lines),
+            auto_escape=True,
+        )
+    send_msg_response = SendMsgResponse.model_validate(result)
+    await create_message_target(
+        message_id=send_msg_response.message_id,
+        target_server=lines[-1].server_name,
+    )
+
+
+chat_batcher = (
+    ChatBatcher(
+        window_seconds=config.mc_chat_batch_window_ms / 1000,
+        scope=config.mc_chat_batch_scope,
+        send=send_chat_lines,
+    )
+    if config.mc_chat_batch_window_ms > 0
+    else None
+)
+
+
 async def handle_bind_command(
     server_name: str,
     player_name: str,
@@ -208,12 +388,11 @@ async def handle_bind_command(
             )
 
 
+@log_event_bus.subscribe(PlayerUUIDEvent)
 async def handle_player_join(
-    plyaer_info_list: list[PlayerInfo],
+    server_name: str,
+    player_uuid_events: list[PlayerUUIDEvent],
 ):
-    await asyncio.gather(
-        *[
-            create_or_update_mc_player_info(player_info.uuid, player_info.name)
-            for player_info in plyaer_info_list
-        ]
-    )
+    logger.debug(f"Player info list (player join): {player_uuid_events}")
+    for event in player_uuid_events:
+        player_info_writer.add(event.uuid, event.name)
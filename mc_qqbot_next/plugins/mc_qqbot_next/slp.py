@@ -0,0 +1,176 @@
+"""
+Minecraft Server List Ping 协议
+
+和客户端在服务器列表里刷新服务器一样，连接游戏端口，一次 TCP 交换就能拿到
+在线人数、最大人数、部分在线玩家、MOTD 和延迟，不需要 RCON。
+"""
+
+import asyncio
+import json
+import struct
+import time
+from dataclasses import dataclass
+
+# 握手时的协议版本号，-1 表示只查询状态，不关心版本
+SLP_PROTOCOL_VERSION = -1
+SLP_NEXT_STATE_STATUS = 1
+SLP_PACKET_ID_HANDSHAKE = 0x00
+SLP_PACKET_ID_STATUS = 0x00
+SLP_PACKET_ID_PING = 0x01
+
+
+class SLPError(RuntimeError):
+    pass
+
+
+@dataclass
+class ServerStatus:
+    """
+    Server List Ping 的结果
+
+    Attributes:
+        online (int): 在线人数
+        max_players (int): 最大人数
+        players (list[str]): 服务器给出的部分在线玩家，人多的时候只有一部分
+        motd (str): 服务器描述
+        version (str): 服务器版本名称
+        latency (float): Ping 的往返时间，单位是秒
+    """
+
+    online: int
+    max_players: int
+    players: list[str]
+    motd: str
+    version: str
+    latency: float
+
+    @property
+    def players_complete(self) -> bool:
+        """
+        服务器给出的玩家是不是全部的在线玩家
+        """
+        return len(self.players) == self.online
+
+
+def encode_varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    result = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def decode_varint(data: bytes, offset: int = 0) -> tuple[int, int]:
+    """
+    Returns:
+        tuple[int, int]: (数值, VarInt 之后的位置)
+    """
+    result = 0
+    for shift in range(0, 35, 7):
+        if offset >= len(data):
+            raise SLPError("VarInt is incomplete")
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            # 转换成有符号 32 位整数
+            return (result - (1 << 32) if result & (1 << 31) else result), offset
+    raise SLPError("VarInt is too big")
+
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    data = b""
+    while not data or data[-1] & 0x80:
+        if len(data) >= 5:
+            raise SLPError("VarInt is too big")
+        data += await reader.readexactly(1)
+    return decode_varint(data)[0]
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode()
+    return encode_varint(len(data)) + data
+
+
+def encode_packet(packet_id: int, payload: bytes = b"") -> bytes:
+    data = encode_varint(packet_id) + payload
+    return encode_varint(len(data)) + data
+
+
+async def read_packet(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """
+    Returns:
+        tuple[int, bytes]: (数据包 ID, 剩下的内容)
+    """
+    length = await read_varint(reader)
+    data = await reader.readexactly(length)
+    packet_id, offset = decode_varint(data)
+    return packet_id, data[offset:]
+
+
+def parse_motd(description: str | dict | list) -> str:
+    """
+    MOTD 可能是纯文本，也可能是聊天组件，只保留文字
+    """
+    if isinstance(description, str):
+        return description
+    if isinstance(description, list):
+        return "".join(parse_motd(part) for part in description)
+    return description.get("text", "") + "".join(
+        parse_motd(part) for part in description.get("extra", [])
+    )
+
+
+async def ping_server(host: str, port: int, timeout: float) -> ServerStatus:
+    """
+    查询服务器状态
+
+    Raises:
+        SLPError: 服务器的响应不符合协议
+        OSError: 连接失败
+        asyncio.TimeoutError: 超时
+    """
+    async with asyncio.timeout(timeout):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            handshake = (
+                encode_varint(SLP_PROTOCOL_VERSION)
+                + encode_string(host)
+                + struct.pack(">H", port)
+                + encode_varint(SLP_NEXT_STATE_STATUS)
+            )
+            writer.write(encode_packet(SLP_PACKET_ID_HANDSHAKE, handshake))
+            writer.write(encode_packet(SLP_PACKET_ID_STATUS))
+            await writer.drain()
+            packet_id, payload = await read_packet(reader)
+            if packet_id != SLP_PACKET_ID_STATUS:
+                raise SLPError(f"Unexpected packet {packet_id} from {host}:{port}")
+            length, offset = decode_varint(payload)
+            status = json.loads(payload[offset : offset + length])
+
+            start_time = time.perf_counter()
+            writer.write(encode_packet(SLP_PACKET_ID_PING, struct.pack(">q", 1)))
+            await writer.drain()
+            packet_id, _ = await read_packet(reader)
+            latency = time.perf_counter() - start_time
+            if packet_id != SLP_PACKET_ID_PING:
+                raise SLPError(f"Unexpected packet {packet_id} from {host}:{port}")
+        except (asyncio.IncompleteReadError, json.JSONDecodeError) as e:
+            raise SLPError(f"Invalid status response from {host}:{port}: {e}")
+        finally:
+            writer.close()
+
+    players = status.get("players", {})
+    return ServerStatus(
+        online=players.get("online", 0),
+        max_players=players.get("max", 0),
+        players=[player["name"] for player in players.get("sample", [])],
+        motd=parse_motd(status.get("description", "")),
+        version=status.get("version", {}).get("name", ""),
+        latency=latency,
+    )
@@ -4,6 +4,7 @@ import shutil
 import nonebot
 import nonebot.drivers
 import pytest
+import pytest_asyncio
 from nonebot.adapters.onebot.v11 import Adapter as Onebot11Adapter
 
 
@@ -17,3 +18,12 @@ def load_bot():
         shutil.rmtree(data_dir)
 
     nonebot.load_from_toml("pyproject.toml")
+
+
+@pytest_asyncio.fixture(loop_scope="function", autouse=True)
+async def close_log_event_bus():
+    yield
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_event_bus import log_event_bus
+
+    # the workers belong to this test's event loop
+    await log_event_bus.close()
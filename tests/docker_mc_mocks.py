@@ -1,4 +1,5 @@
 import asyncio
+import tempfile
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
@@ -29,7 +30,6 @@ class MockMCInstance:
         list_players_response: list[str] = [],
         game_port: int = 25565,
         get_server_info_response: MockMCServerInfo | None = None,
-        mocked_log_content: str = "mock log content",
         healthy_response: bool = True,
         exists_response: bool = True,
         created_response: bool = True,
@@ -41,15 +41,18 @@ class MockMCInstance:
             get_server_info_response = MockMCServerInfo()
         get_server_info_response.name = name
         get_server_info_response.game_port = game_port
-        self.mocked_log_content = mocked_log_content
-        self.pointer = 0
+        # latest.log is a real file so the bot can read it like a real server's
+        self.project_path = Path(tempfile.mkdtemp())
+        self.log_path = self.project_path / "data" / "logs" / "latest.log"
+        self.log_path.parent.mkdir(parents=True)
+        self.log_path.touch()
 
         self.send_command_response = send_command_response
 
         self.healthy_response = healthy_response
         self.exists_response = exists_response
         self.created_response = created_response
-        self.running_response = running_response
+        self._running_response = running_response
         self.list_players_response = list_players_response
 
         self.restart_time = restart_time
@@ -60,17 +63,17 @@ class MockMCInstance:
         self.get_server_info = AsyncMock(return_value=get_server_info_response)
         self.healthy = AsyncMock(side_effect=self._healthy)
         self.get_name = MagicMock(return_value=self.name)
-        self.get_project_path = MagicMock(return_value=Path(f"/mock/path/{self.name}"))
+        self.get_project_path = MagicMock(return_value=self.project_path)
         self.get_compose_manager = MagicMock(return_value=MagicMock())
         self.verify_compose_obj = MagicMock(return_value=True)
         self.get_compose_file_path = AsyncMock(
             return_value=Path(f"/mock/path/{self.name}/docker-compose.yml")
         )
         self.get_compose_obj = AsyncMock(return_value=MagicMock())
-        self._get_log_path = MagicMock(
-            return_value=Path(f"/mock/path/{self.name}/data/logs/latest.log")
+        self._get_log_path = MagicMock(return_value=self.log_path)
+        self.get_log_file_end_pointer = AsyncMock(
+            side_effect=lambda: self.log_path.stat().st_size
         )
-        self.get_log_file_end_pointer = AsyncMock(return_value=100)
         self.get_logs_from_file = AsyncMock(side_effect=self._get_logs_from_file)
         self.parse_player_messages_from_log = MagicMock(return_value=[])
         self.get_player_messages_from_log = AsyncMock(return_value=([], 100))
@@ -89,11 +92,17 @@ class MockMCInstance:
         self.paused = AsyncMock(return_value=False)
         self.wait_until_healthy = AsyncMock()
 
-    async def _send_command(self, *args, **kwargs):
-        if self.healthy_response:
-            return self.send_command_response
-        else:
+    async def _send_command(self, command: str, *args, **kwargs):
+        if not self.healthy_response:
             raise Exception("Instance is not healthy")
+        if command == "list":
+            # answer like a vanilla server with whatever list_players returns
+            players = await self.list_players()
+            return (
+                f"There are {len(players)} of a max of 20 players online: "
+                f"{', '.join(players)}"
+            )
+        return self.send_command_response
 
     async def _list_players(self):
         if self.healthy_response:
@@ -113,6 +122,18 @@ class MockMCInstance:
     async def _running(self):
         return self.running_response
 
+    @property
+    def running_response(self) -> bool:
+        return self._running_response
+
+    @running_response.setter
+    def running_response(self, value: bool):
+        from mc_qqbot_next.plugins.mc_qqbot_next.docker import server_registry
+
+        # a real server would emit a container start/stop event
+        self._running_response = value
+        server_registry.invalidate()
+
     async def _restart(self):
         self.healthy_response = False
 
@@ -123,11 +144,21 @@ class MockMCInstance:
         asyncio.create_task(restart_task())
 
     def set_mocked_log_content(self, content: str):
-        self.mocked_log_content = content
+        """
+        Append content to latest.log as complete lines
+        """
+        if not content.endswith("\n"):
+            content += "\n"
+        with self.log_path.open("a", encoding="utf-8") as f:
+            f.write(content)
 
     async def _get_logs_from_file(self, log_pointer: int):
-        self.pointer += len(self.mocked_log_content)
-        return LogType(content=self.mocked_log_content, pointer=self.pointer)
+        with self.log_path.open("rb") as f:
+            f.seek(log_pointer)
+            content = f.read()
+        return LogType(
+            content=content.decode("utf-8"), pointer=log_pointer + len(content)
+        )
 
 
 class MockDockerMCManager:
@@ -214,8 +245,19 @@ class MockDockerMCManager:
 
 @contextmanager
 def mock_common_docker_mc_manager(mock_docker_mc_manager: MockDockerMCManager):
-    with patch(
-        "mc_qqbot_next.plugins.mc_qqbot_next.docker.docker_mc_manager",
-        new=mock_docker_mc_manager,
-    ):
-        yield
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import (
+        server_health,
+        server_registry,
+    )
+
+    server_registry.invalidate()
+    server_health.reset()
+    try:
+        with patch(
+            "mc_qqbot_next.plugins.mc_qqbot_next.docker.docker_mc_manager",
+            new=mock_docker_mc_manager,
+        ):
+            yield
+    finally:
+        server_registry.invalidate()
+        server_health.reset()
@@ -2,7 +2,7 @@ import nonebot
 from nonebot.adapters import Event
 from nonebot.adapters.onebot.v11 import Adapter as Onebot11Adapter
 from nonebot.adapters.onebot.v11 import Bot as Onebot11Bot
-from nonebot.adapters.onebot.v11.message import MessageSegment
+from nonebot.adapters.onebot.v11.message import Message, MessageSegment
 from nonebot.matcher import Matcher
 from nonebug import App
 
@@ -32,8 +32,10 @@ async def bot_receive_event(
             if respond_in_forward_message:
                 ctx.should_call_send(
                     event,
-                    MessageSegment.node_custom(
-                        user_id=int(bot.self_id), nickname="", content=mock_response
+                    Message(
+                        MessageSegment.node_custom(
+                            user_id=int(bot.self_id), nickname="", content=mock_response
+                        )
                     ),
                     result=None,
                 )
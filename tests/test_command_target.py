@@ -16,6 +16,7 @@ async def test_extract_content_and_target_from_str(app: App):
         CommandTarget,
         extract_content_and_target_from_str,
     )
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import AmbiguousServerNameError
 
     config.mc_default_server = "default_server"
     config.mc_excluded_servers = ["excluded"]
@@ -70,8 +71,16 @@ async def test_extract_content_and_target_from_str(app: App):
         await test_case("hello world /server1", "hello world", "server1")
         
         # Test partial server name matching
-        await test_case("hello world /s", "hello world", "server1")  # should match first server starting with 's'
+        await test_case("hello world /d", "hello world", "default_server")  # should match the only server starting with 'd'
         await test_case("hello world /ser", "hello world", "ser")     # should match exact 'ser'
+
+        # Test ambiguous prefix, matches are reported in port order
+        with pytest.raises(AmbiguousServerNameError) as exc_info:
+            await extract_content_and_target_from_str("hello world /s")
+        assert exc_info.value.server_names == ["server1", "server2", "ser"]
+        with pytest.raises(AmbiguousServerNameError) as exc_info:
+            await extract_content_and_target_from_str("hello world /server")
+        assert exc_info.value.server_names == ["server1", "server2"]
         
         # Test no server specification
         await test_case("hello world", "hello world", None)
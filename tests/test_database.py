@@ -47,6 +47,44 @@ async def test_uuid_name_mapping():
     await delete_mc_player_info("069a79f444e94726a5befca90e38aaf5")
 
 
+@pytest.mark.asyncio
+async def test_upsert_mc_player_infos():
+    from nonebot_plugin_orm import init_orm
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.db.crud.binding import (
+        delete_mc_player_info,
+        get_uuid_by_player_name,
+        upsert_mc_player_infos,
+    )
+
+    await init_orm()
+    assert await upsert_mc_player_infos({}) == 0
+    assert (
+        await upsert_mc_player_infos(
+            {
+                "069a79f444e94726a5befca90e38aaf5": "Notch",
+                "ec70bcaf702f4bb8b48d276fa52a780c": "Dream",
+            }
+        )
+        == 2
+    )
+    # unchanged rows are skipped
+    assert (
+        await upsert_mc_player_infos(
+            {
+                "069a79f444e94726a5befca90e38aaf5": "Notch",
+                "ec70bcaf702f4bb8b48d276fa52a780c": "Dream2",
+            }
+        )
+        == 1
+    )
+    assert await get_uuid_by_player_name("Notch") == "069a79f444e94726a5befca90e38aaf5"
+    assert await get_uuid_by_player_name("Dream") is None
+    assert await get_uuid_by_player_name("Dream2") == "ec70bcaf702f4bb8b48d276fa52a780c"
+    await delete_mc_player_info("069a79f444e94726a5befca90e38aaf5")
+    await delete_mc_player_info("ec70bcaf702f4bb8b48d276fa52a780c")
+
+
 @pytest.mark.asyncio
 async def test_avoid_duplicated_binding():
     from nonebot_plugin_orm import init_orm
@@ -0,0 +1,102 @@
+import asyncio
+import inspect
+
+import pytest
+
+from .docker_mc_mocks import (
+    MockDockerMCManager,
+    MockMCInstance,
+    mock_common_docker_mc_manager,
+)
+
+
+@pytest.mark.asyncio
+async def test_deadline():
+    from mc_qqbot_next.plugins.mc_qqbot_next.deadline import (
+        create_background_task,
+        deadline,
+        remaining,
+        run_with_deadline,
+        with_deadline,
+    )
+
+    assert remaining(10) == 10
+    with deadline(1):
+        assert 0.9 < remaining(10) <= 1
+        assert remaining(0.5) == 0.5
+        # an inner deadline can't extend the outer one
+        with deadline(5):
+            assert remaining(10) <= 1
+        with deadline(0.1):
+            assert remaining(10) <= 0.1
+
+        # the background task doesn't inherit the deadline
+        async def get_remaining():
+            return remaining(10)
+
+        assert await create_background_task(get_remaining()) == 10
+    assert remaining(10) == 10
+
+    # the underlying work is cancelled when the deadline passes
+    cancelled = asyncio.Event()
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with deadline(0.05):
+        with pytest.raises(asyncio.TimeoutError):
+            await run_with_deadline(hang(), 10)
+        assert cancelled.is_set()
+
+        await asyncio.sleep(0.05)
+        # nothing is started once the deadline has passed
+        with pytest.raises(asyncio.TimeoutError):
+            await run_with_deadline(hang(), 10)
+
+    @with_deadline(0.05)
+    async def handler(server_name: str):
+        return await run_with_deadline(asyncio.sleep(1, server_name), 10)
+
+    assert list(inspect.signature(handler).parameters) == ["server_name"]
+    with pytest.raises(asyncio.TimeoutError):
+        await handler("server1")
+
+
+@pytest.mark.asyncio
+async def test_docker_deadline():
+    from mc_qqbot_next.plugins.mc_qqbot_next.deadline import deadline
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import (
+        healthy,
+        list_players,
+        send_rcon_command,
+    )
+
+    server = MockMCInstance(name="server1", list_players_response=["Notch"])
+    cancelled = list[str]()
+
+    async def hang(*args, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(server.name)
+            raise
+
+    server.send_command_rcon.side_effect = hang
+    server.healthy.side_effect = hang
+    mock_docker_mc_manager = MockDockerMCManager(instances=[server])
+    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+        with deadline(0.05), pytest.raises(asyncio.TimeoutError):
+            await send_rcon_command("server1", "ban Notch")
+        with deadline(0.05), pytest.raises(asyncio.TimeoutError):
+            await healthy("server1")
+        # the hung calls were cancelled instead of being left pending
+        assert cancelled == ["server1", "server1"]
+
+        # listing players reports the server as unresponsive once time is up
+        with deadline(0):
+            assert await list_players("server1") is None
+            server.list_players.assert_not_called()
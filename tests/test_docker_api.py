@@ -0,0 +1,115 @@
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_docker_engine_client():
+    from aiohttp import web
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker_api import (
+        DockerAPIError,
+        DockerEngineClient,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_registry import ContainerEvent
+
+    containers = {
+        "server1": {
+            "Id": "c1",
+            "State": {
+                "Running": True,
+                "Paused": False,
+                "Health": {"Status": "healthy"},
+            },
+        },
+        "server2": {"Id": "c2", "State": {"Running": True, "Paused": True}},
+    }
+    requests = list[str]()
+
+    async def list_containers(request: web.Request):
+        requests.append(request.path)
+        label = json.loads(request.query["filters"])["label"][0]
+        server_name = label.split("=", 1)[1]
+        if server_name not in containers:
+            return web.json_response([])
+        return web.json_response([{"Id": containers[server_name]["Id"]}])
+
+    def find_container(container_id: str):
+        for container in containers.values():
+            if container["Id"] == container_id:
+                return container
+        raise web.HTTPNotFound(
+            text=json.dumps({"message": "No such container"}),
+            content_type="application/json",
+        )
+
+    async def inspect_container(request: web.Request):
+        requests.append(request.path)
+        return web.json_response(find_container(request.match_info["id"]))
+
+    async def restart_container(request: web.Request):
+        requests.append(request.path)
+        find_container(request.match_info["id"])["State"]["Paused"] = False
+        return web.Response(status=204)
+
+    async def events(request: web.Request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for action, server_name in [("start", "server1"), ("die", "server2")]:
+            event = {
+                "Type": "container",
+                "Action": action,
+                "Actor": {"Attributes": {"com.docker.compose.project": server_name}},
+            }
+            await response.write(json.dumps(event).encode() + b"\n")
+        return response
+
+    app = web.Application()
+    app.router.add_get("/containers/json", list_containers)
+    app.router.add_get("/containers/{id}/json", inspect_container)
+    app.router.add_post("/containers/{id}/restart", restart_container)
+    app.router.add_get("/events", events)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    socket_path = Path(tempfile.mkdtemp()) / "docker.sock"
+    await web.UnixSite(runner, str(socket_path)).start()
+
+    client = DockerEngineClient(str(socket_path), timeout_seconds=5)
+    try:
+        assert await client.healthy("server1")
+        assert not await client.paused("server1")
+        assert await client.paused("server2")
+        assert not await client.healthy("server2")
+        assert not await client.running("server3")
+        # container ids are looked up only once
+        assert requests.count("/containers/json") == 3
+
+        assert await client.restart("server2")
+        assert await client.healthy("server2")
+        assert not await client.restart("server3")
+
+        # a recreated container gets a new id
+        containers["server1"]["Id"] = "c1-new"
+        assert await client.healthy("server1")
+        assert requests[-3:] == [
+            "/containers/c1/json",
+            "/containers/json",
+            "/containers/c1-new/json",
+        ]
+
+        # the container was removed
+        del containers["server2"]
+        assert not await client.running("server2")
+
+        assert [event async for event in client.events()] == [
+            ContainerEvent(action="start", server_name="server1"),
+            ContainerEvent(action="die", server_name="server2"),
+        ]
+
+        with pytest.raises(DockerAPIError):
+            await client._request("GET", "/version")
+    finally:
+        await client.close()
+        await runner.cleanup()
@@ -1,3 +1,5 @@
+from unittest.mock import AsyncMock, patch
+
 import nonebot
 import pytest
 from nonebot.adapters.onebot.v11 import Adapter as Onebot11Adapter
@@ -73,14 +75,23 @@ async def test_extract_arg_and_target(app: App):
 
         # test specified server
         await run_test("/ban player /server2", ("player", "server2"))
-        await run_test("/ban player /s", ("player", "server1"))
         await run_test("/ban player /ser", ("player", "ser"))
 
+        # test ambiguous prefix
+        await bot_receive_event(
+            app,
+            ban,
+            create_group_message_event("/ban player /s", role="admin"),
+            "/s 匹配到了多个服务器：server1, server2, ser，请写得更具体一些",
+        )
+        mock_docker_mc_manager.assert_rcon_not_sent_to_any_server()
+
 
 @pytest.mark.asyncio
 async def test_extract_arg_and_target_bare_command(app: App):
     from mc_qqbot_next.plugins.mc_qqbot_next.commands.mc.restart import restart
     from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.restart_jobs import restart_job_manager
 
     config.mc_default_server = "server1"
     config.mc_excluded_servers = ["excluded"]
@@ -114,7 +125,10 @@ async def test_extract_arg_and_target_bare_command(app: App):
         ],
     )
 
-    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+    with (
+        mock_common_docker_mc_manager(mock_docker_mc_manager),
+        patch.object(restart_job_manager, "report", AsyncMock()),
+    ):
 
         async def run_test(message_str, target_server):
             event = create_group_message_event(message_str, role="admin")
@@ -125,8 +139,8 @@ async def test_extract_arg_and_target_bare_command(app: App):
                 ctx.should_pass_permission(restart)
                 ctx.should_pass_rule(restart)
                 ctx.should_call_send(event, f"[{target_server}] 正在重启", result=None)
-                ctx.should_call_send(event, f"[{target_server}] 重启完成", result=None)
                 ctx.should_finished(restart)
+            await restart_job_manager.get_job(target_server).task
 
             mock_docker_mc_manager.instances_dict[
                 target_server
@@ -157,8 +171,13 @@ async def test_extract_arg_and_target_bare_command(app: App):
         await run_test_error("/restart /e", "重启服务器需要明确指定目标服务器")
         # test specified server
         await run_test("/restart /server2", "server2")
-        await run_test("/restart /s", "server1")
+        await run_test("/restart /o", "other")
         await run_test("/restart /ser", "ser")
+        # ambiguous prefix is reported instead of picking one
+        await run_test_error(
+            "/restart /s",
+            "/s 匹配到了多个服务器：server1, server2, ser，请写得更具体一些",
+        )
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_log_event_bus_decouples_delivery():
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_event_bus import LogEventBus
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_events import (
+        ChatEvent,
+        PlayerJoinEvent,
+    )
+
+    bus = LogEventBus(queue_size=3, drop_policy="drop_oldest")
+    delivered = list[tuple[str, list[ChatEvent]]]()
+    release = asyncio.Event()
+
+    @bus.subscribe(ChatEvent)
+    async def slow_handler(server_name: str, events: list[ChatEvent]):
+        await release.wait()
+        delivered.append((server_name, events))
+
+    @bus.subscribe(PlayerJoinEvent)
+    async def failing_handler(server_name: str, events: list[PlayerJoinEvent]):
+        raise RuntimeError("boom")
+
+    # publishing doesn't wait for the slow handler
+    start_time = time.perf_counter()
+    await bus.publish("server1", [ChatEvent(player="Notch", message="0")])
+    await asyncio.sleep(0)
+    await bus.publish(
+        "server1",
+        [
+            PlayerJoinEvent(player="Notch"),
+            *[ChatEvent(player="Notch", message=str(i)) for i in range(1, 5)],
+        ],
+    )
+    await bus.publish("server2", [ChatEvent(player="Dream", message="hi")])
+    assert time.perf_counter() - start_time < 0.1
+
+    stats = bus.stats["server1"]
+    assert stats.published == 6
+    assert stats.dropped == 2
+    assert stats.depth == 3
+
+    release.set()
+    await bus.join()
+    assert sorted(delivered, key=lambda item: item[0]) == [
+        ("server1", [ChatEvent(player="Notch", message="0")]),
+        (
+            "server1",
+            [ChatEvent(player="Notch", message=str(i)) for i in range(2, 5)],
+        ),
+        ("server2", [ChatEvent(player="Dream", message="hi")]),
+    ]
+    assert stats.delivered == 4
+    assert stats.depth == 0
+    assert stats.max_latency > 0
+    await bus.close()
+
+
+@pytest.mark.asyncio
+async def test_log_event_bus_order_and_drain():
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_event_bus import LogEventBus
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_events import (
+        ChatEvent,
+        PlayerJoinEvent,
+        PlayerLeaveEvent,
+    )
+
+    bus = LogEventBus(drain_seconds=1)
+    delivered = list[tuple[str, list[str]]]()
+    release = asyncio.Event()
+
+    @bus.subscribe(ChatEvent)
+    async def chat_handler(server_name: str, events: list[ChatEvent]):
+        await release.wait()
+        delivered.append(("chat", [event.message for event in events]))
+
+    @bus.subscribe(PlayerJoinEvent)
+    async def join_handler(server_name: str, events: list[PlayerJoinEvent]):
+        delivered.append(("join", [event.player for event in events]))
+
+    @bus.subscribe(PlayerLeaveEvent)
+    async def leave_handler(server_name: str, events: list[PlayerLeaveEvent]):
+        delivered.append(("leave", [event.player for event in events]))
+
+    await bus.publish("server1", [ChatEvent(player="Notch", message="0")])
+    await asyncio.sleep(0)
+    # these queue up behind the slow handler and are taken as one batch
+    await bus.publish(
+        "server1",
+        [
+            PlayerJoinEvent(player="Dream"),
+            ChatEvent(player="Dream", message="1"),
+            ChatEvent(player="Dream", message="2"),
+            PlayerLeaveEvent(player="Dream"),
+            PlayerJoinEvent(player="Dream"),
+        ],
+    )
+    # closing waits for the queued events
+    asyncio.get_running_loop().call_later(0.01, release.set)
+    await bus.close()
+    assert delivered == [
+        ("chat", ["0"]),
+        ("join", ["Dream"]),
+        ("chat", ["1", "2"]),
+        ("leave", ["Dream"]),
+        ("join", ["Dream"]),
+    ]
+
+    # but not forever
+    release.clear()
+    await bus.publish("server1", [ChatEvent(player="Notch", message="3")])
+    start_time = time.perf_counter()
+    await bus.close()
+    assert time.perf_counter() - start_time < 2
+    assert len(delivered) == 5
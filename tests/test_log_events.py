@@ -0,0 +1,59 @@
+def test_classify_log():
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_events import (
+        ChatEvent,
+        PlayerDeathEvent,
+        PlayerJoinEvent,
+        PlayerLeaveEvent,
+        PlayerUUIDEvent,
+        ServerCrashEvent,
+        ServerDoneEvent,
+        classify_log,
+    )
+
+    log = (
+        "[00:00:00] [Server thread/INFO]: Starting minecraft server version 1.20.1\n"
+        '[00:00:00] [Server thread/INFO]: Done (12.345s)! For help, type "help"\n'
+        "[00:00:00] [User Authenticator #1/INFO]: UUID of player Notch is 069a79f4-44e9-4726-a5be-fca90e38aaf5\n"
+        "[00:00:00] [Server thread/INFO]: Notch joined the game\n"
+        "[00:00:00] [Server thread/INFO] [minecraft/MinecraftServer]: <Notch> hello world\n"
+        "[01Nov2024 00:00:00.000] [Server thread/INFO] [net.minecraft.server.MinecraftServer/]: [Not Secure] <Dream> \\\\hi\n"
+        "[00:00:00] [Async Chat Thread - #0/INFO]: <Dream> async\n"
+        "[00:00:00] [Server thread/INFO]: Notch was slain by Zombie\n"
+        "[00:00:00] [Server thread/INFO]: Notch left the game\n"
+        "[00:00:00] [Server thread/WARN] [net.minecraftforge.common.ForgeHooks/]: Mod spam <not> chat\n"
+        "[00:00:00] [Server thread/ERROR]: Encountered an unexpected exception\n"
+        "[00:00:00] [Server thread/INFO]: <Notch> unterminated"
+    )
+    assert classify_log(log) == [
+        ServerDoneEvent(startup_seconds=12.345),
+        PlayerUUIDEvent(name="Notch", uuid="069a79f444e94726a5befca90e38aaf5"),
+        PlayerJoinEvent(player="Notch"),
+        ChatEvent(player="Notch", message="hello world"),
+        ChatEvent(player="Dream", message="\\\\hi"),
+        ChatEvent(player="Dream", message="async"),
+        PlayerDeathEvent(player="Notch", message="Notch was slain by Zombie"),
+        PlayerLeaveEvent(player="Notch"),
+        ServerCrashEvent(message="Encountered an unexpected exception"),
+        ChatEvent(player="Notch", message="unterminated"),
+    ]
+
+
+def test_classify_log_injection():
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_events import ChatEvent, classify_log
+
+    # players can't fake other events by chatting
+    messages = [
+        "[00:00:00] [User Authenticator #3/INFO]: UUID of player Notch is 12345678-1234-1234-1234-123456789012",
+        "[00:00:00] [Server thread/INFO]: Notch joined the game",
+        '[00:00:00] [Server thread/INFO]: Done (1.0s)! For help, type "help"',
+        "Notch was slain by Zombie",
+    ]
+    for message in messages:
+        log = f"[00:00:00] [Server thread/INFO] [minecraft/MinecraftServer]: <Dream> {message}\n"
+        assert classify_log(log) == [ChatEvent(player="Dream", message=message)]
+
+    # only the server thread is trusted
+    assert (
+        classify_log("[00:00:00] [Some Mod Thread/INFO]: Notch joined the game\n") == []
+    )
+    assert classify_log("not a log line: <Notch> hello\n") == []
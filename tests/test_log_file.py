@@ -0,0 +1,111 @@
+import gzip
+from pathlib import Path
+
+import pytest
+
+
+def test_detect_log_file_change(tmp_path: Path):
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_file import (
+        LogFileChange,
+        detect_log_file_change,
+        get_log_file_identity,
+    )
+
+    log_path = tmp_path / "latest.log"
+    log_path.write_text("line1\nline2\n")
+    identity = get_log_file_identity(log_path)
+    assert identity is not None
+
+    assert detect_log_file_change(identity, 12, log_path) == LogFileChange.UNCHANGED
+    with log_path.open("a") as f:
+        f.write("line3\n")
+    assert detect_log_file_change(identity, 12, log_path) == LogFileChange.UNCHANGED
+
+    # stale pointer past the end of the file
+    log_path.write_text("line\n")
+    assert detect_log_file_change(identity, 12, log_path) == LogFileChange.TRUNCATED
+
+    # same size but different content
+    log_path.write_text("LINE1\nLINE2\nline3\n")
+    assert detect_log_file_change(identity, 12, log_path) == LogFileChange.TRUNCATED
+
+    log_path.write_text("line1\nline2\n")
+    log_path.rename(tmp_path / "2024-11-01-1.log")
+    log_path.write_text("new\n")
+    assert detect_log_file_change(identity, 12, log_path) == LogFileChange.ROTATED
+
+    # in the middle of rotation
+    log_path.unlink()
+    assert detect_log_file_change(identity, 12, log_path) == LogFileChange.UNCHANGED
+
+
+@pytest.mark.asyncio
+async def test_catch_up_from_rotated_log(tmp_path: Path):
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_file import (
+        find_rotated_log_file,
+        get_log_file_identity,
+        read_rotated_log,
+    )
+
+    log_path = tmp_path / "latest.log"
+    old_content = "".join(
+        f"[00:00:00] [Server thread/INFO]: line {i}\n" for i in range(1000)
+    )
+    log_path.write_text(old_content[:5000])
+    identity = get_log_file_identity(log_path)
+    assert identity is not None
+    pointer = old_content.rindex("\n", 0, 5000) + 1
+
+    # not yet compressed
+    rotated_path = tmp_path / "2024-11-01-1.log"
+    log_path.rename(rotated_path)
+    log_path.write_text("new\n")
+    assert find_rotated_log_file(log_path, identity) == rotated_path
+
+    # compressed, with some unrelated archives around
+    with gzip.open(tmp_path / "2024-10-31-1.log.gz", "wt") as f:
+        f.write("something else\n" * 100)
+    archive_path = tmp_path / "2024-11-01-1.log.gz"
+    with gzip.open(archive_path, "wt") as f:
+        f.write(old_content)
+    rotated_path.unlink()
+    assert find_rotated_log_file(log_path, identity) == archive_path
+
+    chunks = [
+        chunk
+        async for chunk in read_rotated_log(archive_path, pointer, chunk_size=1000)
+    ]
+    assert len(chunks) > 1
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert "".join(chunks) == old_content[pointer:]
+
+
+@pytest.mark.asyncio
+async def test_read_log_lines(tmp_path: Path):
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_file import read_log_lines
+
+    log_path = tmp_path / "latest.log"
+    lines = [f"[00:00:00] [Server thread/INFO]: 第 {i} 行\n" for i in range(1000)]
+    log_path.write_text("".join(lines) + "partial", encoding="utf-8")
+    size = log_path.stat().st_size
+
+    chunks = [chunk async for chunk in read_log_lines(log_path, 0, chunk_size=1000)]
+    assert len(chunks) > 1
+    assert all(len(content.encode()) <= 1000 for content, _ in chunks)
+    assert all(content.endswith("\n") for content, _ in chunks)
+    assert "".join(content for content, _ in chunks) == "".join(lines)
+    # the unfinished line is read again next time
+    pointer = chunks[-1][1]
+    assert pointer == size - len("partial")
+
+    with log_path.open("a", encoding="utf-8") as f:
+        f.write(" line\n")
+    assert [chunk async for chunk in read_log_lines(log_path, pointer)] == [
+        ("partial line\n", size + len(" line\n"))
+    ]
+
+    # a single line longer than a chunk is split on a character boundary
+    log_path.write_text("长" * 1000 + "\n", encoding="utf-8")
+    chunks = [chunk async for chunk in read_log_lines(log_path, 0, chunk_size=1000)]
+    assert len(chunks) > 1
+    assert "".join(content for content, _ in chunks) == "长" * 1000 + "\n"
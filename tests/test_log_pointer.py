@@ -0,0 +1,164 @@
+import time
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_log_pointer_store():
+    from nonebot_plugin_orm import init_orm
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.db.crud.log_pointer import (
+        get_all_log_pointers,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_file import LogFileIdentity
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_pointer import (
+        LogPointerStore,
+        LogPosition,
+    )
+
+    await init_orm()
+
+    identity = LogFileIdentity(inode=1, head_size=3, head_digest="abc")
+    store = LogPointerStore(flush_seconds=60)
+    store.set("pointer1", LogPosition(pointer=100, identity=identity))
+    store.set("pointer2", LogPosition(pointer=200))
+    await store.flush()
+
+    saved = {
+        log_pointer.server_name: log_pointer
+        for log_pointer in await get_all_log_pointers()
+    }
+    assert saved["pointer1"].pointer == 100
+    assert saved["pointer1"].file_inode == 1
+    assert saved["pointer2"].file_inode is None
+
+    # a new process only sees what has been saved
+    store = LogPointerStore(flush_seconds=60)
+    saved_position = await store.get_saved("pointer1")
+    assert saved_position is not None
+    assert saved_position.pointer == 100
+    assert saved_position.identity == identity
+
+    await store.evict(["pointer1"])
+    server_names = {
+        log_pointer.server_name for log_pointer in await get_all_log_pointers()
+    }
+    assert "pointer1" in server_names
+    assert "pointer2" not in server_names
+    await store.evict([])
+
+
+def test_choose_start_pointer(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_file import get_log_file_identity
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_pointer import (
+        LogPosition,
+        choose_start_pointer,
+    )
+
+    monkeypatch.setattr(config, "mc_log_replay_max_bytes", 1000)
+    monkeypatch.setattr(config, "mc_log_replay_max_seconds", 3600)
+
+    log_path = tmp_path / "latest.log"
+    line = "a" * 99 + "\n"
+    log_path.write_text(line)
+    identity = get_log_file_identity(log_path)
+    # 30 lines of 100 bytes each
+    log_path.write_text(line * 30)
+
+    # nothing saved
+    assert choose_start_pointer(None, log_path, 3000) == 3000
+    # replay what was missed
+    assert (
+        choose_start_pointer(
+            LogPosition(pointer=2500, identity=identity), log_path, 3000
+        )
+        == 2500
+    )
+    # but no more than the byte budget, which happens to start a line
+    assert (
+        choose_start_pointer(
+            LogPosition(pointer=100, identity=identity), log_path, 3000
+        )
+        == 2000
+    )
+    # a budget ending in the middle of a line starts at the next line
+    monkeypatch.setattr(config, "mc_log_replay_max_bytes", 1050)
+    assert (
+        choose_start_pointer(
+            LogPosition(pointer=100, identity=identity), log_path, 3000
+        )
+        == 2000
+    )
+    # no complete line within the budget
+    log_path.write_text(line + "a" * 2900)
+    assert (
+        choose_start_pointer(
+            LogPosition(pointer=100, identity=identity), log_path, 3000
+        )
+        == 3000
+    )
+    # and not after a long downtime
+    assert (
+        choose_start_pointer(
+            LogPosition(pointer=2500, identity=identity, updated_at=time.time() - 7200),
+            log_path,
+            3000,
+        )
+        == 3000
+    )
+    # nor when the log file has changed
+    log_path.unlink()
+    log_path.write_text("b" * 3000)
+    assert (
+        choose_start_pointer(
+            LogPosition(pointer=2500, identity=identity), log_path, 3000
+        )
+        == 3000
+    )
+
+
+@pytest.mark.asyncio
+async def test_log_pointer_refresh(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    from nonebot_plugin_orm import init_orm
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_file import get_log_file_identity
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_pointer import (
+        LogPointerStore,
+        LogPosition,
+        choose_start_pointer,
+    )
+
+    await init_orm()
+    monkeypatch.setattr(config, "mc_log_replay_max_seconds", 3600)
+
+    log_path = tmp_path / "latest.log"
+    line = "a" * 99 + "\n"
+    log_path.write_text(line)
+    clock = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    store = LogPointerStore(flush_seconds=60)
+    store.set(
+        "idle1",
+        LogPosition(
+            pointer=100, identity=get_log_file_identity(log_path), updated_at=clock[0]
+        ),
+    )
+    await store.flush()
+
+    # the server writes nothing for most of the replay window
+    clock[0] += 2700
+    store.refresh(["idle1", "unknown1"])
+    assert store.get("unknown1") is None
+    await store.flush()
+
+    # then the bot restarts a while later, and the server has written a line
+    clock[0] += 1800
+    log_path.write_text(line * 2)
+    store = LogPointerStore(flush_seconds=60)
+    saved_position = await store.get_saved("idle1")
+    assert saved_position is not None
+    assert choose_start_pointer(saved_position, log_path, 200) == 100
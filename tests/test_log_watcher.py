@@ -0,0 +1,82 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_log_watcher(tmp_path: Path):
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_watcher import LogWatcher
+
+    log_path = tmp_path / "server1" / "data" / "logs" / "latest.log"
+    log_path.parent.mkdir(parents=True)
+    log_path.write_text("")
+
+    changed_servers = asyncio.Queue[str]()
+
+    async def get_log_paths():
+        return {"server1": log_path}
+
+    async def on_log_changed(server_name: str):
+        await changed_servers.put(server_name)
+
+    watcher = LogWatcher(
+        get_log_paths=get_log_paths,
+        on_log_changed=on_log_changed,
+        rescan_seconds=60,
+    )
+    watcher_task = asyncio.create_task(watcher.run())
+    try:
+        # the first scan checks every server once to initialize the pointer
+        assert await asyncio.wait_for(changed_servers.get(), 1) == "server1"
+        # give inotify some time to set up
+        await asyncio.sleep(0.5)
+
+        with log_path.open("a") as f:
+            f.write("[00:00:00] [Server thread/INFO]: <Notch> hello\n")
+        assert await asyncio.wait_for(changed_servers.get(), 1) == "server1"
+
+        # other files in the log directory are ignored
+        (log_path.parent / "debug.log").write_text("debug")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(changed_servers.get(), 0.5)
+    finally:
+        watcher_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_log_watcher_directory_created_later(tmp_path: Path):
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_watcher import LogWatcher
+
+    log_path = tmp_path / "server1" / "data" / "logs" / "latest.log"
+    changed_servers = asyncio.Queue[str]()
+
+    async def get_log_paths():
+        return {"server1": log_path}
+
+    async def on_log_changed(server_name: str):
+        await changed_servers.put(server_name)
+
+    watcher = LogWatcher(
+        get_log_paths=get_log_paths,
+        on_log_changed=on_log_changed,
+        rescan_seconds=0.2,
+    )
+    watcher_task = asyncio.create_task(watcher.run())
+    try:
+        assert await asyncio.wait_for(changed_servers.get(), 1) == "server1"
+
+        # the server creates its log directory on first start
+        log_path.parent.mkdir(parents=True)
+        log_path.write_text("")
+        # the next rescan starts watching it, and later rescans are out of the way
+        watcher._rescan_seconds = 60
+        await asyncio.sleep(1)
+        while not changed_servers.empty():
+            changed_servers.get_nowait()
+
+        with log_path.open("a") as f:
+            f.write("[00:00:00] [Server thread/INFO]: <Notch> hello\n")
+        assert await asyncio.wait_for(changed_servers.get(), 1) == "server1"
+    finally:
+        watcher_task.cancel()
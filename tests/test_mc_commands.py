@@ -149,3 +149,30 @@ async def test_whitelist_commands(app: App):
             respond_in_forward_message=True,
         ),
     )
+
+
+@pytest.mark.asyncio
+async def test_paginate():
+    from mc_qqbot_next.plugins.mc_qqbot_next.bot import paginate
+
+    async def chunks(*chunks: str):
+        for chunk in chunks:
+            yield chunk
+
+    # long outputs are split between names even when a name spans two packets
+    pages = [
+        page
+        async for page in paginate(
+            chunks("Players: alice, bob, ch", "arlie, dave, eve"), page_size=20
+        )
+    ]
+    assert pages == ["Players: alice,", "bob, charlie, dave,", "eve"]
+
+    pages = [page async for page in paginate(chunks("a\nb" * 10), page_size=8)]
+    assert pages == ["a\nba\nba", "ba\nba", "ba\nba", "ba\nba", "ba\nb"]
+
+    assert [page async for page in paginate(chunks("x" * 25), page_size=10)] == [
+        "x" * 10,
+        "x" * 10,
+        "x" * 5,
+    ]
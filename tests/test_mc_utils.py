@@ -23,6 +23,21 @@ def test_uuid_name_mapping():
     ]
 
 
+def test_parse_list_players_response():
+    from mc_qqbot_next.plugins.mc_qqbot_next.mc import parse_list_players_response
+
+    assert parse_list_players_response(
+        "There are 2 of a max of 20 players online: Notch, Dream"
+    ) == ["Notch", "Dream"]
+    assert (
+        parse_list_players_response("There are 0 of a max of 20 players online: ") == []
+    )
+    # before 1.13 the names are on the next line
+    assert parse_list_players_response("There are 1/20 players online:\nNotch") == [
+        "Notch"
+    ]
+
+
 @pytest.mark.asyncio
 async def test_find_uuid_by_name():
     from mc_qqbot_next.plugins.mc_qqbot_next.mc import find_uuid_by_name
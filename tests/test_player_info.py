@@ -0,0 +1,114 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_player_info_writer_cache():
+    from unittest.mock import AsyncMock, patch
+
+    from nonebot_plugin_orm import init_orm
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.db.crud.binding import (
+        delete_mc_player_info,
+        upsert_mc_player_infos,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.player_info import PlayerInfoWriter
+
+    await init_orm()
+    await upsert_mc_player_infos({"069a79f444e94726a5befca90e38aaf5": "Notch"})
+
+    writer = PlayerInfoWriter(flush_seconds=60, cache_size=2)
+    await writer.warm_up()
+
+    with patch(
+        "mc_qqbot_next.plugins.mc_qqbot_next.player_info.upsert_mc_player_infos",
+        new=AsyncMock(side_effect=upsert_mc_player_infos),
+    ) as mock_upsert:
+        # reconnecting with the same name doesn't touch the database
+        for _ in range(100):
+            writer.add("069a79f444e94726a5befca90e38aaf5", "Notch")
+        await writer.flush()
+        mock_upsert.assert_not_awaited()
+
+        # new players and name changes are written together
+        writer.add("069a79f444e94726a5befca90e38aaf5", "Notch2")
+        writer.add("ec70bcaf702f4bb8b48d276fa52a780c", "Dream")
+        await writer.flush()
+        mock_upsert.assert_awaited_once_with(
+            {
+                "069a79f444e94726a5befca90e38aaf5": "Notch2",
+                "ec70bcaf702f4bb8b48d276fa52a780c": "Dream",
+            }
+        )
+
+        # the least recently seen player is evicted
+        mock_upsert.reset_mock()
+        writer.add("ec70bcaf702f4bb8b48d276fa52a780c", "Dream")
+        writer.add("853c80ef3c3749fdaa49938b674adae6", "jeb_")
+        await writer.flush()
+        writer.add("069a79f444e94726a5befca90e38aaf5", "Notch2")
+        writer.add("ec70bcaf702f4bb8b48d276fa52a780c", "Dream")
+        await writer.flush()
+        assert mock_upsert.await_args_list[-1].args == (
+            {"069a79f444e94726a5befca90e38aaf5": "Notch2"},
+        )
+        assert writer.cache_hits == 102
+
+    await delete_mc_player_info("069a79f444e94726a5befca90e38aaf5")
+    await delete_mc_player_info("ec70bcaf702f4bb8b48d276fa52a780c")
+    await delete_mc_player_info("853c80ef3c3749fdaa49938b674adae6")
+
+
+@pytest.mark.asyncio
+async def test_player_info_writer_follows_crud_writes():
+    from nonebot_plugin_orm import init_orm
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.db.crud.binding import (
+        create_or_update_mc_player_info,
+        delete_mc_player_info,
+        get_uuid_by_player_name,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.player_info import player_info_writer
+
+    await init_orm()
+
+    player_info_writer.add("069a79f444e94726a5befca90e38aaf5", "Notch")
+    await player_info_writer.flush()
+
+    # the row is written again after it was deleted behind the writer
+    await delete_mc_player_info("069a79f444e94726a5befca90e38aaf5")
+    player_info_writer.add("069a79f444e94726a5befca90e38aaf5", "Notch")
+    await player_info_writer.flush()
+    assert await get_uuid_by_player_name("Notch") == "069a79f444e94726a5befca90e38aaf5"
+
+    # players written by other paths are cached as well
+    await create_or_update_mc_player_info("ec70bcaf702f4bb8b48d276fa52a780c", "Dream")
+    cache_hits = player_info_writer.cache_hits
+    player_info_writer.add("ec70bcaf702f4bb8b48d276fa52a780c", "Dream")
+    assert player_info_writer.cache_hits == cache_hits + 1
+
+    await delete_mc_player_info("069a79f444e94726a5befca90e38aaf5")
+    await delete_mc_player_info("ec70bcaf702f4bb8b48d276fa52a780c")
+
+
+@pytest.mark.asyncio
+async def test_player_info_writer_retry():
+    import asyncio
+    from unittest.mock import AsyncMock, patch
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.player_info import PlayerInfoWriter
+
+    writer = PlayerInfoWriter(flush_seconds=0.01, cache_size=10)
+    with patch(
+        "mc_qqbot_next.plugins.mc_qqbot_next.player_info.upsert_mc_player_infos",
+        new=AsyncMock(side_effect=[RuntimeError("database is locked"), 1]),
+    ) as mock_upsert:
+        writer.add("069a79f444e94726a5befca90e38aaf5", "Notch")
+        # the failed write is retried without waiting for another player
+        await asyncio.sleep(0.2)
+        assert mock_upsert.await_count == 2
+        assert mock_upsert.await_args_list[-1].args == (
+            {"069a79f444e94726a5befca90e38aaf5": "Notch"},
+        )
+
+        writer.add("069a79f444e94726a5befca90e38aaf5", "Notch")
+        assert writer.cache_hits == 1
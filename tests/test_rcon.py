@@ -0,0 +1,202 @@
+import asyncio
+import struct
+from unittest.mock import patch
+
+import pytest
+
+from .docker_mc_mocks import (
+    MockDockerMCManager,
+    MockMCInstance,
+    MockMCServerInfo,
+    mock_common_docker_mc_manager,
+)
+
+RCON_MAX_PAYLOAD = 4096
+
+
+def encode_raw_packet(request_id: int, packet_type: int, body: bytes) -> bytes:
+    payload = struct.pack("<ii", request_id, packet_type) + body + b"\0\0"
+    return struct.pack("<i", len(payload)) + payload
+
+
+class FakeRCONServer:
+    """
+    A minimal Minecraft RCON server that echoes commands back
+
+    Like vanilla, it splits outputs longer than 4096 bytes into several packets
+    and answers packets of unknown type with "Unknown request".
+    """
+
+    def __init__(self, password: str):
+        self.password = password
+        self.connections = 0
+        self.commands = list[str]()
+        self.outputs = dict[str, str]()
+        self._writers = list[asyncio.StreamWriter]()
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self):
+        assert self._server is not None
+        self._server.close()
+        self.drop_connections()
+        await self._server.wait_closed()
+        # let the connection handlers see the closed connections
+        await asyncio.sleep(0.01)
+
+    def drop_connections(self):
+        """
+        Simulate a server restart
+        """
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        from mc_qqbot_next.plugins.mc_qqbot_next.rcon import (
+            RCON_PACKET_TYPE_AUTH,
+            RCON_PACKET_TYPE_COMMAND,
+            RCON_PACKET_TYPE_RESPONSE,
+            encode_packet,
+            read_packet,
+        )
+
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                request_id, packet_type, body = await read_packet(reader)
+                if packet_type == RCON_PACKET_TYPE_AUTH:
+                    if body.decode() != self.password:
+                        request_id = -1
+                    writer.write(
+                        encode_packet(request_id, RCON_PACKET_TYPE_COMMAND, "")
+                    )
+                elif packet_type == RCON_PACKET_TYPE_COMMAND:
+                    command = body.decode()
+                    self.commands.append(command)
+                    output = self.outputs.get(command, f"echo: {command}").encode()
+                    for start in range(0, len(output), RCON_MAX_PAYLOAD):
+                        writer.write(
+                            encode_raw_packet(
+                                request_id,
+                                RCON_PACKET_TYPE_RESPONSE,
+                                output[start : start + RCON_MAX_PAYLOAD],
+                            )
+                        )
+                else:
+                    writer.write(
+                        encode_packet(
+                            request_id,
+                            RCON_PACKET_TYPE_RESPONSE,
+                            f"Unknown request {packet_type:x}",
+                        )
+                    )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+@pytest.mark.asyncio
+async def test_rcon_pool():
+    from mc_qqbot_next.plugins.mc_qqbot_next.rcon import RCONAuthError, RCONPool
+
+    server = FakeRCONServer(password="secret")
+    await server.start()
+    pool = RCONPool("127.0.0.1", server.port, "secret", size=2, timeout_seconds=5)
+    try:
+        assert await pool.send_command("list") == "echo: list"
+        assert await pool.send_commands(["say 1", "say 2", "say 3"]) == [
+            "echo: say 1",
+            "echo: say 2",
+            "echo: say 3",
+        ]
+        assert server.connections == 1
+
+        # concurrent commands share at most two connections
+        results = await asyncio.gather(
+            *[pool.send_command(f"say {i}") for i in range(10)]
+        )
+        assert results == [f"echo: say {i}" for i in range(10)]
+        assert server.connections == 2
+
+        # reconnect after the server restarts
+        server.drop_connections()
+        await asyncio.sleep(0.01)
+        assert await pool.send_command("list") == "echo: list"
+        assert server.connections == 3
+
+        wrong_password_pool = RCONPool(
+            "127.0.0.1", server.port, "wrong", size=1, timeout_seconds=5
+        )
+        with pytest.raises(RCONAuthError):
+            await wrong_password_pool.send_command("list")
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_rcon_multi_packet_response():
+    from mc_qqbot_next.plugins.mc_qqbot_next.rcon import RCONPool
+
+    server = FakeRCONServer(password="secret")
+    await server.start()
+    pool = RCONPool("127.0.0.1", server.port, "secret", size=1, timeout_seconds=5)
+    # an odd prefix makes the packets split inside multi-byte characters
+    whitelist = "There are 1000 whitelisted players: " + ", ".join(
+        f"玩家{i}" for i in range(1000)
+    )
+    server.outputs["whitelist list"] = "x" + whitelist
+    try:
+        assert await pool.send_commands(["whitelist list", "list"]) == [
+            "x" + whitelist,
+            "echo: list",
+        ]
+
+        chunks = [chunk async for chunk in pool.stream_command("whitelist list")]
+        assert len(chunks) > 1
+        assert "".join(chunks) == "x" + whitelist
+
+        server.outputs["save-all"] = ""
+        assert [chunk async for chunk in pool.stream_command("save-all")] == []
+        assert await pool.send_command("list") == "echo: list"
+        assert server.connections == 1
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_list_players_through_rcon_pool():
+    from mc_qqbot_next.plugins.mc_qqbot_next import docker
+    from mc_qqbot_next.plugins.mc_qqbot_next.rcon import RCONPoolManager
+
+    server = FakeRCONServer(password="secret")
+    await server.start()
+    server.outputs["list"] = "There are 2 of a max of 20 players online: Notch, Dream"
+    instance = MockMCInstance(
+        name="server1",
+        get_server_info_response=MockMCServerInfo(rcon_port=server.port),
+    )
+    rcon_pools = RCONPoolManager("127.0.0.1", "secret", pool_size=1, timeout_seconds=5)
+    try:
+        with (
+            mock_common_docker_mc_manager(MockDockerMCManager(instances=[instance])),
+            patch.object(docker, "rcon_pools", rcon_pools),
+        ):
+            assert await docker.list_players("server1") == ["Notch", "Dream"]
+        # the listing goes through the pooled connection, not docker exec
+        assert server.commands == ["list"]
+        instance.send_command_rcon.assert_not_called()
+        instance.list_players.assert_not_called()
+    finally:
+        await rcon_pools.close()
+        await server.stop()
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from .docker_mc_mocks import (
+    MockDockerMCManager,
+    MockMCInstance,
+    mock_common_docker_mc_manager,
+)
+
+
+@pytest.mark.asyncio
+async def test_rcon_scheduler_priority():
+    from mc_qqbot_next.plugins.mc_qqbot_next.rcon_scheduler import (
+        RCONPriority,
+        RCONScheduler,
+        rcon_priority,
+    )
+
+    scheduler = RCONScheduler(max_concurrency=2)
+    release = asyncio.Event()
+    order = list[str]()
+
+    async def command(name: str):
+        order.append(name)
+        await release.wait()
+        return name
+
+    async def submit(name: str, priority: RCONPriority):
+        with rcon_priority(priority):
+            return await scheduler.submit("server1", lambda: command(name))
+
+    tasks = [
+        asyncio.create_task(submit(name, priority))
+        for name, priority in [
+            ("poll1", RCONPriority.BACKGROUND),
+            ("poll2", RCONPriority.BACKGROUND),
+            ("poll3", RCONPriority.BACKGROUND),
+            ("say", RCONPriority.INTERACTIVE),
+        ]
+    ]
+    await asyncio.sleep(0.01)
+    # the concurrency cap holds the others back
+    assert order == ["poll1", "poll2"]
+    assert scheduler.get("server1").running == 2
+    assert scheduler.get("server1").waiting == 2
+
+    # another server has its own slots
+    assert await scheduler.submit("server2", lambda: asyncio.sleep(0, "ok")) == "ok"
+
+    # a cancelled waiter gives up its place
+    tasks[2].cancel()
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert order == ["poll1", "poll2", "say"]
+    assert isinstance(results[2], asyncio.CancelledError)
+    assert scheduler.get("server1").running == 0
+
+
+@pytest.mark.asyncio
+async def test_rcon_scheduler_coalesce():
+    from mc_qqbot_next.plugins.mc_qqbot_next.rcon_scheduler import (
+        RCONPriority,
+        RCONScheduler,
+        rcon_priority,
+    )
+
+    scheduler = RCONScheduler(max_concurrency=1)
+    release = asyncio.Event()
+    calls = list[str]()
+
+    async def command(name: str):
+        calls.append(name)
+        await release.wait()
+        return name
+
+    blocker = asyncio.create_task(scheduler.submit("server1", lambda: command("ban")))
+    with rcon_priority(RCONPriority.BACKGROUND):
+        queued_say = asyncio.create_task(
+            scheduler.submit("server1", lambda: command("poll_say"))
+        )
+        await asyncio.sleep(0)
+        polls = [
+            asyncio.create_task(
+                scheduler.submit("server1", lambda: command("list"), "list")
+            )
+            for _ in range(3)
+        ]
+    await asyncio.sleep(0)
+    # an interactive caller joining the queued list moves it ahead
+    interactive = asyncio.create_task(
+        scheduler.submit("server1", lambda: command("list"), "list")
+    )
+    await asyncio.sleep(0.01)
+    release.set()
+    assert await asyncio.gather(*polls, interactive) == ["list"] * 4
+    await asyncio.gather(blocker, queued_say)
+    assert calls == ["ban", "list", "poll_say"]
+
+    # the shared command is cancelled once nobody is waiting for it
+    release.clear()
+    waiters = [
+        asyncio.create_task(
+            scheduler.submit("server1", lambda: command("list"), "list")
+        )
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    waiters[0].cancel()
+    await asyncio.sleep(0.01)
+    assert scheduler.get("server1").running == 1
+    waiters[1].cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0.01)
+    assert scheduler.get("server1").running == 0
+
+
+@pytest.mark.asyncio
+async def test_docker_rcon_scheduler():
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import (
+        list_players,
+        send_rcon_command,
+    )
+
+    server = MockMCInstance(
+        name="server1",
+        list_players_response=["Notch"],
+        send_command_response="Banned Notch",
+    )
+    release = asyncio.Event()
+
+    async def slow_list_players():
+        await release.wait()
+        return ["Notch"]
+
+    server.list_players.side_effect = slow_list_players
+    mock_docker_mc_manager = MockDockerMCManager(instances=[server])
+    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+        listing = asyncio.gather(*[list_players("server1") for _ in range(3)])
+        await asyncio.sleep(0.01)
+        # interactive commands aren't stuck behind the listing
+        assert await send_rcon_command("server1", "ban Notch") == (
+            "[server1] Banned Notch"
+        )
+        release.set()
+        assert await listing == [["Notch"]] * 3
+        # concurrent listings of the same server are sent once
+        server.list_players.assert_awaited_once()
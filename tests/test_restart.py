@@ -1,3 +1,6 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
 import nonebot
 import pytest
 from nonebot.adapters.onebot.v11 import Adapter as Onebot11Adapter
@@ -17,6 +20,7 @@ from .onebot_message_factory import create_group_message_event
 async def test_restart(app: App):
     from mc_qqbot_next.plugins.mc_qqbot_next.commands.mc.restart import restart
     from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.restart_jobs import restart_job_manager
 
     await basic_permission_check(app, restart)
 
@@ -24,8 +28,12 @@ async def test_restart(app: App):
     mock_docker_mc_manager = MockDockerMCManager(
         instances=[instance],
     )
+    report = AsyncMock()
 
-    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+    with (
+        mock_common_docker_mc_manager(mock_docker_mc_manager),
+        patch.object(restart_job_manager, "report", report),
+    ):
         # Test that restart without explicit server fails
         event = create_group_message_event(
             "/restart",
@@ -55,10 +63,12 @@ async def test_restart(app: App):
             ctx.should_pass_permission(restart)
             ctx.should_pass_rule(restart)
             ctx.should_call_send(event, "[server1] 正在重启", result=None)
-            ctx.should_call_send(event, "[server1] 重启完成", result=None)
             ctx.should_finished(restart)
+        await restart_job_manager.get_job("server1").task
         instance.restart.assert_awaited_once()
+        report.assert_awaited_once_with("[server1] 重启完成，用时3秒")
         instance.restart.reset_mock()
+        report.reset_mock()
 
         # Test timeout scenario with explicit server
         event = create_group_message_event(
@@ -73,9 +83,165 @@ async def test_restart(app: App):
             ctx.should_pass_permission(restart)
             ctx.should_pass_rule(restart)
             ctx.should_call_send(event, "[server1] 正在重启", result=None)
-            ctx.should_call_send(
-                event, "[server1] 坏了，好像过了0分钟了还没重启好", result=None
-            )
             ctx.should_finished(restart)
-
+        await restart_job_manager.get_job("server1").task
         instance.restart.assert_awaited_once()
+        report.assert_awaited_once_with("[server1] 坏了，好像过了0分钟了还没重启好")
+
+
+@pytest.mark.asyncio
+async def test_restart_waiter():
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_event_bus import log_event_bus
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_events import (
+        ServerCrashEvent,
+        ServerDoneEvent,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.restart_waiter import (
+        RestartWaiter,
+        restart_waiter,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_registry import ContainerEvent
+
+    # the Done line in the log finishes the wait right away
+    with restart_waiter.watch("server1") as restart_watch:
+        await log_event_bus.publish("server1", [ServerDoneEvent(startup_seconds=12.3)])
+        result = await asyncio.wait_for(restart_watch.wait(60), 1)
+    assert result.ready
+    assert result.startup_seconds == 12.3
+
+    with restart_waiter.watch("server1") as restart_watch:
+        await log_event_bus.publish("server1", [ServerCrashEvent(message="boom")])
+        result = await asyncio.wait_for(restart_watch.wait(60), 1)
+    assert not result.ready
+    assert result.crash_message == "boom"
+
+    # so does the container becoming healthy
+    with restart_waiter.watch("server1") as restart_watch:
+        restart_waiter.handle_container_event(
+            ContainerEvent(action="health_status: healthy", server_name="server1")
+        )
+        result = await asyncio.wait_for(restart_watch.wait(60), 1)
+    assert result.ready
+    assert result.startup_seconds is None
+
+    # without events, the health is polled with exponential backoff
+    check_healthy = AsyncMock(side_effect=[False, False, False, True])
+    waiter = RestartWaiter(
+        check_healthy=check_healthy, initial_poll_seconds=0.01, max_poll_seconds=0.02
+    )
+    with waiter.watch("server1") as restart_watch:
+        result = await restart_watch.wait(1)
+    assert result.ready
+    assert check_healthy.await_count == 4
+    assert 0.07 <= result.elapsed_seconds < 0.5
+
+    check_healthy = AsyncMock(return_value=False)
+    waiter = RestartWaiter(
+        check_healthy=check_healthy, initial_poll_seconds=0.01, max_poll_seconds=1
+    )
+    with waiter.watch("server1") as restart_watch:
+        result = await restart_watch.wait(0.1)
+    assert not result.ready
+    assert check_healthy.await_count in (4, 5)
+
+    # a failing health check doesn't end the wait early
+    check_healthy = AsyncMock(side_effect=[asyncio.TimeoutError(), OSError(), True])
+    waiter = RestartWaiter(
+        check_healthy=check_healthy, initial_poll_seconds=0.01, max_poll_seconds=0.02
+    )
+    with waiter.watch("server1") as restart_watch:
+        result = await restart_watch.wait(1)
+    assert result.ready
+    assert check_healthy.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_restart_job_manager():
+    from mc_qqbot_next.plugins.mc_qqbot_next.restart_jobs import RestartJobManager
+    from mc_qqbot_next.plugins.mc_qqbot_next.restart_waiter import RestartWaiter
+
+    restart_server = AsyncMock()
+    report = AsyncMock()
+    waiter = RestartWaiter(
+        check_healthy=AsyncMock(return_value=False),
+        initial_poll_seconds=0.01,
+        max_poll_seconds=0.01,
+    )
+    manager = RestartJobManager(
+        restart=restart_server,
+        restart_waiter=waiter,
+        max_parallel=1,
+        get_wait_seconds=lambda: 60,
+        report=report,
+    )
+
+    job1, created = manager.submit("server1")
+    assert created and job1.status == "restarting"
+    job2, created = manager.submit("server2")
+    assert created and job2.status == "queued"
+    # a restart that is already in flight is not submitted again
+    assert manager.submit("server1") == (job1, False)
+
+    # only one server restarts at a time
+    await asyncio.sleep(0.05)
+    restart_server.assert_awaited_once_with("server1")
+    assert job1.status == "waiting"
+    assert job2.describe().startswith("[server2] 排队中")
+
+    waiter.notify_done("server1", 12.3)
+    await job1.task
+    assert job1.status == "done"
+    report.assert_awaited_once_with(
+        "[server1] 重启完成，用时0秒（服务器启动耗时12.3秒）"
+    )
+
+    await asyncio.sleep(0.05)
+    restart_server.assert_awaited_with("server2")
+    waiter.notify_crash("server2", "boom")
+    await job2.task
+    assert job2.status == "crashed"
+    report.assert_awaited_with("[server2] 启动时崩溃了：boom")
+
+    assert manager.get_jobs() == [job1, job2]
+    assert manager.get_job("server1") is job1
+    assert job1.describe().startswith("[server1] 重启完成，用时0秒（")
+
+    # finished servers can be restarted again
+    restart_server.side_effect = RuntimeError("no such container")
+    job3, created = manager.submit("server1")
+    assert created
+    await job3.task
+    assert job3.status == "failed"
+    report.assert_awaited_with("[server1] 重启失败：no such container")
+
+
+@pytest.mark.asyncio
+async def test_report_restart_progress():
+    from unittest.mock import MagicMock
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.restart_jobs import (
+        report_restart_progress,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.send_scheduler import (
+        SendPriority,
+        _send_priority,
+    )
+
+    priorities = list[SendPriority]()
+
+    async def send_group_msg(**kwargs):
+        priorities.append(_send_priority.get())
+
+    bot = MagicMock()
+    bot.send_group_msg = AsyncMock(side_effect=send_group_msg)
+    with patch(
+        "mc_qqbot_next.plugins.mc_qqbot_next.restart_jobs.get_onebot_bot",
+        return_value=bot,
+    ):
+        await report_restart_progress("[server1] 重启完成，用时3秒")
+    bot.send_group_msg.assert_awaited_once_with(
+        group_id=config.mc_group_id, message="[server1] 重启完成，用时3秒"
+    )
+    # restart reports queue behind command replies
+    assert priorities == [SendPriority.NOTIFICATION]
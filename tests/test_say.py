@@ -172,3 +172,25 @@ async def test_reply_say(app: App):
             )
 
     await delete_qq_uuid_mapping("123456")
+
+
+def test_build_tell_raw_commands():
+    import json
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import (
+        RCON_MAX_COMMAND_BYTES,
+        build_tell_raw_commands,
+    )
+
+    assert build_tell_raw_commands('line1\n"line2" \\o/', target="Notch") == [
+        r'tellraw Notch {"text": "line1\n\"line2\" \\o/", "color": "yellow"}'
+    ]
+
+    # long messages are split at the command length limit, then inside lines
+    lines = ["消息" * 100 for _ in range(10)] + ["x" * 3000]
+    commands = build_tell_raw_commands("\n".join(lines))
+    assert len(commands) > 1
+    assert all(len(command.encode()) <= RCON_MAX_COMMAND_BYTES for command in commands)
+    texts = [json.loads(command.split(" ", 2)[2])["text"] for command in commands]
+    assert "".join(texts).replace("\n", "") == "".join(lines)
+    assert texts[0].split("\n") == lines[:2]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_priority():
+    from mc_qqbot_next.plugins.mc_qqbot_next.send_scheduler import (
+        SendPriority,
+        TokenBucket,
+    )
+
+    bucket = TokenBucket(rate=20, capacity=2)
+    order = list[str]()
+
+    async def send(name: str, priority: SendPriority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(
+        send("burst1", SendPriority.RELAY),
+        send("burst2", SendPriority.RELAY),
+        send("relay", SendPriority.RELAY),
+        send("notification", SendPriority.NOTIFICATION),
+        send("reply", SendPriority.COMMAND_REPLY),
+    )
+    # 2 tokens at once, then 1 token every 50ms
+    assert 0.1 < time.perf_counter() - start_time < 0.5
+    assert order == ["burst1", "burst2", "reply", "notification", "relay"]
+
+
+@pytest.mark.asyncio
+async def test_send_scheduler_priority():
+    from unittest.mock import AsyncMock
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.send_scheduler import (
+        SendPriority,
+        SendScheduler,
+        send_priority,
+    )
+
+    scheduler = SendScheduler(
+        rate_per_minute=1200, burst=1, max_retries=0, retry_base_seconds=0.01
+    )
+    bot = AsyncMock()
+    order = list[str]()
+
+    async def send(name: str, priority: SendPriority):
+        with send_priority(priority):
+            await scheduler.before_calling_api(
+                bot, "send_group_msg", {"group_id": 123456, "message": name}
+            )
+        order.append(name)
+
+    # the first message takes the only token, the others wait by lane
+    await asyncio.gather(
+        send("burst", SendPriority.RELAY),
+        send("relay", SendPriority.RELAY),
+        send("restart report", SendPriority.NOTIFICATION),
+        send("reply", SendPriority.COMMAND_REPLY),
+    )
+    assert order == ["burst", "reply", "restart report", "relay"]
+
+
+@pytest.mark.asyncio
+async def test_send_retry():
+    from unittest.mock import AsyncMock
+
+    from nonebot.adapters.onebot.v11.exception import ActionFailed, NetworkError
+    from nonebot.exception import MockApiException
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.send_scheduler import SendScheduler
+
+    scheduler = SendScheduler(
+        rate_per_minute=600, burst=5, max_retries=2, retry_base_seconds=0.01
+    )
+    bot = AsyncMock()
+    data = {"group_id": 123456, "message": "hello"}
+
+    await scheduler.before_calling_api(bot, "send_group_msg", data)
+    await scheduler.after_called_api(
+        bot, None, "send_group_msg", data, {"message_id": 1}
+    )
+    assert scheduler.stats[123456].sent == 1
+
+    # timed out, succeeded on retry
+    bot.call_api.side_effect = [NetworkError("timeout"), {"message_id": 2}]
+    with pytest.raises(MockApiException) as exc_info:
+        await scheduler.after_called_api(
+            bot, NetworkError("timeout"), "send_group_msg", data, None
+        )
+    assert exc_info.value.result == {"message_id": 2}
+    assert scheduler.stats[123456].retried == 2
+    assert scheduler.stats[123456].sent == 2
+
+    # not worth retrying
+    bot.call_api.reset_mock()
+    await scheduler.after_called_api(
+        bot, ActionFailed(retcode=1404), "send_group_msg", data, None
+    )
+    bot.call_api.assert_not_awaited()
+    assert scheduler.stats[123456].failed == 1
+
+    # not a send api
+    await scheduler.after_called_api(
+        bot, NetworkError("timeout"), "get_group_list", {}, None
+    )
+    bot.call_api.assert_not_awaited()
@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+
+from .docker_mc_mocks import (
+    MockDockerMCManager,
+    MockMCInstance,
+    mock_common_docker_mc_manager,
+)
+
+
+def test_latency_histogram():
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_health import (
+        LATENCY_BUCKETS,
+        LatencyHistogram,
+    )
+
+    histogram = LatencyHistogram(window=100)
+    assert histogram.quantile(0.99) is None
+
+    for _ in range(98):
+        histogram.record(0.01)
+    histogram.record(0.5)
+    histogram.record(100)
+    assert 0.01 <= histogram.quantile(0.5) < 0.015
+    assert 0.5 <= histogram.quantile(0.99) < 0.75
+    assert histogram.quantile(1) == LATENCY_BUCKETS[-1]
+
+    # old samples lose weight once the window is full
+    for _ in range(200):
+        histogram.record(0.1)
+    assert histogram.count <= 100
+    assert 0.1 <= histogram.quantile(0.5) < 0.15
+
+
+@pytest.mark.asyncio
+async def test_server_health_tracker():
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_health import (
+        CircuitOpenError,
+        ServerHealthTracker,
+    )
+
+    probe_results = [RuntimeError("still down"), None]
+    probed = list[str]()
+
+    async def probe(server_name: str):
+        probed.append(server_name)
+        result = probe_results.pop(0)
+        if result is not None:
+            raise result
+
+    async def fail():
+        raise RuntimeError("down")
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def respond():
+        return "ok"
+
+    tracker = ServerHealthTracker(
+        probe=probe,
+        failure_threshold=3,
+        probe_interval_seconds=0.01,
+        timeout_multiplier=3,
+        min_timeout_seconds=0.05,
+        min_samples=5,
+    )
+    try:
+        # the timeout adapts to the observed latency once there are enough samples
+        assert tracker.timeout("fast", 5) == 5
+        for _ in range(5):
+            assert await tracker.call("fast", respond, 5) == "ok"
+        assert tracker.timeout("fast", 5) == 0.05
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(tracker.call("fast", hang, 5), 1)
+
+        # the circuit opens after repeated failures
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await tracker.call("broken", fail, 5)
+        assert not tracker.is_open("broken")
+        with pytest.raises(RuntimeError):
+            await tracker.call("broken", fail, 5)
+        assert tracker.is_open("broken")
+
+        # and short-circuits calls until a background probe succeeds
+        with pytest.raises(CircuitOpenError):
+            await tracker.call("broken", respond, 5)
+        for _ in range(100):
+            if not tracker.is_open("broken"):
+                break
+            await asyncio.sleep(0.01)
+        assert probed == ["broken", "broken"]
+        assert await tracker.call("broken", respond, 5) == "ok"
+    finally:
+        await tracker.close()
+
+
+@pytest.mark.asyncio
+async def test_list_players_circuit_breaker():
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import (
+        list_players,
+        list_players_for_all_servers,
+        send_message,
+        server_health,
+    )
+
+    healthy_server = MockMCInstance(
+        name="healthy", game_port=25565, list_players_response=["Notch"]
+    )
+    hung_server = MockMCInstance(name="hung", game_port=25566)
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    hung_server.list_players.side_effect = hang
+    hung_server.send_command_rcon.side_effect = hang
+    mock_docker_mc_manager = MockDockerMCManager(
+        instances=[healthy_server, hung_server]
+    )
+    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+        for _ in range(3):
+            assert await list_players("hung", timeout=0.05) is None
+        assert server_health.is_open("hung")
+
+        # the broken server is reported right away without being queried
+        hung_server.send_command_rcon.reset_mock()
+        assert await asyncio.wait_for(list_players_for_all_servers(), 1) == {
+            "healthy": ["Notch"],
+            "hung": None,
+        }
+        hung_server.send_command_rcon.assert_not_called()
+
+        assert await asyncio.wait_for(send_message("hello"), 1) == ["hung"]
+        hung_server.send_command_rcon.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_server_health_timeout_accounting():
+    from mc_qqbot_next.plugins.mc_qqbot_next.deadline import deadline
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_health import (
+        ServerHealthTracker,
+    )
+
+    async def probe(server_name: str):
+        pass
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    async def queued(operation):
+        # someone else holds the slot for a while
+        await asyncio.sleep(0.2)
+        return await operation()
+
+    tracker = ServerHealthTracker(
+        probe=probe,
+        failure_threshold=1,
+        probe_interval_seconds=10,
+        timeout_multiplier=3,
+        min_timeout_seconds=0.05,
+    )
+    try:
+        # time spent waiting for a slot doesn't count against the server
+        assert await tracker.call("server1", slow, 0.15, schedule=queued) == "ok"
+
+        # a timeout cut short by the caller's deadline isn't the server's fault
+        with deadline(0.05):
+            with pytest.raises(asyncio.TimeoutError):
+                await tracker.call("server1", slow, 0.15)
+        assert tracker.get("server1").consecutive_failures == 0
+        assert not tracker.is_open("server1")
+
+        # but a server that used up the whole timeout is
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.call("server1", slow, 0.05)
+        assert tracker.is_open("server1")
+    finally:
+        await tracker.close()
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_server_registry():
+    from unittest.mock import AsyncMock
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_registry import (
+        ContainerEvent,
+        ServerRegistry,
+        parse_container_event,
+    )
+
+    ports = {"server1": 25566, "server2": 25565, "excluded": 25564, "broken": 0}
+
+    async def get_game_port(server_name: str) -> int:
+        if server_name == "broken":
+            raise RuntimeError("no compose file")
+        return ports[server_name]
+
+    discover = AsyncMock(return_value=["server1", "server2", "excluded"])
+    registry = ServerRegistry(
+        discover_running_server_names=discover,
+        get_game_port=AsyncMock(side_effect=get_game_port),
+        get_excluded_server_names=lambda: ["excluded"],
+        ttl_seconds=60,
+    )
+
+    assert await registry.get_running_server_names() == ["server2", "server1"]
+    assert await registry.get_running_server_names() == ["server2", "server1"]
+    discover.assert_awaited_once()
+
+    # incremental updates from container events
+    ports["server3"] = 25560
+    await registry.handle_event(
+        parse_container_event(
+            {
+                "Action": "start",
+                "Actor": {"Attributes": {"com.docker.compose.project": "server3"}},
+            }
+        )
+    )
+    await registry.handle_event(ContainerEvent(action="die", server_name="server2"))
+    await registry.handle_event(ContainerEvent(action="start", server_name="broken"))
+    await registry.handle_event(ContainerEvent(action="start", server_name="excluded"))
+    await registry.handle_event(ContainerEvent(action="start", server_name=None))
+    assert await registry.get_running_server_names() == ["server3", "server1"]
+    assert await registry.get_game_port("server3") == 25560
+    discover.assert_awaited_once()
+
+    # stale data is served while refreshing in the background
+    registry._ttl_seconds = 0
+    discover.return_value = ["server1", "server2"]
+    assert await registry.get_running_server_names() == ["server3", "server1"]
+    await asyncio.sleep(0.01)
+    registry._ttl_seconds = 60
+    assert await registry.get_running_server_names() == ["server2", "server1"]
+    assert discover.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_server_info_cache():
+    import os
+    import tempfile
+    from pathlib import Path
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import get_game_port
+
+    from .docker_mc_mocks import (
+        MockDockerMCManager,
+        MockMCInstance,
+        mock_common_docker_mc_manager,
+    )
+
+    instance = MockMCInstance(name="cached", game_port=25565)
+    compose_file_path = Path(tempfile.mkdtemp()) / "docker-compose.yml"
+    compose_file_path.write_text("ports: ['25565:25565']\n")
+    instance.get_compose_file_path.return_value = compose_file_path
+    with mock_common_docker_mc_manager(MockDockerMCManager(instances=[instance])):
+        assert await get_game_port("cached") == 25565
+        assert await get_game_port("cached") == 25565
+        instance.get_server_info.assert_awaited_once()
+
+        # the compose file is parsed again only after it changes
+        instance.get_server_info.return_value.game_port = 25566
+        compose_file_path.write_text("ports: ['25566:25565']\n")
+        os.utime(compose_file_path, ns=(0, 0))
+        assert await get_game_port("cached") == 25566
+        assert instance.get_server_info.await_count == 2
+
+        compose_file_path.unlink()
+        await get_game_port("cached")
+        assert instance.get_server_info.await_count == 3
@@ -0,0 +1,93 @@
+import pytest
+from nonebug import App
+
+from .docker_mc_mocks import (
+    MockDockerMCManager,
+    MockMCInstance,
+    mock_common_docker_mc_manager,
+)
+from .onebot_message_factory import create_group_message_event
+from .onebot_mock_send import bot_receive_event
+
+
+@pytest.mark.asyncio
+async def test_server_status_poller():
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_status import ServerStatusPoller
+
+    server1 = MockMCInstance(name="server1", game_port=25565)
+    server2 = MockMCInstance(name="server2", game_port=25566)
+    mock_docker_mc_manager = MockDockerMCManager(instances=[server1, server2])
+    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+        poller = ServerStatusPoller(
+            interval_seconds=10, max_interval_seconds=40, stale_seconds=60
+        )
+
+        # the first request waits for the servers to be queried
+        statuses = await poller.get_statuses()
+        assert list(statuses) == ["server1", "server2"]
+        assert statuses["server1"].players == []
+        assert statuses["server1"].healthy
+        assert not statuses["server1"].paused
+
+        # later requests are answered from the table
+        server1.list_players_response = ["Notch"]
+        for _ in range(10):
+            assert (await poller.get_statuses())["server1"].players == []
+        server1.list_players.assert_awaited_once()
+
+        # stale entries are returned while they are refreshed in the background
+        poller.stale_seconds = 0
+        assert (await poller.get_statuses())["server1"].players == []
+        refresh_task = poller.refresh(["server1", "server2"])
+        assert poller.refresh(["server1", "server2"]) is refresh_task
+        await refresh_task
+        assert server1.list_players.await_count == 2
+        poller.stale_seconds = 60
+        assert (await poller.get_statuses())["server1"].players == ["Notch"]
+
+        # failures are recorded per server
+        server2.healthy_response = False
+        await poller.refresh(["server1", "server2"])
+        statuses = await poller.get_statuses()
+        assert statuses["server2"].players is None
+        assert not statuses["server2"].healthy
+        assert statuses["server2"].error is not None
+
+        # the interval backs off while nobody is online or asking
+        assert poller._next_interval() == 10
+        server1.list_players_response = []
+        await poller.refresh(["server1"])
+        assert [poller._next_interval() for _ in range(3)] == [20, 40, 40]
+        await poller.get_statuses()
+        assert poller._next_interval() == 10
+
+
+@pytest.mark.asyncio
+async def test_ping_from_status_poller(app: App):
+    from unittest.mock import patch
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.commands.mc.ping import ping
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_status import ServerStatusPoller
+
+    server1 = MockMCInstance(name="server1", game_port=25565)
+    server2 = MockMCInstance(name="server2", game_port=25566)
+    mock_docker_mc_manager = MockDockerMCManager(instances=[server1, server2])
+    poller = ServerStatusPoller(
+        interval_seconds=10, max_interval_seconds=60, stale_seconds=60
+    )
+    with (
+        mock_common_docker_mc_manager(mock_docker_mc_manager),
+        patch(
+            "mc_qqbot_next.plugins.mc_qqbot_next.commands.mc.ping.status_poller",
+            new=poller,
+        ),
+    ):
+        server1.list_players_response = ["Notch"]
+        event = create_group_message_event("/list")
+        await bot_receive_event(app, ping, event, "[server1]: Notch\n没人: [server2]")
+
+        poller._entries["server2"].updated_at -= 100
+        await bot_receive_event(
+            app, ping, event, "[server1]: Notch\n没人: [server2](100秒前)"
+        )
+        await poller.refresh(["server1", "server2"])
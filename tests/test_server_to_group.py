@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from .docker_mc_mocks import (
@@ -8,6 +10,16 @@ from .docker_mc_mocks import (
 from .onebot_simple_bot_mock import mock_server_to_group_bot
 
 
+async def check_mc_logs_and_deliver():
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_event_bus import log_event_bus
+    from mc_qqbot_next.plugins.mc_qqbot_next.player_info import player_info_writer
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_to_group import check_mc_logs
+
+    await check_mc_logs()
+    await log_event_bus.join()
+    await player_info_writer.flush()
+
+
 @pytest.mark.asyncio
 async def test_handle_player_join():
     from nonebot_plugin_orm import init_orm
@@ -16,7 +28,6 @@ async def test_handle_player_join():
         delete_mc_player_info,
         get_uuid_by_player_name,
     )
-    from mc_qqbot_next.plugins.mc_qqbot_next.server_to_group import check_mc_logs
 
     await init_orm()
 
@@ -25,12 +36,12 @@ async def test_handle_player_join():
     with mock_common_docker_mc_manager(mock_docker_mc_manager):
         with mock_server_to_group_bot():
             # populate cache
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
 
             instance.set_mocked_log_content(
                 "[00:00:00] [User Authenticator #3/INFO]: UUID of player Notch is 069a79f4-44e9-4726-a5be-fca90e38aaf5\n"
             )
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
             assert (
                 await get_uuid_by_player_name("Notch")
                 == "069a79f444e94726a5befca90e38aaf5"
@@ -40,7 +51,7 @@ async def test_handle_player_join():
             instance.set_mocked_log_content(
                 "[00:00:00] [User Authenticator #3/INFO]: UUID of player Dream is 069a79f4-44e9-4726-a5be-fca90e38aaf5\n"
             )
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
             assert (
                 await get_uuid_by_player_name("Dream")
                 == "069a79f444e94726a5befca90e38aaf5"
@@ -51,7 +62,7 @@ async def test_handle_player_join():
             instance.set_mocked_log_content(
                 "[01Nov2024 00:00:00.000] [User Authenticator #1/INFO] [net.minecraft.server.network.ServerLoginPacketListenerImpl/]: UUID of player Notch is 069a79f4-44e9-4726-a5be-fca90e38aaf5\n"
             )
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
             assert (
                 await get_uuid_by_player_name("Notch")
                 == "069a79f444e94726a5befca90e38aaf5"
@@ -62,7 +73,7 @@ async def test_handle_player_join():
             instance.set_mocked_log_content(
                 "[01Nov2024 00:00:00.000] [Server thread/INFO] [net.minecraft.server.MinecraftServer/]: <Dream> [01Nov2024 00:00:00.000] [User Authenticator #1/INFO] [net.minecraft.server.network.ServerLoginPacketListenerImpl/]: UUID of player Notch is 12345678-1234-1234-1234-123456789012\n"
             )
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
             assert await get_uuid_by_player_name("Notch") is None
 
             # test multiple lines
@@ -70,7 +81,7 @@ async def test_handle_player_join():
                 "[00:00:00] [User Authenticator #3/INFO]: UUID of player Notch is 069a79f4-44e9-4726-a5be-fca90e38aaf5\n"
                 "[00:00:00] [User Authenticator #3/INFO]: UUID of player Dream is ec70bcaf-702f-4bb8-b48d-276fa52a780c\n"
             )
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
             assert (
                 await get_uuid_by_player_name("Notch")
                 == "069a79f444e94726a5befca90e38aaf5"
@@ -88,13 +99,12 @@ def construct_user_message_log(player_name: str, message: str) -> str:
 
 
 def construct_tell_raw_content(target: str, message: str) -> str:
-    return f'tellraw {target} {{"text": "{message}", "color": "yellow"}}'
+    component = json.dumps({"text": message, "color": "yellow"}, ensure_ascii=False)
+    return f"tellraw {target} {component}"
 
 
 @pytest.mark.asyncio
 async def test_handle_bind_command():
-    from unittest.mock import call
-
     from nonebot_plugin_orm import init_orm
 
     from mc_qqbot_next.plugins.mc_qqbot_next.db.crud.binding import (
@@ -102,7 +112,6 @@ async def test_handle_bind_command():
         delete_qq_uuid_mapping,
         get_qq_by_player_name,
     )
-    from mc_qqbot_next.plugins.mc_qqbot_next.server_to_group import check_mc_logs
 
     await init_orm()
 
@@ -121,20 +130,20 @@ async def test_handle_bind_command():
                 instance.set_mocked_log_content(
                     construct_user_message_log(player_name, command),
                 )
-                await check_mc_logs()
+                await check_mc_logs_and_deliver()
 
-                # Verify RCON commands
-                expected_calls = [
-                    call(construct_tell_raw_content(player_name, response))
-                    for response in expected_responses
-                ]
-                instance.send_command_rcon.assert_has_awaits(expected_calls)
+                # Verify RCON commands, multi-line responses are sent at once
+                instance.send_command_rcon.assert_awaited_once_with(
+                    construct_tell_raw_content(
+                        player_name, "\n".join(expected_responses)
+                    )
+                )
 
                 # Verify QQ binding if specified
                 qq = await get_qq_by_player_name(player_name)
                 assert qq == expected_qq
 
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
 
             # Test help command
             await check_bind_command(
@@ -142,10 +151,10 @@ async def test_handle_bind_command():
                 r"\\bind",
                 [
                     "使用方法：",
-                    "\\\\\\\\bind get - 获取当前绑定信息",
-                    "\\\\\\\\bind remove - 解除绑定",
-                    "\\\\\\\\bind {qq号} - 绑定QQ号",
-                    "\\\\\\\\bind help - 显示此帮助信息",
+                    "\\\\bind get - 获取当前绑定信息",
+                    "\\\\bind remove - 解除绑定",
+                    "\\\\bind {qq号} - 绑定QQ号",
+                    "\\\\bind help - 显示此帮助信息",
                 ],
                 None,
             )
@@ -194,7 +203,6 @@ async def test_handle_send_command():
     from nonebot_plugin_orm import init_orm
 
     from mc_qqbot_next.plugins.mc_qqbot_next.config import config
-    from mc_qqbot_next.plugins.mc_qqbot_next.server_to_group import check_mc_logs
 
     await init_orm()
 
@@ -202,15 +210,149 @@ async def test_handle_send_command():
     mock_docker_mc_manager = MockDockerMCManager(instances=[instance])
     with mock_common_docker_mc_manager(mock_docker_mc_manager):
         with mock_server_to_group_bot() as mock_bot:
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
 
             instance.set_mocked_log_content(
                 construct_user_message_log("Notch", r"\\hello"),
             )
             mock_bot.send_group_msg.return_value = {"message_id": 123456}
-            await check_mc_logs()
+            await check_mc_logs_and_deliver()
             mock_bot.send_group_msg.assert_awaited_once_with(
                 group_id=config.mc_group_id,
                 message="[server1] <Notch>: hello",
                 auto_escape=True,
             )
+
+
+@pytest.mark.asyncio
+async def test_check_mc_logs_concurrently():
+    import asyncio
+    import time
+    from unittest.mock import AsyncMock, patch
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_to_group import check_mc_logs
+
+    instances = [MockMCInstance(name=f"slow{i}") for i in range(3)]
+
+    async def slow_handle_new_log(server_name: str, log_content: str):
+        await asyncio.sleep(0.5)
+
+    mock_docker_mc_manager = MockDockerMCManager(instances=instances)
+    with mock_common_docker_mc_manager(mock_docker_mc_manager):
+        with mock_server_to_group_bot():
+            # populate cache
+            await check_mc_logs()
+
+            for instance in instances:
+                instance.set_mocked_log_content(
+                    construct_user_message_log("Notch", "hi")
+                )
+            with patch(
+                "mc_qqbot_next.plugins.mc_qqbot_next.server_to_group.handle_new_log",
+                new=AsyncMock(side_effect=slow_handle_new_log),
+            ) as mock_handle_new_log:
+                start_time = time.perf_counter()
+                await check_mc_logs()
+                # bounded by the slowest server instead of the sum of all servers
+                assert time.perf_counter() - start_time < 1
+                assert mock_handle_new_log.await_count == len(instances)
+
+
+@pytest.mark.asyncio
+async def test_handle_send_command_batched():
+    import asyncio
+    from unittest.mock import patch
+
+    from nonebot_plugin_orm import init_orm
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.chat_batcher import ChatBatcher
+    from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.db.crud.message import (
+        delete_message_target_by_message_id,
+        get_message_target_by_message_id,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.server_to_group import send_chat_lines
+
+    await init_orm()
+
+    instances = [MockMCInstance(name="server1"), MockMCInstance(name="server2")]
+    mock_docker_mc_manager = MockDockerMCManager(instances=instances)
+    chat_batcher = ChatBatcher(window_seconds=0.2, scope="global", send=send_chat_lines)
+    with (
+        mock_common_docker_mc_manager(mock_docker_mc_manager),
+        mock_server_to_group_bot() as mock_bot,
+        patch(
+            "mc_qqbot_next.plugins.mc_qqbot_next.server_to_group.chat_batcher",
+            new=chat_batcher,
+        ),
+    ):
+        await check_mc_logs_and_deliver()
+
+        mock_bot.send_group_msg.side_effect = [
+            {"message_id": 234567},
+            {"message_id": 234568},
+        ]
+        instances[0].set_mocked_log_content(
+            construct_user_message_log("Notch", r"\\hello")
+            + "\n"
+            # not a command
+            + construct_user_message_log("Notch", "hi")
+            + "\n"
+            + construct_user_message_log("Notch", r"\\world")
+        )
+        await check_mc_logs_and_deliver()
+        mock_bot.send_group_msg.assert_not_awaited()
+
+        # a line from another server sends the current batch right away,
+        # so that replying to a merged message reaches the right server
+        instances[1].set_mocked_log_content(
+            construct_user_message_log("Dream", r"\\hey")
+        )
+        await check_mc_logs_and_deliver()
+        mock_bot.send_group_msg.assert_awaited_once_with(
+            group_id=config.mc_group_id,
+            message="[server1] <Notch>: hello\n[server1] <Notch>: world",
+            auto_escape=True,
+        )
+
+        await asyncio.sleep(0.3)
+        assert mock_bot.send_group_msg.await_count == 2
+        mock_bot.send_group_msg.assert_awaited_with(
+            group_id=config.mc_group_id,
+            message="[server2] <Dream>: hey",
+            auto_escape=True,
+        )
+        for message_id, target_server in [(234567, "server1"), (234568, "server2")]:
+            message_target = await get_message_target_by_message_id(message_id)
+            assert message_target is not None
+            assert message_target.target_server == target_server
+
+    await delete_message_target_by_message_id(234567)
+    await delete_message_target_by_message_id(234568)
+
+
+@pytest.mark.asyncio
+async def test_chat_batcher_concurrent_add():
+    import asyncio
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.chat_batcher import (
+        ChatBatcher,
+        ChatLine,
+    )
+
+    batches = list[list[str]]()
+
+    async def send(lines: list[ChatLine]):
+        # let other lines arrive while this batch is being sent
+        await asyncio.sleep(0.01)
+        batches.append([line.message for line in lines])
+
+    chat_batcher = ChatBatcher(window_seconds=0.05, scope="global", send=send)
+    await chat_batcher.add(ChatLine("server2", "Dream", "B1"))
+    await asyncio.gather(
+        chat_batcher.add(ChatLine("server1", "Notch", "A2")),
+        chat_batcher.add(ChatLine("server2", "Dream", "B3")),
+    )
+    await chat_batcher.flush()
+    # every batch comes from a single server, in the order the lines arrived
+    assert batches == [["B1"], ["A2"], ["B3"]]
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+
+from .docker_mc_mocks import (
+    MockDockerMCManager,
+    MockMCInstance,
+    mock_common_docker_mc_manager,
+)
+
+
+class FakeSLPServer:
+    """
+    Answers Server List Ping requests like a Minecraft server's game port
+    """
+
+    def __init__(self, players: list[str], sample_size: int = 12):
+        self.players = players
+        self.sample_size = sample_size
+        self.handshakes = list[tuple[int, str, int, int]]()
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self):
+        assert self._server is not None
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        from mc_qqbot_next.plugins.mc_qqbot_next.slp import (
+            decode_varint,
+            encode_packet,
+            encode_string,
+            read_packet,
+        )
+
+        try:
+            _, handshake = await read_packet(reader)
+            protocol_version, offset = decode_varint(handshake)
+            length, offset = decode_varint(handshake, offset)
+            host = handshake[offset : offset + length].decode()
+            port = int.from_bytes(handshake[offset + length : offset + length + 2])
+            next_state, _ = decode_varint(handshake, offset + length + 2)
+            self.handshakes.append((protocol_version, host, port, next_state))
+
+            await read_packet(reader)
+            status = {
+                "version": {"name": "1.21.1", "protocol": 767},
+                "players": {
+                    "max": 20,
+                    "online": len(self.players),
+                    "sample": [
+                        {"name": name, "id": "00000000-0000-0000-0000-000000000000"}
+                        for name in self.players[: self.sample_size]
+                    ],
+                },
+                "description": {"text": "A ", "extra": [{"text": "Minecraft Server"}]},
+            }
+            writer.write(encode_packet(0x00, encode_string(json.dumps(status))))
+            await writer.drain()
+
+            packet_id, payload = await read_packet(reader)
+            writer.write(encode_packet(packet_id, payload))
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.mark.asyncio
+async def test_ping_server():
+    from mc_qqbot_next.plugins.mc_qqbot_next.slp import ping_server
+
+    server = FakeSLPServer(players=["Notch", "Dream"])
+    await server.start()
+    try:
+        status = await ping_server("127.0.0.1", server.port, timeout=5)
+        assert server.handshakes == [(-1, "127.0.0.1", server.port, 1)]
+        assert status.online == 2
+        assert status.max_players == 20
+        assert status.players == ["Notch", "Dream"]
+        assert status.players_complete
+        assert status.motd == "A Minecraft Server"
+        assert status.version == "1.21.1"
+        assert status.latency >= 0
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_list_players_with_slp():
+    from unittest.mock import patch
+
+    from mc_qqbot_next.plugins.mc_qqbot_next.config import config
+    from mc_qqbot_next.plugins.mc_qqbot_next.docker import list_players
+
+    small_server = FakeSLPServer(players=["Notch"])
+    big_server = FakeSLPServer(players=[f"player{i}" for i in range(20)])
+    await small_server.start()
+    await big_server.start()
+
+    small = MockMCInstance(name="small", game_port=small_server.port)
+    big = MockMCInstance(
+        name="big",
+        game_port=big_server.port,
+        list_players_response=[f"player{i}" for i in range(20)],
+    )
+    down = MockMCInstance(name="down", game_port=1, list_players_response=["Dream"])
+    mock_docker_mc_manager = MockDockerMCManager(instances=[small, big, down])
+    try:
+        with (
+            mock_common_docker_mc_manager(mock_docker_mc_manager),
+            patch.object(config, "mc_list_players_method", "slp"),
+        ):
+            assert await list_players("small") == ["Notch"]
+            small.list_players.assert_not_called()
+
+            # the sample is truncated, so RCON is used instead
+            assert await list_players("big") == [f"player{i}" for i in range(20)]
+            big.list_players.assert_awaited_once()
+
+            # the game port is not reachable
+            assert await list_players("down") == ["Dream"]
+            down.list_players.assert_awaited_once()
+    finally:
+        await small_server.stop()
+        await big_server.stop()
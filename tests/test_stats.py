@@ -0,0 +1,52 @@
+import pytest
+from nonebug import App
+
+from .common_permission_test import basic_permission_check
+from .onebot_message_factory import create_group_message_event
+from .onebot_mock_send import bot_receive_event
+
+
+@pytest.mark.asyncio
+async def test_stats(app: App):
+    from mc_qqbot_next.plugins.mc_qqbot_next.commands.mc.stats import stats
+    from mc_qqbot_next.plugins.mc_qqbot_next.log_event_bus import (
+        LogEventQueueStats,
+        log_event_bus,
+    )
+    from mc_qqbot_next.plugins.mc_qqbot_next.send_scheduler import (
+        SendStats,
+        send_scheduler,
+    )
+
+    await basic_permission_check(app, stats)
+
+    log_event_bus.stats.clear()
+    send_scheduler.stats.clear()
+    event = create_group_message_event("/stats", role="admin")
+    await bot_receive_event(app, stats, event, "还没有处理过日志事件或发送过消息")
+
+    log_event_bus.stats["server1"] = LogEventQueueStats(
+        depth=1, published=11, delivered=10, dropped=0, last_latency=0.012
+    )
+    log_event_bus.stats["server2"] = LogEventQueueStats(
+        delivered=3, dropped=2, last_latency=0.1, max_latency=0.3456
+    )
+    await bot_receive_event(
+        app,
+        stats,
+        event,
+        "[server1] 排队 1 已处理 10 丢弃 0 延迟 12ms 最大 0ms\n"
+        "[server2] 排队 0 已处理 3 丢弃 2 延迟 100ms 最大 346ms",
+    )
+
+    send_scheduler.stats[123456] = SendStats(sent=30, retried=1, max_wait=2.5)
+    await bot_receive_event(
+        app,
+        stats,
+        event,
+        "[server1] 排队 1 已处理 10 丢弃 0 延迟 12ms 最大 0ms\n"
+        "[server2] 排队 0 已处理 3 丢弃 2 延迟 100ms 最大 346ms\n"
+        "[群 123456] 已发送 30 重试 1 失败 0 等待中 0 最长等待 2.5s",
+    )
+    log_event_bus.stats.clear()
+    send_scheduler.stats.clear()